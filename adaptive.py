@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Adaptive procedures for the target duration.
+
+Every procedure offers the StaircaseAdaptive interface: get_ms(),
+update(hit, presented_ms), get_state() and set_state(state). presented_ms is
+the duration actually shown (after the R-Score rule and caps). The method is chosen with
+`staircase.method` in the YAML:
+
+- "staircase": utils.StaircaseAdaptive (1-up/2-down, fixed step)
+- "questplus": BayesianAdaptive, a QUEST+/Psi-style posterior over a
+  threshold x slope grid of a logistic psychometric function. The likelihood
+  table is precomputed once; each update is a single vectorized NumPy
+  multiply + normalize, and the next duration is the grid value whose
+  posterior-predicted hit rate is closest to `target_hit_rate`.
+"""
+
+import numpy as np
+
+from utils import StaircaseAdaptive
+
+METHODS = ("staircase", "questplus")
+
+
+class BayesianAdaptive:
+    """Posterior-based target duration tracking a fixed hit rate."""
+
+    def __init__(self, initial_ms, min_ms, max_ms, target_hit_rate=0.7, grid_step_ms=10,
+                 slopes_ms=(10, 20, 40, 80), lapse=0.02, prior_sd_ms=150):
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.initial_ms = initial_ms
+        self.target = target_hit_rate
+        self.durations = np.arange(min_ms, max_ms + 1, grid_step_ms, dtype=np.float64)
+        thresholds = self.durations
+        slopes = np.asarray(slopes_ms, dtype=np.float64)
+
+        # p_hit[t, s, d] = P(hit | duration d; threshold t, slope s)
+        z = (self.durations[None, None, :] - thresholds[:, None, None]) / slopes[None, :, None]
+        self._p_hit = ((1.0 - lapse) / (1.0 + np.exp(-z))).reshape(-1, len(self.durations))
+        self._p_miss = 1.0 - self._p_hit
+
+        prior_t = np.exp(-0.5 * ((thresholds - initial_ms) / prior_sd_ms) ** 2)
+        self._prior = np.repeat(prior_t[:, None], len(slopes), axis=1).ravel()
+        self._prior /= self._prior.sum()
+        self.set_state([])
+
+    def _next_ms(self):
+        predicted = self.posterior @ self._p_hit
+        return int(self.durations[np.argmin(np.abs(predicted - self.target))])
+
+    def get_ms(self):
+        """Get current target duration in milliseconds."""
+        return self.value
+
+    def update(self, hit, presented_ms=None):
+        """Multiply the posterior by the likelihood of the outcome at the presented duration (default: get_ms())."""
+        presented_ms = self.value if presented_ms is None else int(presented_ms)
+        idx = int(np.argmin(np.abs(self.durations - presented_ms)))
+        self.posterior *= self._p_hit[:, idx] if hit else self._p_miss[:, idx]
+        self.posterior /= self.posterior.sum()
+        self.history.append([presented_ms, int(bool(hit))])
+        self.value = self._next_ms()
+
+    def get_state(self):
+        """Compact state: the (presented duration, hit) history that determines the posterior."""
+        return [list(h) for h in self.history]
+
+    def set_state(self, state):
+        """Rebuild the posterior by replaying a (presented duration, hit) history."""
+        self.posterior = self._prior.copy()
+        self.history = []
+        self.value = int(self.durations[np.argmin(np.abs(self.durations - self.initial_ms))])
+        for presented_ms, hit in state:
+            self.update(hit, presented_ms)
+
+
+def make_adaptive(staircase_cfg, max_ms):
+    """Build the adaptive procedure selected by staircase.method for one condition."""
+    method = staircase_cfg.get('method', 'staircase')
+    if method == 'questplus':
+        q = staircase_cfg['questplus']
+        return BayesianAdaptive(
+            initial_ms=staircase_cfg['initial_ms'],
+            min_ms=staircase_cfg['min_ms'],
+            max_ms=max_ms,
+            target_hit_rate=q['target_hit_rate'],
+            grid_step_ms=q['grid_step_ms'],
+            slopes_ms=q['slopes_ms'],
+            lapse=q['lapse'],
+            prior_sd_ms=q['prior_sd_ms'],
+        )
+    return StaircaseAdaptive(
+        initial_ms=staircase_cfg['initial_ms'],
+        min_ms=staircase_cfg['min_ms'],
+        max_ms=max_ms,
+        step_ms=staircase_cfg['step_ms'],
+    )
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cohort analysis of logged MID sessions with bootstrap confidence intervals.
+
+Per session (main blocks; the practice block is left out when main trials
+exist):
+
+- RT (rt_ms of hits) and hit rate per condition and per magnitude
+- hit rate over the session in bins of `bin_trials` trials
+- staircase convergence of target_ms_final per condition: final value, mean
+  and SD over the last `window` trials, number of reversals
+- R-Score trigger rate (rscore_value above rscore.threshold)
+
+Session metrics come with percentile bootstrap CIs over trials; group
+metrics (per-participant means, averaged over sessions) with bootstrap CIs
+over participants. Group-bys are np.unique/bincount over the columnar trial
+arrays, and resampling is one vectorized index matrix per metric. Sessions
+are analyzed in a process pool; results are cached in .analysis_cache/
+keyed by the CSV's SHA-256 and the analysis parameters, so a new CSV only
+costs its own session.
+
+Run:
+    python analysis.py --config mid_config.yml --out analysis_report.json
+    python analysis.py data/MID_PC_P01_*.csv --boot 5000 --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from catalog import file_sha256, session_csvs
+from columnar import MISSING, columnar_path, load_trials, read_csv
+from config_loader import load_config
+
+CACHE_DIR = ".analysis_cache"
+ANALYSIS_VERSION = 1
+
+# Largest resample matrix (elements) built at once
+BOOT_CHUNK = 4_000_000
+
+
+def bootstrap_ci(values, rng, n_boot=2000, stat=np.mean, alpha=0.05):
+    """Percentile bootstrap CI of stat(values); [None, None] with fewer than 2 values."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    n = len(values)
+    if n < 2:
+        return [None, None]
+    stats = np.empty(n_boot)
+    step = max(1, BOOT_CHUNK // n)
+    for start in range(0, n_boot, step):
+        stop = min(n_boot, start + step)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        stats[start:stop] = stat(values[idx], axis=1)
+    lo, hi = np.percentile(stats, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+    return [float(lo), float(hi)]
+
+
+def group_indices(keys):
+    """Group rows by key: returns (unique keys, list of row-index arrays)."""
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(uniq)))[:-1]
+    return uniq, np.split(order, bounds)
+
+
+def _key(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+def _nan(value):
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def summarize_group(rt, hit, rng, n_boot):
+    """n, hit rate (+CI), RT mean/median/SD (+CI of the mean) for one group of trials."""
+    rt_hits = rt[(hit == 1) & ~np.isnan(rt)]
+    return {
+        "n": int(len(hit)),
+        "hit_rate": float(hit.mean()) if len(hit) else None,
+        "hit_rate_ci": bootstrap_ci(hit, rng, n_boot),
+        "rt_n": int(len(rt_hits)),
+        "rt_mean": _nan(rt_hits.mean()) if len(rt_hits) else None,
+        "rt_median": _nan(np.median(rt_hits)) if len(rt_hits) else None,
+        "rt_sd": _nan(rt_hits.std(ddof=1)) if len(rt_hits) > 1 else None,
+        "rt_mean_ci": bootstrap_ci(rt_hits, rng, n_boot),
+    }
+
+
+def convergence(target_ms, window):
+    """Final value, mean/SD over the last `window` trials and reversal count of a staircase track."""
+    steps = np.sign(np.diff(target_ms.astype(np.float64)))
+    steps = steps[steps != 0]
+    tail = target_ms[-window:].astype(np.float64)
+    return {
+        "final_ms": int(target_ms[-1]),
+        "tail_mean_ms": float(tail.mean()),
+        "tail_sd_ms": float(tail.std(ddof=1)) if len(tail) > 1 else 0.0,
+        "reversals": int(np.count_nonzero(steps[1:] != steps[:-1])),
+    }
+
+
+def load_session(csv_path):
+    """Trial array of a session, from <csv>.trials.npy when it is up to date."""
+    npy = columnar_path(csv_path)
+    if os.path.exists(npy) and os.path.getmtime(npy) >= os.path.getmtime(csv_path):
+        return np.asarray(load_trials(npy))
+    return read_csv(csv_path)
+
+
+def session_metrics(job):
+    """All metrics of one session (runs in a worker process)."""
+    csv_path, digest, params = job
+    arr = load_session(csv_path)
+    if np.any(arr["block"] > 0):
+        arr = arr[arr["block"] > 0]
+    arr = arr[arr["hit"] != MISSING["hit"]]  # rows without a hit value carry no outcome
+    rng = np.random.default_rng([params["seed"], int(digest[:12], 16)])
+    n_boot = params["n_boot"]
+    hit = arr["hit"].astype(np.float64)
+    rt = arr["rt_ms"].astype(np.float64)
+
+    result = {"csv": csv_path, "participant": _key(arr["participant"][0]) if len(arr) else None,
+              "session": _key(arr["session"][0]) if len(arr) else None, "n_trials": int(len(arr)),
+              "by_condition": {}, "by_magnitude": {}, "convergence": {}}
+    for column, out in (("condition", "by_condition"), ("magnitude", "by_magnitude")):
+        keys, groups = group_indices(arr[column])
+        for key, idx in zip(keys, groups):
+            result[out][_key(key)] = summarize_group(rt[idx], hit[idx], rng, n_boot)
+
+    keys, groups = group_indices(arr["condition"])
+    target = arr["target_ms_final"]
+    for key, idx in zip(keys, groups):
+        track = target[idx]
+        track = track[track != MISSING["target_ms_final"]]
+        if len(track):
+            result["convergence"][_key(key)] = convergence(track, params["window"])
+
+    n_bins = -(-len(hit) // params["bin_trials"])
+    bins = np.arange(len(hit)) // params["bin_trials"]
+    result["hit_rate_by_bin"] = (np.bincount(bins, hit, n_bins) /
+                                 np.maximum(np.bincount(bins, minlength=n_bins), 1)).tolist()
+
+    rv = arr["rscore_value"].astype(np.float64)
+    scored = ~np.isnan(rv)
+    triggered = (rv[scored] > params["threshold"]).astype(np.float64)
+    result["rscore"] = {
+        "n_scored": int(scored.sum()),
+        "trigger_rate": float(triggered.mean()) if len(triggered) else None,
+        "trigger_rate_ci": bootstrap_ci(triggered, rng, n_boot),
+    }
+    return result
+
+
+def cache_key(digest, params):
+    """Cache file name for a session hash and analysis parameters."""
+    h = hashlib.sha256(json.dumps([ANALYSIS_VERSION, digest, params], sort_keys=True).encode())
+    return os.path.join(CACHE_DIR, h.hexdigest()[:32] + ".json")
+
+
+def analyze_sessions(csv_paths, params, workers=None, use_cache=True):
+    """Metrics for every session; only uncached sessions are computed (in a process pool)."""
+    jobs, results, computed = [], {}, 0
+    for path in csv_paths:
+        digest = file_sha256(path)
+        cached = cache_key(digest, params)
+        if use_cache and os.path.exists(cached):
+            with open(cached, "r", encoding="utf-8") as f:
+                results[path] = json.load(f)
+            results[path]["csv"] = path
+        else:
+            jobs.append((path, digest, params))
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for job, metrics in zip(jobs, pool.map(session_metrics, jobs, chunksize=4)):
+                results[job[0]] = metrics
+                computed += 1
+                if use_cache:
+                    os.makedirs(CACHE_DIR, exist_ok=True)
+                    tmp = cache_key(job[1], params) + f".{os.getpid()}.tmp"
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        json.dump(metrics, f)
+                    os.replace(tmp, cache_key(job[1], params))
+    return results, computed
+
+
+def participant_values(sessions):
+    """Per participant: {metric name: mean over that participant's sessions}."""
+    per = {}
+    for s in sessions.values():
+        if s["participant"] is None:
+            continue
+        values = per.setdefault(s["participant"], {})
+        for group in ("by_condition", "by_magnitude"):
+            for key, m in s[group].items():
+                for stat in ("hit_rate", "rt_mean", "rt_median"):
+                    values.setdefault(f"{group}.{key}.{stat}", []).append(m[stat])
+        for key, c in s["convergence"].items():
+            values.setdefault(f"convergence.{key}.tail_mean_ms", []).append(c["tail_mean_ms"])
+        values.setdefault("rscore.trigger_rate", []).append(s["rscore"]["trigger_rate"])
+        for i, rate in enumerate(s["hit_rate_by_bin"]):
+            values.setdefault(f"hit_rate_by_bin.{i}", []).append(rate)
+    def mean(xs):
+        xs = [x for x in xs if x is not None and not np.isnan(x)]
+        return float(np.mean(xs)) if xs else None
+
+    return {p: {name: mean(xs) for name, xs in values.items()} for p, values in per.items()}
+
+
+def _group_ci(job):
+    name, values, seed, n_boot = job
+    rng = np.random.default_rng([seed, int(hashlib.sha256(name.encode()).hexdigest()[:12], 16)])
+    values = np.asarray(values, dtype=np.float64)
+    valid = values[~np.isnan(values)]
+    return name, {"n": int(len(valid)), "mean": float(valid.mean()) if len(valid) else None,
+                  "ci": bootstrap_ci(valid, rng, n_boot)}
+
+
+def group_summary(participants, params, workers=None):
+    """Bootstrap over participants for every metric, spread over a process pool."""
+    names = sorted({name for values in participants.values() for name in values})
+    jobs = []
+    for name in names:
+        values = [np.nan if v.get(name) is None else v[name] for v in participants.values()]
+        jobs.append((name, values, params["seed"], params["n_boot"]))
+    if not jobs:
+        return {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(_group_ci, jobs, chunksize=16))
+
+
+def print_report(group):
+    """Print the group-level metrics."""
+    print(f"{'metric':<44} {'n':>5} {'mean':>9}  95% CI")
+    for name, g in group.items():
+        if g["mean"] is None:
+            continue
+        ci = "-" if g["ci"][0] is None else f"[{g['ci'][0]:.3f}, {g['ci'][1]:.3f}]"
+        print(f"{name:<44} {g['n']:>5} {g['mean']:>9.3f}  {ci}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cohort analysis of MID sessions with bootstrap CIs.")
+    parser.add_argument('csv', nargs='*', help='Session CSVs (default: every session in data/).')
+    parser.add_argument('--config', default='mid_config.yml', help='Config (for the R-Score threshold).')
+    parser.add_argument('--out', default='analysis_report.json', help='JSON report with all metrics.')
+    parser.add_argument('--boot', type=int, default=2000, help='Bootstrap resamples per CI.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the bootstrap.')
+    parser.add_argument('--window', type=int, default=10, help='Trials per condition used for convergence.')
+    parser.add_argument('--bin-trials', type=int, default=10, help='Trials per hit-rate bin.')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores).')
+    parser.add_argument('--no-cache', action='store_true', help='Recompute every session.')
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    params = {"n_boot": args.boot, "seed": args.seed, "window": args.window,
+              "bin_trials": args.bin_trials, "threshold": float(cfg['rscore']['threshold'])}
+    csv_paths = args.csv or session_csvs("data")
+    sessions, computed = analyze_sessions(csv_paths, params, args.workers, not args.no_cache)
+    participants = participant_values(sessions)
+    group = group_summary(participants, params, args.workers)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "sessions": sessions, "participants": participants,
+                   "group": group}, f, indent=1)
+    print(f"{len(sessions)} sessions ({computed} computed, {len(sessions) - computed} cached), "
+          f"{len(participants)} participants")
+    print_report(group)
+    print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
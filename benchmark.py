@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the MID runner's hot paths.
+
+Measures config loading + validation (and the cached compiled config),
+stimulus preparation (PNG decode vs. cached arrays, ImageStim construction
+when PsychoPy is available), the runner's per-trial bookkeeping on the
+compiled config (decide_target, apply_outcome, trial_row) with the draw
+calls of its phases on stub stimuli, trial logging throughput with
+CSV_HEADERS rows, ResponseCollector.poll and the FrameScheduler deadline
+loop of a target phase on a stub clock (both need PsychoPy importable).
+
+Run:
+    python benchmark.py --out bench.json
+    python benchmark.py --compare bench_baseline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+
+from config_loader import load_config
+from utils import CSV_HEADERS, TRIAL_PHASES
+
+
+def measure(fn, number=100, repeat=7):
+    """Time fn; returns per-call statistics in microseconds over `repeat` runs of `number` calls."""
+    per_call = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - t0) / number * 1e6)
+    per_call.sort()
+    return {
+        "mean_us": sum(per_call) / len(per_call),
+        "min_us": per_call[0],
+        "median_us": per_call[len(per_call) // 2],
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def bench_config(config_path):
+    """load_config including text content and all validators."""
+    return measure(lambda: load_config(config_path), number=20)
+
+
+def bench_config_compiled(config_path):
+    """compile_config served from the hash-keyed cache (warm launch)."""
+    from compiled_config import compile_config
+
+    compile_config(config_path)
+    return measure(lambda: compile_config(config_path), number=20)
+
+
+def bench_stimuli(cfg):
+    """Image preparation: cold PNG decode+resize, warm cache load, ImageStim (if PsychoPy runs)."""
+    from stimulus_cache import image_paths, load_cached, preprocess, target_pixels
+
+    results = {}
+    px = target_pixels(cfg)
+    paths = [p for p in image_paths(cfg) if os.path.exists(p)]
+    results["stimuli_decode_resize"] = measure(lambda: [preprocess(p, px) for p in paths], number=1, repeat=3)
+    cache_dir = tempfile.mkdtemp(prefix="mid_bench_cache_")
+    try:
+        for p in paths:
+            load_cached(p, px, cache_dir)
+        results["stimuli_cache_load"] = measure(
+            lambda: [load_cached(p, px, cache_dir) for p in paths], number=5, repeat=5)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    try:
+        from psychopy import visual
+        win = visual.Window(size=cfg['win']['size'], visible=False, autoLog=False)
+    except Exception as e:
+        results["stimuli_imagestim"] = {"skipped": f"no PsychoPy window: {e}"}
+        return results
+    try:
+        results["stimuli_imagestim"] = measure(
+            lambda: [visual.ImageStim(win, image=p, size=0.6) for p in paths], number=1, repeat=3)
+    finally:
+        win.close()
+    return results
+
+
+class _StubStim:
+    def draw(self):
+        pass
+
+
+def bench_trial_overhead(config_path):
+    """Non-timed work of one trial in the runner: decide_target, apply_outcome and trial_row,
+    plus the draw calls of its phases on stub stimuli (one per phase, as on each phase's first frame)."""
+    from adaptive import make_adaptive
+    from compiled_config import compile_config
+    from mid_psychopy_pc_yaml import apply_outcome, decide_target, trial_row
+    from schedule import compile_schedule
+
+    ccfg = compile_config(config_path)
+    cfg = ccfg.raw
+    trials = [t for b in compile_schedule(cfg, 1)["blocks"] for t in b["trials"]]
+    stairs = {label: make_adaptive(cfg['staircase'], meta.max_ms) for label, meta in ccfg.conditions.items()}
+    if ccfg.rscore.per_condition:
+        hist = {label: deque(maxlen=ccfg.rscore.window) for label in ccfg.labels}
+    else:
+        hist = deque(maxlen=ccfg.rscore.window)
+    exp_info = {"participant": "bench", "session": "001"}
+    onsets = [f"{i * 0.5:.4f}" for i in range(len(TRIAL_PHASES))]
+    state = {"i": 0, "points": cfg['points']['start']}
+    phase_stims = [[_StubStim()] for _ in TRIAL_PHASES]
+
+    def trial():
+        i = state["i"]
+        state["i"] += 1
+        trial = trials[i % len(trials)]
+        label = trial['condition']
+        meta, stair = ccfg.conditions[label], stairs[label]
+        pre, target, rv = decide_target(ccfg, meta, stair, hist, label)
+        hit = i % 3 != 0
+        for stims in phase_stims:
+            for stim in stims:
+                stim.draw()
+        delta = apply_outcome(ccfg, meta, stair, hist, label, hit, target)
+        state["points"] += delta
+        return trial_row(exp_info, 1, i, trial, meta, ccfg.timings, ccfg.rscore, pre, target, rv,
+                         250 if hit else None, "space" if hit else None, hit, delta, state["points"], onsets)
+
+    return measure(trial, number=2000)
+
+
+def bench_logging(n_rows=5000):
+    """TrialLogger: log() latency on the trial thread and end-to-end rows/s including close()."""
+    from trial_logger import TrialLogger
+
+    row = ["p", "001", "20250101-000000", 1, 1, "WIN_LOW", 1, 1, 500, 450, 300, 1,
+           900, 1000, 1700, 250, 1000, 3, 3, "space", "global", "80.0"]
+    row += [f"{i * 0.5:.4f}" for i in range(len(TRIAL_PHASES))]  # onset_<phase>_s columns
+    tmp = tempfile.mkdtemp(prefix="mid_bench_log_")
+    try:
+        logger = TrialLogger(os.path.join(tmp, "bench.csv"), CSV_HEADERS)
+        t0 = time.perf_counter()
+        for _ in range(n_rows):
+            logger.log(row)
+        t_log = time.perf_counter() - t0
+        logger.sync()
+        logger.close(finished=True)
+        t_total = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "log_call_us": t_log / n_rows * 1e6,
+        "rows_per_s": n_rows / t_total,
+        "rows": n_rows,
+    }
+
+
+class _StubClock:
+    """Stands in for psychopy.core in frame_scheduler: time only advances in wait()."""
+
+    def __init__(self):
+        self.t = 0.0
+
+    def getTime(self):
+        return self.t
+
+    def wait(self, secs, hogCPUperiod=0.2):
+        self.t += secs
+
+    def reset(self):
+        self.t = 0.0
+
+
+class _StubWin:
+    def callOnFlip(self, fn, *args):
+        fn(*args)
+
+    def flip(self):
+        pass
+
+
+class _StubKeyboard:
+    def __init__(self):
+        self.clock = _StubClock()
+
+    def clearEvents(self):
+        pass
+
+    def getKeys(self, keyList=None, waitRelease=True):
+        return []
+
+
+def bench_polling(resp_keys, target_ms=500):
+    """ResponseCollector.poll and one target phase of the FrameScheduler deadline loop on a stub clock."""
+    try:
+        import frame_scheduler
+        from responses import ResponseCollector
+    except ImportError as e:
+        return {"polling": {"skipped": f"PsychoPy not importable: {e}"}}
+
+    results = {}
+    win = _StubWin()
+    collector = ResponseCollector(win, resp_keys)
+    collector.arm()
+    results["response_poll"] = measure(collector.poll, number=2000)  # keyboard backend, no keys pressed
+
+    # The deadline loop polls every poll_s until target_ms has passed; on the stub clock it
+    # never sleeps, so the time per iteration is the loop's own cost (stub keyboard)
+    collector.kb = _StubKeyboard()
+    real_core = frame_scheduler.core
+    frame_scheduler.core = _StubClock()
+    try:
+        scheduler = frame_scheduler.FrameScheduler(win, 1000.0 / 60, frame_locked=False)
+        n_iter = int(round(scheduler.frames_to_ms(scheduler.ms_to_frames(target_ms)) / 1000.0 / scheduler.poll_s))
+
+        def phase():
+            scheduler.begin_trial(1, 1)
+            collector.arm()
+            scheduler.present("target", [], target_ms, on_frame=lambda onset: collector.poll())
+
+        res = measure(phase, number=5, repeat=5)
+        results["deadline_loop"] = dict(res, iterations=n_iter, iteration_us=res["mean_us"] / n_iter)
+    finally:
+        frame_scheduler.core = real_core
+    return results
+
+
+def run_all(config_path):
+    """Run every benchmark; returns the JSON-serializable report."""
+    cfg = load_config(config_path)
+    results = {"config_load": bench_config(config_path),
+               "config_compiled_cached": bench_config_compiled(config_path)}
+    results.update(bench_stimuli(cfg))
+    results["trial_overhead"] = bench_trial_overhead(config_path)
+    results["logging"] = bench_logging()
+    results.update(bench_polling(cfg['task']['resp_keys']))
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.node(),
+            "config": config_path,
+        },
+        "results": results,
+    }
+
+
+# Metrics where a larger value is better
+HIGHER_IS_BETTER = {"rows_per_s"}
+
+
+def compare(report, baseline, tolerance):
+    """Return a list of (benchmark, metric, old, new) regressions beyond tolerance."""
+    regressions = []
+    for name, res in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not isinstance(old, dict):
+            continue
+        for metric in ("mean_us", "log_call_us", "rows_per_s"):
+            if metric not in res or metric not in old:
+                continue
+            new_v, old_v = res[metric], old[metric]
+            if metric in HIGHER_IS_BETTER:
+                worse = new_v < old_v * (1.0 - tolerance)
+            else:
+                worse = new_v > old_v * (1.0 + tolerance)
+            if worse:
+                regressions.append((name, metric, old_v, new_v))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the MID runner hot paths.")
+    parser.add_argument('--config', default='mid_config.yml', help='Path to YAML config.')
+    parser.add_argument('--out', default='bench_output.json', help='Where to write the JSON report.')
+    parser.add_argument('--compare', default=None, help='Baseline JSON report to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown (0.25 = 25%%).')
+    args = parser.parse_args()
+
+    report = run_all(args.config)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for name, res in report["results"].items():
+        print(f"{name:<24} {json.dumps(res)}")
+    print(f"Report written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for name, metric, old_v, new_v in regressions:
+            print(f"REGRESSION {name}.{metric}: {old_v:.2f} -> {new_v:.2f}")
+        if regressions:
+            exit(1)
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
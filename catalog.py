@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SQLite catalog of the sessions in data/.
+
+One row per trial CSV (MID_PC_* from the runner, MID_WEB_* from
+ingest_server.py) with participant, session, start time, config hash,
+trial count, completion status, final points_total and mean RT, plus one
+row per condition with its hit rate. A trial journal without its CSV
+(<csv>.journal of a session that crashed, or is still running) is indexed
+under the journal's path. update() only hashes files whose size or mtime
+changed, only parses them if the content hash changed, and drops entries
+whose file is gone. Queries use indexes on participant, status and config
+hash.
+
+Status is "complete" when the CSV has every trial of its schedule
+(<csv>.schedule.json), "aborted" when a resume checkpoint is left, trials
+are missing or only the journal exists, and "unknown" for sessions
+recorded without a schedule file.
+The config hash is the compiled config's source_hash stored in the schedule
+or, for web sessions, the config_hash of their uploaded batches
+(<csv>.batches, see ingest_server.py; empty if the batches disagree).
+
+Run:
+    python catalog.py --update
+    python catalog.py --participant P01
+    python catalog.py --status aborted
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+from trial_logger import read_journal
+
+DEFAULT_DB = os.path.join("data", "catalog.sqlite")
+CATALOG_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS sessions (
+    path TEXT PRIMARY KEY,
+    source TEXT,
+    participant TEXT,
+    session TEXT,
+    started TEXT,
+    mtime_ns INTEGER,
+    size INTEGER,
+    sha256 TEXT,
+    config_hash TEXT,
+    n_trials INTEGER,
+    n_scheduled INTEGER,
+    status TEXT,
+    final_points INTEGER,
+    mean_rt_ms REAL
+);
+CREATE TABLE IF NOT EXISTS conditions (
+    path TEXT REFERENCES sessions(path) ON DELETE CASCADE,
+    condition TEXT,
+    n_trials INTEGER,
+    hits INTEGER,
+    hit_rate REAL,
+    PRIMARY KEY (path, condition)
+);
+CREATE INDEX IF NOT EXISTS sessions_participant ON sessions(participant, session);
+CREATE INDEX IF NOT EXISTS sessions_status ON sessions(status);
+CREATE INDEX IF NOT EXISTS sessions_config ON sessions(config_hash);
+"""
+
+FILE_RE = re.compile(r"^MID_(?P<source>[A-Z]+)_.*?(?:_(?P<started>\d{8}-\d{6}))?\.csv(?:\.journal)?$")
+JOURNAL_SUFFIX = ".journal"
+
+
+def file_sha256(path):
+    """SHA-256 of a file."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def csv_of(path):
+    """The session CSV path a catalog entry belongs to (its sidecars are named after it)."""
+    return path[:-len(JOURNAL_SUFFIX)] if path.endswith(JOURNAL_SUFFIX) else path
+
+
+def session_csvs(data_dir, include_journals=False):
+    """Session CSVs in data_dir (sidecars such as <csv>.timing.csv excluded).
+
+    With include_journals, journals without a CSV (crashed sessions) are listed too;
+    only the catalog scan reads those.
+    """
+    paths = [p for p in glob.glob(os.path.join(data_dir, "MID_*.csv")) if ".csv." not in os.path.basename(p)]
+    if include_journals:
+        paths += [p for p in glob.glob(os.path.join(data_dir, "MID_*.csv" + JOURNAL_SUFFIX))
+                  if not os.path.exists(csv_of(p))]
+    return sorted(paths)
+
+
+def _trial_dicts(path):
+    """Trial rows of a CSV or journal as {column: value} dicts."""
+    if path.endswith(JOURNAL_SUFFIX):
+        headers, rows = read_journal(path)
+        return [dict(zip(headers, row)) for row in rows]
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def batches_config_hash(batches_path):
+    """The config hash shared by all batches of an ingested session, or None."""
+    with open(batches_path, "r", encoding="utf-8") as f:
+        hashes = {line.rstrip("\n").partition("\t")[2] for line in f if line.strip()}
+    if len(hashes) != 1:
+        return None
+    return hashes.pop() or None
+
+
+def session_status(path, n_trials):
+    """config_hash, n_scheduled and status of a session from its sidecars and trial count."""
+    csv_path = csv_of(path)
+    schedule_path = csv_path + ".schedule.json"
+    info = {"config_hash": None, "n_scheduled": None}
+    if os.path.exists(schedule_path):
+        with open(schedule_path, "r", encoding="utf-8") as f:
+            schedule = json.load(f)
+        info["config_hash"] = schedule.get("config_hash")
+        info["n_scheduled"] = sum(len(b["trials"]) for b in schedule["blocks"])
+    elif os.path.exists(csv_path + ".batches"):
+        info["config_hash"] = batches_config_hash(csv_path + ".batches")
+    if path != csv_path or os.path.exists(csv_path + ".checkpoint.json"):
+        info["status"] = "aborted"
+    elif info["n_scheduled"] is not None:
+        info["status"] = "complete" if n_trials >= info["n_scheduled"] else "aborted"
+    else:
+        info["status"] = "unknown"
+    return info
+
+
+def summarize_csv(path):
+    """Session metadata and per-condition hit counts of one trial CSV (or orphan journal)."""
+    m = FILE_RE.match(os.path.basename(path))
+    info = {"source": m.group("source") if m else None,
+            "started": m.group("started") if m else None,
+            "participant": None, "session": None, "n_trials": 0, "final_points": None}
+    counts, rts = {}, []
+    for row in _trial_dicts(path):
+        if info["participant"] is None:
+            info["participant"], info["session"] = row.get("participant"), row.get("session")
+        info["n_trials"] += 1
+        info["final_points"] = _int(row.get("points_total"))
+        n, hits = counts.get(row.get("condition"), (0, 0))
+        counts[row.get("condition")] = (n + 1, hits + (_int(row.get("hit")) == 1))
+        rt = row.get("rt_ms")
+        if rt not in (None, ""):
+            rts.append(float(rt))
+    info["mean_rt_ms"] = sum(rts) / len(rts) if rts else None
+    info.update(session_status(path, info["n_trials"]))
+    return info, counts
+
+
+class Catalog:
+    """Incrementally maintained index of the session CSVs in a data directory."""
+
+    def __init__(self, db_path=DEFAULT_DB, data_dir="data"):
+        self.data_dir = data_dir
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('version', ?)", (str(CATALOG_VERSION),))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def _sidecar_mtime(self, path):
+        # Schedule/checkpoint changes alter the status without touching the CSV
+        csv_path = csv_of(path)
+        return max([os.stat(path).st_mtime_ns] + [os.stat(p).st_mtime_ns for p in
+                    (csv_path + ".schedule.json", csv_path + ".checkpoint.json", csv_path + ".batches")
+                    if os.path.exists(p)])
+
+    def update(self):
+        """Bring the catalog in line with data_dir; returns counts of added/updated/unchanged/removed."""
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        known = {row["path"]: row for row in
+                 self.db.execute("SELECT path, mtime_ns, size, sha256, n_trials FROM sessions")}
+        paths = session_csvs(self.data_dir, include_journals=True)
+        with self.db:
+            for path in paths:
+                mtime_ns, size = self._sidecar_mtime(path), os.path.getsize(path)
+                row = known.get(path)
+                if row is not None and row["mtime_ns"] == mtime_ns and row["size"] == size:
+                    stats["unchanged"] += 1
+                    continue
+                digest = file_sha256(path)
+                if row is not None and row["sha256"] == digest:
+                    # Content unchanged: only the status (sidecars) and stat data may differ
+                    info = session_status(path, row["n_trials"])
+                    self.db.execute("UPDATE sessions SET mtime_ns=?, size=?, status=?, config_hash=?, "
+                                    "n_scheduled=? WHERE path=?",
+                                    (mtime_ns, size, info["status"], info["config_hash"],
+                                     info["n_scheduled"], path))
+                    stats["unchanged"] += 1
+                    continue
+                info, counts = summarize_csv(path)
+                self.db.execute("DELETE FROM sessions WHERE path=?", (path,))
+                self.db.execute(
+                    "INSERT INTO sessions VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                    (path, info["source"], info["participant"], info["session"], info["started"],
+                     mtime_ns, size, digest, info["config_hash"], info["n_trials"],
+                     info["n_scheduled"], info["status"], info["final_points"], info["mean_rt_ms"]))
+                self.db.executemany(
+                    "INSERT INTO conditions VALUES (?,?,?,?,?)",
+                    [(path, cond, n, hits, hits / n) for cond, (n, hits) in counts.items()])
+                stats["updated" if row is not None else "added"] += 1
+            gone = set(known) - set(paths)
+            self.db.executemany("DELETE FROM sessions WHERE path=?", [(p,) for p in gone])
+            stats["removed"] = len(gone)
+        return stats
+
+    def sessions(self, participant=None, session=None, status=None, config_hash=None):
+        """Sessions matching all given filters, oldest first, as dicts."""
+        where, params = [], []
+        for column, value in (("participant", participant), ("session", session),
+                              ("status", status), ("config_hash", config_hash)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT * FROM sessions" + (" WHERE " + " AND ".join(where) if where else "")
+        return [dict(row) for row in self.db.execute(sql + " ORDER BY started, path", params)]
+
+    def hit_rates(self, path):
+        """Per-condition hit rate of one session: {condition: rate}."""
+        return {row["condition"]: row["hit_rate"] for row in
+                self.db.execute("SELECT condition, hit_rate FROM conditions WHERE path=?", (path,))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query MID sessions in data/.")
+    parser.add_argument('--db', default=DEFAULT_DB, help='SQLite catalog file.')
+    parser.add_argument('--data-dir', default='data', help='Directory with session CSVs.')
+    parser.add_argument('--update', action='store_true', help='Scan data-dir for new/changed/removed sessions.')
+    parser.add_argument('--participant', default=None, help='Only sessions of this participant.')
+    parser.add_argument('--session', default=None, help='Only this session ID.')
+    parser.add_argument('--status', default=None, choices=['complete', 'aborted', 'unknown'])
+    parser.add_argument('--config-hash', default=None, help='Only sessions run with this config hash.')
+    parser.add_argument('--hit-rates', action='store_true', help='Also print per-condition hit rates.')
+    args = parser.parse_args()
+
+    catalog = Catalog(args.db, args.data_dir)
+    if args.update:
+        stats = catalog.update()
+        print(", ".join(f"{k} {v}" for k, v in stats.items()))
+    for s in catalog.sessions(args.participant, args.session, args.status, args.config_hash):
+        points = "-" if s["final_points"] is None else s["final_points"]
+        print(f"{s['path']}  {s['participant']}/{s['session']}  {s['status']:<8} "
+              f"trials {s['n_trials']}  points {points}  config {(s['config_hash'] or '-')[:12]}")
+        if args.hit_rates:
+            for cond, rate in sorted(catalog.hit_rates(s["path"]).items()):
+                print(f"    {cond:<12} {rate:.2f}")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
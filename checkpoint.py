@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Session checkpoints for the MID task.
+
+After every trial the runner snapshots the full adaptive state (each
+condition's adaptive procedure via get_state(), R-Score history, points_total,
+block/trial position, the session schedule file, the current block's trial
+order and the position of Python's `random` generator). The trial logger writes the snapshot to
+<csv>.checkpoint.json during the ITI. Resuming with
+
+    python mid_psychopy_pc_yaml.py --resume data/MID_PC_<...>.csv.checkpoint.json
+
+restarts at the next trial with identical state and appends to the same CSV.
+"""
+
+import csv
+import json
+import os
+import random
+
+from trial_logger import read_journal
+
+CHECKPOINT_VERSION = 1
+
+
+def rng_state():
+    """JSON-serializable state of the `random` module."""
+    version, internal, gauss = random.getstate()
+    return [version, list(internal), gauss]
+
+
+def restore_rng(state):
+    """Restore the `random` module from rng_state() output."""
+    version, internal, gauss = state
+    random.setstate((version, tuple(internal), gauss))
+
+
+def snapshot(exp_info, config_path, csv_path, schedule_path, block, trial, trials, cond_stair,
+             rscore_hist, points_total, rows_logged):
+    """Capture the resumable session state after a finished trial."""
+    if isinstance(rscore_hist, dict):
+        hist = {label: list(h) for label, h in rscore_hist.items()}
+    else:
+        hist = list(rscore_hist)
+    return {
+        "version": CHECKPOINT_VERSION,
+        "exp_info": dict(exp_info),
+        "config": config_path,
+        "csv_path": csv_path,
+        "schedule_path": schedule_path,
+        "block": block,
+        "trial": trial,
+        "trials": list(trials),
+        "stair": {label: s.get_state() for label, s in cond_stair.items()},
+        "rscore_hist": hist,
+        "points_total": points_total,
+        "rng_state": rng_state(),
+        "rows_logged": rows_logged,
+    }
+
+
+def load_checkpoint(path):
+    """Read a checkpoint file; exits with a message on version mismatch."""
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        print(f"ERROR: Unsupported checkpoint version in {path}")
+        exit(1)
+    return state
+
+
+def restore_adaptive_state(state, cond_stair, rscore_hist):
+    """Put staircase and R-Score history back to the checkpointed values."""
+    for label, stair_state in state["stair"].items():
+        cond_stair[label].set_state(stair_state)
+    if isinstance(rscore_hist, dict):
+        for label, hist in state["rscore_hist"].items():
+            rscore_hist[label].clear()
+            rscore_hist[label].extend(hist)
+    else:
+        rscore_hist.clear()
+        rscore_hist.extend(state["rscore_hist"])
+
+
+def prior_rows(state):
+    """Rows already logged for the session (from the journal after a crash, else the CSV)."""
+    csv_path = state["csv_path"]
+    journal = csv_path + ".journal"
+    if os.path.exists(journal):
+        _, rows = read_journal(journal)
+    elif os.path.exists(csv_path):
+        with open(csv_path, "r", newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))[1:]
+    else:
+        rows = []
+    return rows[:state["rows_logged"]]
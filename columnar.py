@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Typed columnar trial data for the MID task.
+
+Each session can be stored as a NumPy structured array (<csv>.trials.npy)
+with one fixed dtype per CSV column: integers for counts and durations,
+float32/float64 with NaN for rt_ms, rscore_value and the onset columns,
+fixed-width byte strings for IDs and labels. Missing integers are stored as
+the dtype minimum (MISSING); consumers mask them (e.g. hit == MISSING["hit"]).
+The dtype itself is the schema: SCHEMAS maps each schema version to its
+dtype, and load_trials() refuses files whose dtype matches no known version.
+A value that does not fit its field (a string longer than the field, an
+integer out of range or not whole) raises ValueError instead of being
+truncated or wrapped.
+
+pack() concatenates many sessions into one cohort file (<out>.npy, with a
+`session_index` column pointing into <out>.json), which np.load memory-maps in
+one call regardless of the number of sessions.
+
+Run:
+    python columnar.py --convert data/MID_PC_*.csv
+    python columnar.py --pack data/cohort data/MID_PC_*.csv
+    python columnar.py --info data/cohort.npy
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from utils import CSV_HEADERS
+
+SCHEMA_VERSION = 1
+
+FIELDS_V1 = [
+    ("participant", "S32"), ("session", "S16"), ("timestamp", "S32"),
+    ("block", "i2"), ("trial_index", "i4"), ("condition", "S24"),
+    ("valence", "i1"), ("magnitude", "i2"),
+    ("target_ms_pre", "i4"), ("target_ms_final", "i4"), ("rt_ms", "f4"), ("hit", "i1"),
+    ("pause1_ms", "i4"), ("pause2_ms", "i4"), ("pause3_ms", "i4"), ("cue_ms", "i4"), ("feedback_ms", "i4"),
+    ("points_change", "i4"), ("points_total", "i4"), ("key_pressed", "S16"),
+    ("rscore_scope", "S16"), ("rscore_value", "f4"),
+] + [(name, "f8") for name in CSV_HEADERS if name.startswith("onset_")]
+
+SCHEMAS = {1: np.dtype(FIELDS_V1)}
+TRIAL_DTYPE = SCHEMAS[SCHEMA_VERSION]
+
+# Cohort files add the index of the session in <out>.json
+COHORT_DTYPE = np.dtype([("session_index", "i4")] + FIELDS_V1)
+COHORT_SCHEMAS = {1: COHORT_DTYPE}
+
+MISSING = {name: np.iinfo(TRIAL_DTYPE[name]).min
+           for name in TRIAL_DTYPE.names if TRIAL_DTYPE[name].kind == "i"}
+
+
+def columnar_path(csv_path):
+    """Per-session columnar file next to a CSV."""
+    return csv_path + ".trials.npy"
+
+
+def schema_version(arr):
+    """Schema version of a trial or cohort array (None if unknown)."""
+    for version, dtype in list(SCHEMAS.items()) + list(COHORT_SCHEMAS.items()):
+        if arr.dtype == dtype:
+            return version
+    return None
+
+
+def _column(name, values, dtype, missing):
+    """Convert one column of strings/numbers/None to dtype; empty cells become `missing`.
+
+    Raises ValueError for values the field cannot hold.
+    """
+    if dtype.kind == "S":
+        encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+        for i, v in enumerate(encoded):
+            if len(v) > dtype.itemsize:
+                raise ValueError(f"row {i}: {name} {v.decode('utf-8')!r} is longer than "
+                                 f"{dtype.itemsize} bytes (schema v{SCHEMA_VERSION})")
+        return np.array(encoded, dtype=dtype)
+    raw = ["" if v is None else str(v).strip() for v in values]
+    empty = np.array([v == "" for v in raw], dtype=bool)
+    try:
+        out = np.array([float(v) if v != "" else np.nan for v in raw], dtype=np.float64)
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}")
+    if dtype.kind == "f":
+        return out.astype(dtype)
+    info = np.iinfo(dtype)
+    bad = ~empty & ~((out > info.min) & (out <= info.max) & (out == np.round(out)))
+    if np.any(bad):
+        i = int(np.argmax(bad))
+        raise ValueError(f"row {i}: {name} {raw[i]!r} does not fit {dtype.name} "
+                         f"({info.min + 1}..{info.max}, schema v{SCHEMA_VERSION})")
+    out[empty] = missing
+    return out.astype(dtype)
+
+
+def rows_to_array(headers, rows):
+    """Build a TRIAL_DTYPE array from CSV-style rows; absent columns are left missing."""
+    arr = np.empty(len(rows), dtype=TRIAL_DTYPE)
+    index = {name: i for i, name in enumerate(headers)}
+    for name in TRIAL_DTYPE.names:
+        dtype = TRIAL_DTYPE[name]
+        i = index.get(name)
+        if i is None:
+            values = [None] * len(rows)
+        else:
+            values = [row[i] if i < len(row) else None for row in rows]
+        arr[name] = _column(name, values, dtype, MISSING.get(name))
+    return arr
+
+
+def read_csv(csv_path):
+    """Parse a trial CSV into a TRIAL_DTYPE array."""
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        rows = [row for row in reader if row]
+    try:
+        return rows_to_array(headers, rows)
+    except ValueError as e:
+        raise ValueError(f"{csv_path}: {e}")
+
+
+def write_trials(path, arr):
+    """Write an array atomically as .npy."""
+    tmp = path + ".tmp.npy"
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+def load_trials(path, mmap=True):
+    """Load a per-session or cohort array (memory-mapped by default); exits on unknown schema."""
+    arr = np.load(path, mmap_mode="r" if mmap else None)
+    if schema_version(arr) is None:
+        print(f"ERROR: {path} has an unknown trial schema (dtype {arr.dtype})")
+        exit(1)
+    return arr
+
+
+def convert(csv_paths, force=False):
+    """Write <csv>.trials.npy for every CSV that is newer than its columnar copy; returns written paths."""
+    written = []
+    for csv_path in csv_paths:
+        target = columnar_path(csv_path)
+        if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(csv_path):
+            continue
+        write_trials(target, read_csv(csv_path))
+        written.append(target)
+    return written
+
+
+def pack(csv_paths, out):
+    """Concatenate sessions into <out>.npy + <out>.json (session list); returns the trial count."""
+    parts, sessions, start = [], [], 0
+    for i, csv_path in enumerate(csv_paths):
+        npy = columnar_path(csv_path)
+        if os.path.exists(npy) and os.path.getmtime(npy) >= os.path.getmtime(csv_path):
+            arr = load_trials(npy, mmap=False)
+        else:
+            arr = read_csv(csv_path)
+        part = np.empty(len(arr), dtype=COHORT_DTYPE)
+        part["session_index"] = i
+        for name in TRIAL_DTYPE.names:
+            part[name] = arr[name]
+        parts.append(part)
+        sessions.append({"csv": csv_path, "start": start, "stop": start + len(arr)})
+        start += len(arr)
+    cohort = np.concatenate(parts) if parts else np.empty(0, dtype=COHORT_DTYPE)
+    write_trials(out + ".npy", cohort)
+    with open(out + ".json", "w", encoding="utf-8") as f:
+        json.dump({"schema_version": SCHEMA_VERSION, "sessions": sessions}, f, indent=1)
+    return len(cohort)
+
+
+def load_cohort(path):
+    """Memory-map a packed cohort; returns (array, list of session dicts)."""
+    base = path[:-len(".npy")] if path.endswith(".npy") else path
+    arr = load_trials(base + ".npy")
+    with open(base + ".json", "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("schema_version") != schema_version(arr):
+        print(f"ERROR: {base}.json does not match the schema of {base}.npy")
+        exit(1)
+    return arr, manifest["sessions"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typed columnar copies of MID trial CSVs.")
+    parser.add_argument('csv', nargs='*', help='Trial CSV files (default: data/MID_*.csv).')
+    parser.add_argument('--convert', action='store_true', help='Write <csv>.trials.npy next to each CSV.')
+    parser.add_argument('--force', action='store_true', help='Rewrite columnar files that are up to date.')
+    parser.add_argument('--pack', default=None, metavar='OUT', help='Concatenate sessions into OUT.npy + OUT.json.')
+    parser.add_argument('--info', default=None, metavar='NPY', help='Show schema and size of a columnar file.')
+    args = parser.parse_args()
+
+    csv_paths = args.csv or sorted(glob.glob(os.path.join("data", "MID_*.csv")))
+    try:
+        if args.convert:
+            written = convert(csv_paths, args.force)
+            print(f"Converted {len(written)} of {len(csv_paths)} CSV files")
+        if args.pack:
+            n = pack(csv_paths, args.pack)
+            print(f"Packed {n} trials from {len(csv_paths)} sessions -> {args.pack}.npy")
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        exit(1)
+    if args.info:
+        t0 = time.perf_counter()
+        arr = np.load(args.info, mmap_mode="r")
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"{args.info}: schema v{schema_version(arr)}, {len(arr)} trials, "
+              f"{arr.nbytes / 1e6:.1f} MB, mapped in {ms:.2f} ms")
+    if not (args.convert or args.pack or args.info):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compiled, typed configuration for the MID trial loop.
+
+compile_config() turns mid_config.yml (+ text_content.yml) into frozen,
+__slots__-based parameter objects with every per-condition value resolved
+up front (staircase cap, cue image, monetary feedback image, gain text), so
+run_trial does plain attribute access instead of nested dict lookups.
+Errors are reported in two passes: load_config() lists every
+config_loader validator error and exits; only a config that passes those
+is compiled, and all unresolved per-condition mappings are then reported
+together. The compiled result is pickled in .config_cache/, keyed by the
+SHA-256 of both YAML files and of the loader/compiler source (defaults
+added to config_loader.py invalidate old entries), so repeated launches
+skip YAML parsing.
+"""
+
+import hashlib
+import os
+import pickle
+
+from config_loader import TEXT_CONTENT_PATH, load_config
+
+CACHE_DIR = ".config_cache"
+COMPILER_VERSION = 1
+
+
+def _rebuild(cls, values):
+    return cls(**values)
+
+
+class Frozen:
+    """Immutable __slots__ record; fields are set once in __init__."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is frozen")
+
+    def __reduce__(self):
+        return _rebuild, (type(self), {name: getattr(self, name) for name in self.__slots__})
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Timings(Frozen):
+    __slots__ = ("cue_ms", "feedback_ms", "pause1_ms_range", "pause2_ms_range", "pause3_ms_range")
+
+
+class StaircaseParams(Frozen):
+    __slots__ = ("method", "initial_ms", "min_ms", "max_ms", "step_ms")
+
+
+class RScoreParams(Frozen):
+    __slots__ = ("enabled", "window", "threshold", "scale", "scope", "per_condition")
+
+
+class Condition(Frozen):
+    __slots__ = ("label", "index", "valence", "magnitude", "points_hit", "points_miss",
+                 "max_ms", "cue_image", "feedback_image", "gain_text")
+
+
+class CompiledConfig(Frozen):
+    __slots__ = ("raw", "source_hash", "timings", "staircase", "rscore", "conditions", "labels")
+
+
+def source_hash(config_path):
+    """SHA-256 over the config file, text_content.yml and the compiler version."""
+    h = hashlib.sha256(f"v{COMPILER_VERSION}".encode())
+    for path in (config_path, TEXT_CONTENT_PATH):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def build(cfg, digest=""):
+    """Compile a loaded config dict; returns (CompiledConfig or None, list of errors)."""
+    errors = []
+    v = cfg['visuals']
+    cue_map = {int(k): path for k, path in v['cue_images'].items()}
+    fb_map = {int(k): path for k, path in v['monetary_feedback_images'].items()}
+    per_max = cfg['staircase']['per_condition_max_ms'] or {}
+
+    conditions = {}
+    for i, c in enumerate(cfg['conditions']):
+        label, valence, magnitude, points_hit, points_miss = c
+        magnitude = int(magnitude)
+        if magnitude not in cue_map:
+            errors.append(f"visuals.cue_images has no entry for magnitude {magnitude} (condition {label})")
+        if magnitude not in fb_map:
+            errors.append(f"visuals.monetary_feedback_images has no entry for magnitude {magnitude} (condition {label})")
+        conditions[label] = Condition(
+            label=label, index=i, valence=int(valence), magnitude=magnitude,
+            points_hit=int(points_hit), points_miss=int(points_miss),
+            max_ms=per_max.get(label, cfg['staircase']['max_ms']),
+            cue_image=cue_map.get(magnitude), feedback_image=fb_map.get(magnitude),
+            gain_text=f"+{int(points_hit)} Cent" if int(points_hit) > 0 else "+0 Cent",
+        )
+    unknown = [label for label in per_max if label not in conditions]
+    if unknown:
+        errors.append(f"staircase.per_condition_max_ms names unknown conditions: {unknown}")
+    if 'NEUTRAL' not in conditions:
+        errors.append("conditions must contain 'NEUTRAL' (used for miss feedback)")
+    if errors:
+        return None, errors
+
+    t, sc, rs = cfg['timings'], cfg['staircase'], cfg['rscore']
+    compiled = CompiledConfig(
+        raw=cfg,
+        source_hash=digest,
+        timings=Timings(cue_ms=int(t['cue_ms']), feedback_ms=int(t['feedback_ms']),
+                        pause1_ms_range=tuple(t['pause1_ms_range']),
+                        pause2_ms_range=tuple(t['pause2_ms_range']),
+                        pause3_ms_range=tuple(t['pause3_ms_range'])),
+        staircase=StaircaseParams(method=sc['method'], initial_ms=sc['initial_ms'], min_ms=sc['min_ms'],
+                                  max_ms=sc['max_ms'], step_ms=sc['step_ms']),
+        rscore=RScoreParams(enabled=bool(rs['enabled']), window=int(rs['window']),
+                            threshold=float(rs['threshold']), scale=float(rs['scale']),
+                            scope=rs['scope'], per_condition=rs['scope'] == 'per_condition'),
+        conditions=conditions,
+        labels=tuple(conditions),
+    )
+    return compiled, []
+
+
+def cache_key(digest):
+    """Cache entry name: the config's source_hash plus the code that fills in defaults and compiles.
+
+    None when the module sources are not available (frozen builds): the cache is not used then.
+    """
+    h = hashlib.sha256(digest.encode())
+    for module in ("config_loader.py", "compiled_config.py"):
+        try:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module), "rb") as f:
+                h.update(f.read())
+        except OSError:
+            return None
+    return h.hexdigest()
+
+
+def compile_config(config_path, use_cache=True):
+    """Load, validate and compile a config, using the hash-keyed cache when possible."""
+    digest = source_hash(config_path)
+    key = cache_key(digest)
+    use_cache = use_cache and key is not None
+    cache_file = os.path.join(CACHE_DIR, key[:32] + ".pickle") if use_cache else None
+    if use_cache and os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # stale or unreadable cache entry: recompile
+
+    compiled, errors = build(load_config(config_path), digest)
+    if errors:
+        print("ERROR: Invalid configuration:")
+        for error in errors:
+            print(f"  - {error}")
+        print(f"\nPlease fix these entries in your {config_path} file.")
+        exit(1)
+
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = cache_file + f".{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_file)
+    return compiled
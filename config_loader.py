@@ -9,9 +9,12 @@ import yaml
 import os
 
 
+TEXT_CONTENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'text_content.yml')
+
+
 def load_text_content():
     """Load text content from text_content.yml file."""
-    text_file = os.path.join(os.path.dirname(__file__), 'text_content.yml')
+    text_file = TEXT_CONTENT_PATH
     try:
         with open(text_file, 'r', encoding='utf-8') as f:
             return yaml.safe_load(f)
@@ -31,6 +34,7 @@ def get_default_text_content():
         'practice_end': 'Ende Übung.\nDrücken Sie eine Taste für den Start.',
         'block_start': 'Block {block_num} von {total_blocks}\n\nDrücken Sie eine Taste, um zu starten.',
         'experiment_end': 'Geschafft!\nPunkte gesamt: {total_points}\n\nVielen Dank.',
+        'kiosk_next': 'Nächste Sitzung: {participant} / {session}\n\nTaste drücken zum Starten, ESC beendet.',
         'escape_message': 'Abbruch durch Benutzer (ESC) – speichere Daten und beende...'
     }
 
@@ -54,35 +58,17 @@ def load_config(path):
     cfg['win'].setdefault('useFBO', False)
     cfg['win'].setdefault('waitBlanking', False)
     cfg['win'].setdefault('checkTiming', False)
-
-    # Validate required sections - terminate if missing
-    required_sections = {
-        'timings': 'Timing configuration',
-        'staircase': 'Staircase configuration', 
-        'rscore': 'R-Score configuration',
-        'task': 'Task configuration',
-        'conditions': 'Conditions configuration'
-    }
-    
-    missing_sections = []
-    for section, description in required_sections.items():
-        if section not in cfg or not cfg[section]:
-            missing_sections.append(f"  - {section}: {description}")
-    
-    if missing_sections:
-        print("ERROR: Missing required configuration sections:")
-        for section in missing_sections:
-            print(section)
-        print(f"\nPlease add these sections to your {path} file.")
+    cfg['win'].setdefault('refresh_hz', None)
+
+    # Validate required sections and their fields - report all errors, then terminate
+    errors = validate_config(cfg)
+    if errors:
+        print("ERROR: Invalid configuration:")
+        for error in errors:
+            print(f"  - {error}")
+        print(f"\nPlease fix these entries in your {path} file.")
         print("The program will now terminate.")
         exit(1)
-    
-    # Validate required fields within each section
-    validate_timings(cfg['timings'])
-    validate_staircase(cfg['staircase'])
-    validate_rscore(cfg['rscore'])
-    validate_task(cfg['task'])
-    validate_conditions(cfg['conditions'])
 
     # Visual defaults (these are OK to have defaults)
     cfg.setdefault('visuals', {})
@@ -91,74 +77,144 @@ def load_config(path):
     cfg['visuals'].setdefault('monetary_feedback_images', {"0": "images/MonetaryFeedbackPositiv00.png", "1": "images/MonetaryFeedbackPositiv03.png", "5": "images/MonetaryFeedbackPositiv30.png"})
     cfg['visuals'].setdefault('performance_feedback_images', {"hit": "images/PerformanceFeedbackPositiv.png", "miss": "images/PerformanceFeedbackNegativ.png"})
     cfg['visuals'].setdefault('text_font_height', 0.05)
+    cfg['visuals'].setdefault('stimulus_cache', True)
+    cfg['visuals'].setdefault('cache_dir', '.stim_cache')
+    cfg['visuals'].setdefault('prerender', True)
+
+    # Adaptive procedure defaults (these are OK to have defaults)
+    cfg['staircase'].setdefault('method', 'staircase')
+    if cfg['staircase'].get('per_condition_max_ms') is None:
+        cfg['staircase']['per_condition_max_ms'] = {}
+    cfg['staircase'].setdefault('questplus', {})
+    cfg['staircase']['questplus'].setdefault('target_hit_rate', 0.7)
+    cfg['staircase']['questplus'].setdefault('grid_step_ms', 10)
+    cfg['staircase']['questplus'].setdefault('slopes_ms', [10, 20, 40, 80])
+    cfg['staircase']['questplus'].setdefault('lapse', 0.02)
+    cfg['staircase']['questplus'].setdefault('prior_sd_ms', 150)
+
+    # Schedule constraints (these are OK to have defaults)
+    cfg['task'].setdefault('max_repeats', None)
+    cfg['task'].setdefault('counterbalance', False)
 
     # Points defaults (these are OK to have defaults)
     cfg.setdefault('points', {})
     cfg['points'].setdefault('start', 0)
+
+    # Output format defaults (these are OK to have defaults)
+    cfg.setdefault('output', {})
+    cfg['output'].setdefault('columnar', False)
+
+    # Real-time mode defaults (these are OK to have defaults)
+    if cfg.get('realtime') is None:
+        cfg['realtime'] = {}
+    cfg['realtime'].setdefault('enabled', False)
+    cfg['realtime'].setdefault('priority', 'high')
+    cfg['realtime'].setdefault('cpu', None)
+
+    # Render process defaults (these are OK to have defaults)
+    if cfg.get('render') is None:
+        cfg['render'] = {}
+    cfg['render'].setdefault('separate_process', False)
+
+    # Live monitor defaults (these are OK to have defaults)
+    if cfg.get('monitor') is None:
+        cfg['monitor'] = {}
+    cfg['monitor'].setdefault('enabled', False)
+    cfg['monitor'].setdefault('host', '127.0.0.1')
+    cfg['monitor'].setdefault('port', 8766)
+    cfg['monitor'].setdefault('queue_size', 64)
+    cfg['monitor'].setdefault('window', 12)
+    cfg['monitor'].setdefault('miss_streak', 6)
+    cfg['monitor'].setdefault('stuck_trials', 6)
+
+    # Host timing profile defaults (these are OK to have defaults)
+    if cfg.get('preflight') is None:
+        cfg['preflight'] = {}
+    cfg['preflight'].setdefault('profile_dir', '.host_profiles')
+    cfg['preflight'].setdefault('max_age_days', 30)
+    cfg['preflight'].setdefault('enforce', False)
+
+    # Web client upload defaults (these are OK to have defaults)
+    if cfg.get('ingest') is None:
+        cfg['ingest'] = {}
+    cfg['ingest'].setdefault('url', None)
+    cfg['ingest'].setdefault('batch_size', 8)
     
     return cfg
 
 
+def validate_config(cfg):
+    """Validate all required sections; returns a list of every error found."""
+    required_sections = {
+        'timings': ('Timing configuration', validate_timings),
+        'staircase': ('Staircase configuration', validate_staircase),
+        'rscore': ('R-Score configuration', validate_rscore),
+        'task': ('Task configuration', validate_task),
+        'conditions': ('Conditions configuration', validate_conditions),
+    }
+
+    errors = []
+    for section, (description, validator) in required_sections.items():
+        if section not in cfg or not cfg[section]:
+            errors.append(f"missing section {section}: {description}")
+        else:
+            errors.extend(validator(cfg[section]))
+    return errors
+
+
+def _missing(section, fields, values):
+    return [f"missing field {section}.{field}" for field in fields if field not in values]
+
+
 def validate_timings(timings):
-    """Validate timings section."""
+    """Validate timings section; returns a list of errors."""
     required_fields = ['cue_ms', 'pause1_ms_range', 'pause2_ms_range', 'pause3_ms_range', 'feedback_ms']
-    missing_fields = [field for field in required_fields if field not in timings]
-    
-    if missing_fields:
-        print("ERROR: Missing required timing fields:")
-        for field in missing_fields:
-            print(f"  - timings.{field}")
-        exit(1)
+    errors = _missing('timings', required_fields, timings)
+    for field in ['pause1_ms_range', 'pause2_ms_range', 'pause3_ms_range']:
+        value = timings.get(field)
+        if value is not None and (not isinstance(value, list) or len(value) != 2):
+            errors.append(f"timings.{field} must be a list [lo, hi]")
+    return errors
 
 
 def validate_staircase(staircase):
-    """Validate staircase section."""
+    """Validate staircase section; returns a list of errors."""
     required_fields = ['initial_ms', 'min_ms', 'max_ms', 'step_ms']
-    missing_fields = [field for field in required_fields if field not in staircase]
-    
-    if missing_fields:
-        print("ERROR: Missing required staircase fields:")
-        for field in missing_fields:
-            print(f"  - staircase.{field}")
-        exit(1)
+    errors = _missing('staircase', required_fields, staircase)
+
+    method = staircase.get('method', 'staircase')
+    if method not in ('staircase', 'questplus'):
+        errors.append(f"staircase.method must be 'staircase' or 'questplus', got '{method}'")
+    return errors
 
 
 def validate_rscore(rscore):
-    """Validate rscore section."""
+    """Validate rscore section; returns a list of errors."""
     required_fields = ['enabled', 'window', 'threshold', 'scale', 'scope']
-    missing_fields = [field for field in required_fields if field not in rscore]
-    
-    if missing_fields:
-        print("ERROR: Missing required rscore fields:")
-        for field in missing_fields:
-            print(f"  - rscore.{field}")
-        exit(1)
+    errors = _missing('rscore', required_fields, rscore)
+    if 'scope' in rscore and rscore['scope'] not in ('global', 'per_condition'):
+        errors.append(f"rscore.scope must be 'global' or 'per_condition', got '{rscore['scope']}'")
+    return errors
 
 
 def validate_task(task):
-    """Validate task section."""
+    """Validate task section; returns a list of errors."""
     required_fields = ['n_blocks', 'trials_per_block', 'resp_keys', 'show_cumulative_points', 'practice_trials']
-    missing_fields = [field for field in required_fields if field not in task]
-    
-    if missing_fields:
-        print("ERROR: Missing required task fields:")
-        for field in missing_fields:
-            print(f"  - task.{field}")
-        exit(1)
+    return _missing('task', required_fields, task)
 
 
 def validate_conditions(conditions):
-    """Validate conditions section."""
+    """Validate conditions section; returns a list of errors."""
     if not isinstance(conditions, list) or len(conditions) == 0:
-        print("ERROR: 'conditions' must be a non-empty list")
-        exit(1)
-    
+        return ["'conditions' must be a non-empty list"]
+
+    errors = []
     for i, condition in enumerate(conditions):
         if not isinstance(condition, list) or len(condition) != 5:
-            print(f"ERROR: Condition {i} must be a list with exactly 5 elements: [label, valence, magnitude, points_hit, points_miss]")
-            exit(1)
-        
+            errors.append(f"Condition {i} must be a list with exactly 5 elements: [label, valence, magnitude, points_hit, points_miss]")
+            continue
+
         label, valence, magnitude, points_hit, points_miss = condition
         if not isinstance(label, str) or not isinstance(valence, (int, float)) or not isinstance(magnitude, (int, float)):
-            print(f"ERROR: Condition {i} has invalid types. Expected: [str, number, number, number, number]")
-            exit(1)
+            errors.append(f"Condition {i} has invalid types. Expected: [str, number, number, number, number]")
+    return errors
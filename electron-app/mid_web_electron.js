@@ -258,6 +258,7 @@ async function runTrial(trialIdx, blockIdx, condLabel) {
         deltaPoints, pointsTotal, keyname || '',
         config.rscore.scope, rscoreValue || ''
     ]);
+    uploader.queue(csvData[csvData.length - 1]);
 }
 
 // Display functions
@@ -401,7 +402,15 @@ function uniformJitter(range) {
     return Math.floor(Math.random() * (max - min + 1)) + min;
 }
 
+// Optional trial upload to ingest_server.py (../ingest_upload.js, shared with the PsychoJS version)
+const uploader = createIngestUploader(
+    () => config && config.ingest,
+    () => ({participant: expInfo.participant, session: expInfo.session}));
+
 async function downloadCSV() {
+    // Send the last partial batch
+    await uploader.flush();
+
     const csvString = csvData.map(row => row.join(',')).join('\n');
     const timestamp = new Date().toISOString().replace(/[-:]/g, '').replace('T', '-').split('.')[0];
     const filename = `MID_${expInfo.participant}_${expInfo.session}_${timestamp}.csv`;
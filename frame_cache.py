@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pre-rendered static screens for the MID task.
+
+Every static screen (fixation, each cue, the target, hit/miss feedback, each
+condition's monetary feedback image with its gain text, the block screens)
+is drawn once at startup into the back buffer and captured as a single
+full-window BufferImageStim. Presenting a phase is then one textured-quad
+blit right before win.flip(), with the same draw cost whatever the screen is
+made of, and text layout never runs during the task.
+
+Screens are looked up by key and returned as the stim list that
+FrameScheduler.present()/show() take. With visuals.prerender: false, or if
+a capture fails, the original stims are returned and drawn as before.
+"""
+
+from psychopy import visual
+
+
+class FrameCache:
+    """Static screens, each pre-rendered into one BufferImageStim."""
+
+    def __init__(self, win, enabled=True):
+        self.win = win
+        self.enabled = enabled
+        self.frames = {}
+
+    def add(self, key, stims):
+        """Pre-render stims (drawn in list order) as screen `key`; returns its stim list."""
+        stims = list(stims)
+        if self.enabled:
+            try:
+                # Draws stims into the back buffer and captures the whole window
+                frame = visual.BufferImageStim(self.win, stim=stims)
+                stims = [frame]
+            except Exception as e:
+                print(f"Warning: could not pre-render screen '{key}' ({e}); drawing it directly")
+            finally:
+                self.win.clearBuffer()
+        self.frames[key] = stims
+        return stims
+
+    def __getitem__(self, key):
+        return self.frames[key]
+
+    def __len__(self):
+        return len(self.frames)
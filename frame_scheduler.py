@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Frame-locked phase scheduler for the MID task.
+
+Every trial phase is converted to a whole number of frames. With
+waitBlanking enabled the scheduler flips exactly n frames per phase; without
+vsync (WSL defaults) it keeps absolute per-phase deadlines, draws the next
+stimulus ahead of time and flips when the deadline is reached, so draw/flip
+cost never accumulates across pause1, cue, pause2, feedback and pause3.
+The realized onset of every phase is recorded via win.callOnFlip and every
+flip is reported to TimingTelemetry.
+"""
+
+from psychopy import core
+
+from timing_telemetry import TimingTelemetry
+
+
+class FrameScheduler:
+    """Present phases for a whole number of frames and record their onsets."""
+
+    def __init__(self, win, frame_ms, frame_locked, poll_s=0.001):
+        self.win = win
+        self.frame_ms = float(frame_ms)
+        self.frame_locked = frame_locked
+        self.poll_s = poll_s
+        self.reset()
+
+    def reset(self):
+        """Start a new session: session clock, telemetry and onset record begin now."""
+        self.t0 = core.getTime()
+        self.telemetry = TimingTelemetry(self.frame_ms, self.frame_locked, self.t0)
+        self.onsets = {}
+        self._trial = (None, None)
+        self.phase = None
+        self._deadline = None
+        self._stamp = None
+
+    @classmethod
+    def from_config(cls, win, cfg, profiled_hz=None):
+        """Build a scheduler from cfg['win'] (refresh_hz, waitBlanking) and the host's profiled refresh rate."""
+        frame_locked = bool(cfg['win']['waitBlanking'])
+        refresh_hz = cfg['win'].get('refresh_hz') or profiled_hz
+        if not refresh_hz and frame_locked:
+            refresh_hz = win.getActualFrameRate(nIdentical=10, nMaxFrames=120)
+        if not refresh_hz:
+            refresh_hz = 60.0
+        return cls(win, 1000.0 / refresh_hz, frame_locked)
+
+    def ms_to_frames(self, ms):
+        """Convert a duration in ms to a frame count (at least one frame)."""
+        return max(1, int(round(ms / self.frame_ms)))
+
+    def frames_to_ms(self, n_frames):
+        """Convert a frame count back to its nominal duration in ms."""
+        return n_frames * self.frame_ms
+
+    def begin_trial(self, block_idx, trial_idx):
+        """Clear the per-trial onset record."""
+        self.onsets = {}
+        self._trial = (block_idx, trial_idx)
+
+    def where(self):
+        """(block, trial, phase) being presented; phase is None on non-trial screens."""
+        return self._trial + (self.phase,)
+
+    def _on_flip(self):
+        self._stamp = core.getTime()
+
+    def _flip(self):
+        self.win.callOnFlip(self._on_flip)
+        self.win.flip()
+        self.telemetry.flip(self._stamp)
+        return self._stamp
+
+    def _start(self, name, onset, ms, n_frames):
+        self.onsets[name] = onset
+        self.telemetry.start_phase(onset, *self._trial, name, ms, self.frames_to_ms(n_frames))
+
+    def present(self, name, stims, ms, on_frame=None):
+        """Show stims for ms (rounded to frames); on_frame(onset) returning True ends the phase early."""
+        self.phase = name
+        n_frames = self.ms_to_frames(ms)
+        onset = None
+        if self.frame_locked:
+            for _ in range(n_frames):
+                for stim in stims:
+                    stim.draw()
+                t = self._flip()
+                if onset is None:
+                    onset = t
+                    self._start(name, onset, ms, n_frames)
+                if on_frame is not None and on_frame(onset):
+                    self.telemetry.end_by_response()
+                    break
+        else:
+            for stim in stims:
+                stim.draw()
+            self.wait_pending()
+            onset = self._flip()
+            self._start(name, onset, ms, n_frames)
+            self._deadline = onset + n_frames * self.frame_ms / 1000.0
+            if on_frame is not None:
+                while core.getTime() < self._deadline:
+                    if on_frame(onset):
+                        self.telemetry.end_by_response()
+                        self._deadline = core.getTime()
+                        break
+                    core.wait(self.poll_s, hogCPUperiod=0)
+        return onset
+
+    def show(self, stims):
+        """Flip a non-trial screen (instructions, block start) once the running phase is over."""
+        self.phase = None
+        for stim in stims:
+            stim.draw()
+        self.wait_pending()
+        t = self._flip()
+        self.telemetry.boundary(t)
+        return t
+
+    def wait_pending(self):
+        """Block until the deadline of the last presented phase has passed."""
+        if self._deadline is not None:
+            remaining = self._deadline - core.getTime()
+            if remaining > 0:
+                core.wait(remaining)
+            self._deadline = None
+
+    def session_time(self, t):
+        """Express a timestamp in seconds since the scheduler was created."""
+        return "" if t is None else f"{t - self.t0:.4f}"
@@ -0,0 +1,568 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Asyncio ingestion service for trial data from the web clients.
+
+mid_psychojs.js and electron-app/mid_web_electron.js POST batches of trial
+rows to /batches (ingest_upload.js) when `ingest.url` is set in mid_config.yml:
+
+    {"batch_id": "p01-001-1700000000000-3", "participant": "p01", "session": "001",
+     "config_hash": "9f2c...", "rows": [[...], ...]}
+
+Rows are lists in CSV_HEADERS order (the web clients leave out the trailing
+onset_* columns) or objects keyed by column name. Every batch goes through a
+bounded queue to one writer task, which appends groups of batches to
+<out-dir>/MID_WEB_<participant>_<session>.csv (CSV_HEADERS layout) and
+fsyncs before the HTTP response is sent, so an acknowledged batch is on
+disk. Batch IDs are logged per session in <csv>.batches, each with the
+batch's config_hash (the bundle's compiled-config hash, see web_bundle.py;
+empty for clients started without a bundle), which catalog.py reports for
+the session. A repeated batch ID is acknowledged as "duplicate" without
+writing its rows again, so clients can retry freely.
+
+Backpressure: when max_pending batches are queued, a request waits up to
+enqueue_timeout_s and is then answered 503 with Retry-After. Bodies above
+max_body_bytes get 413, a malformed Content-Length 400. One event loop
+serves all connections (HTTP/1.1 keep-alive, no thread per connection);
+file IO runs on one executor thread.
+
+Run:
+    python ingest_server.py --host 0.0.0.0 --port 8765 --out-dir data
+    python ingest_server.py --stand-in-clients 200 --batches 20
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from utils import CSV_HEADERS
+
+BATCH_ID_RE = re.compile(r"^[A-Za-z0-9_.:-]{1,128}$")
+CONFIG_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+CONTENT_LENGTH_RE = re.compile(r"^[0-9]{1,15}$")
+REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class BadBatch(ValueError):
+    """A batch that can never be stored (answered 400, the client must not retry it)."""
+
+
+class Busy(Exception):
+    """The writer queue stayed full for enqueue_timeout_s (answered 503)."""
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def safe_name(value):
+    """Restrict a participant/session ID to characters that are safe in a file name."""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", str(value))[:64] or "unknown"
+
+
+def normalize_rows(rows, headers=CSV_HEADERS):
+    """Return rows as lists in header order (missing trailing columns empty); raises BadBatch."""
+    out = []
+    for i, row in enumerate(rows):
+        if isinstance(row, dict):
+            unknown = sorted(set(row) - set(headers))
+            if unknown:
+                raise BadBatch(f"row {i}: unknown columns {unknown}")
+            row = [row.get(h) for h in headers]
+        elif not isinstance(row, list) or len(row) > len(headers):
+            raise BadBatch(f"row {i}: expected a list of at most {len(headers)} values or an object")
+        out.append(["" if v is None else v for v in row] + [""] * (len(headers) - len(row)))
+    return out
+
+
+def parse_batch(body):
+    """Decode and validate one batch; returns dict(batch_id, participant, session, config_hash, rows)."""
+    try:
+        batch = json.loads(body)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise BadBatch(f"invalid JSON: {e}")
+    if not isinstance(batch, dict):
+        raise BadBatch("batch must be a JSON object")
+    batch_id = batch.get("batch_id")
+    if not isinstance(batch_id, str) or not BATCH_ID_RE.match(batch_id):
+        raise BadBatch("batch_id must be 1-128 characters of [A-Za-z0-9_.:-]")
+    for key in ("participant", "session"):
+        if not isinstance(batch.get(key), (str, int)) or str(batch[key]) == "":
+            raise BadBatch(f"missing {key}")
+    config_hash = batch.get("config_hash") or ""
+    if config_hash and (not isinstance(config_hash, str) or not CONFIG_HASH_RE.match(config_hash)):
+        raise BadBatch("config_hash must be a 64-character hex SHA-256")
+    rows = batch.get("rows")
+    if not isinstance(rows, list) or not rows:
+        raise BadBatch("rows must be a non-empty list")
+    rows = normalize_rows(rows)
+    participant, session = str(batch["participant"]), str(batch["session"])
+    for i, row in enumerate(rows):
+        if str(row[0]) != participant or str(row[1]) != session:
+            raise BadBatch(f"row {i}: participant/session differ from the batch")
+    return {"batch_id": batch_id, "participant": participant, "session": session,
+            "config_hash": config_hash, "rows": rows}
+
+
+class SessionFile:
+    """Append-only CSV plus batch log (batch ID, config hash) of one online session."""
+
+    def __init__(self, out_dir, participant, session):
+        base = f"MID_WEB_{safe_name(participant)}_{safe_name(session)}"
+        self.csv_path = os.path.join(out_dir, base + ".csv")
+        self.batches_path = self.csv_path + ".batches"
+        self.seen = set()
+        if os.path.exists(self.batches_path):
+            with open(self.batches_path, "r", encoding="utf-8") as f:
+                self.seen = {line.split("\t")[0].strip() for line in f if line.strip()}
+        new = not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0
+        self._csv = open(self.csv_path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._csv)
+        if new:
+            self._writer.writerow(CSV_HEADERS)
+        self._batches = open(self.batches_path, "a", encoding="utf-8")
+        self._pending = {}  # batch ID -> batch log line, until sync() has made the rows durable
+
+    def has(self, batch_id):
+        """True if the batch is stored or already buffered for the next sync."""
+        return batch_id in self.seen or batch_id in self._pending
+
+    def append(self, batch_id, rows, config_hash=""):
+        """Buffer rows; the batch ID is logged (and counted as seen) only once the rows are synced."""
+        self._writer.writerows(rows)
+        self._pending[batch_id] = f"{batch_id}\t{config_hash}"
+
+    def sync(self):
+        """fsync the rows, then the batch log lines that refer to them."""
+        self._csv.flush()
+        os.fsync(self._csv.fileno())
+        if self._pending:
+            self._batches.write("".join(line + "\n" for line in self._pending.values()))
+            self._batches.flush()
+            os.fsync(self._batches.fileno())
+            self.seen.update(self._pending)
+            self._pending = {}
+
+    def discard_pending(self):
+        """Forget batches whose sync failed, so their retries are stored instead of counted as duplicates."""
+        self._pending = {}
+
+    def close(self):
+        self.sync()
+        self._csv.close()
+        self._batches.close()
+
+
+class IngestWriter:
+    """Single consumer of the batch queue; group-commits batches to their session files."""
+
+    def __init__(self, out_dir, max_pending=256, max_group=64, max_open_sessions=256):
+        self.out_dir = out_dir
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.max_group = max_group
+        self.max_open_sessions = max_open_sessions
+        self.sessions = OrderedDict()  # (participant, session) -> SessionFile, least recent first
+        self.inflight = {}  # (participant, session, batch_id) -> Future of the queued copy
+        self.stats = {"batches": 0, "rows": 0, "duplicates": 0, "busy": 0, "bad": 0}
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-io")
+        os.makedirs(out_dir, exist_ok=True)
+
+    async def submit(self, batch, timeout_s):
+        """Queue a batch and wait until it is on disk; returns "stored" or "duplicate"."""
+        key = (batch["participant"], batch["session"], batch["batch_id"])
+        fut = self.inflight.get(key)
+        if fut is None:
+            fut = asyncio.get_running_loop().create_future()
+            self.inflight[key] = fut
+            fut.add_done_callback(lambda _: self.inflight.pop(key, None))
+            try:
+                await asyncio.wait_for(self.queue.put((batch, fut)), timeout_s)
+            except asyncio.TimeoutError:
+                self.stats["busy"] += 1
+                fut.set_exception(Busy())
+        return await asyncio.shield(fut)
+
+    def _session(self, participant, session):
+        key = (participant, session)
+        sf = self.sessions.get(key)
+        if sf is None:
+            sf = self.sessions[key] = SessionFile(self.out_dir, participant, session)
+            while len(self.sessions) > self.max_open_sessions:
+                self.sessions.popitem(last=False)[1].close()
+        self.sessions.move_to_end(key)
+        return sf
+
+    def _commit(self, batches):
+        """Append a group of batches and fsync every touched session (IO thread)."""
+        results, touched = [], []
+        try:
+            for batch in batches:
+                sf = self._session(batch["participant"], batch["session"])
+                if sf.has(batch["batch_id"]):
+                    results.append("duplicate")
+                    continue
+                sf.append(batch["batch_id"], batch["rows"], batch["config_hash"])
+                if sf not in touched:
+                    touched.append(sf)
+                results.append("stored")
+            for sf in touched:
+                sf.sync()
+        except Exception:
+            # The whole group fails and is retried; unsynced batch IDs must not look stored
+            for sf in touched:
+                sf.discard_pending()
+            raise
+        return results
+
+    async def run(self):
+        """Drain the queue forever, one group commit at a time."""
+        loop = asyncio.get_running_loop()
+        while True:
+            group = [await self.queue.get()]
+            while len(group) < self.max_group and not self.queue.empty():
+                group.append(self.queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(self._io, self._commit, [b for b, _ in group])
+            except Exception as e:
+                for _, fut in group:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (batch, fut), result in zip(group, results):
+                if result == "stored":
+                    self.stats["batches"] += 1
+                    self.stats["rows"] += len(batch["rows"])
+                else:
+                    self.stats["duplicates"] += 1
+                if not fut.done():
+                    fut.set_result(result)
+
+    def close(self):
+        """Sync and close every open session file."""
+        for sf in self.sessions.values():
+            sf.close()
+        self.sessions.clear()
+        self._io.shutdown(wait=True)
+
+
+def content_length(headers):
+    """Content-Length of a parsed header dict (0 if absent); raises HttpError(400) if it is not a plain integer."""
+    value = headers.get("content-length", "").strip()
+    if not value:
+        return 0
+    if not CONTENT_LENGTH_RE.match(value):
+        raise HttpError(400, f"invalid Content-Length {value[:32]!r}")
+    return int(value)
+
+
+async def read_request(reader, max_body_bytes):
+    """Read one HTTP/1.1 request; returns (method, path, headers, body) or None on EOF."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= 100:
+            raise HttpError(400, "too many headers")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HttpError(411, "chunked bodies are not supported; send Content-Length")
+    length = content_length(headers)
+    if length > max_body_bytes:
+        raise HttpError(413, f"body larger than {max_body_bytes} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), urlsplit(target).path, headers, body
+
+
+class IngestServer:
+    """HTTP front end: /batches (POST), /health (GET), CORS preflight."""
+
+    def __init__(self, writer, max_body_bytes=1 << 20, enqueue_timeout_s=2.0,
+                 idle_timeout_s=60.0, cors_origin="*"):
+        self.writer = writer
+        self.max_body_bytes = max_body_bytes
+        self.enqueue_timeout_s = enqueue_timeout_s
+        self.idle_timeout_s = idle_timeout_s
+        self.cors_origin = cors_origin
+        self.connections = 0
+
+    async def dispatch(self, method, path, body):
+        """Return (status, payload dict or None, extra headers)."""
+        if method == "OPTIONS":
+            return 204, None, {}
+        if path == "/health" and method == "GET":
+            return 200, {"status": "ok", "queued": self.writer.queue.qsize(),
+                         "connections": self.connections, **self.writer.stats}, {}
+        if path != "/batches":
+            return 404, {"error": "not found"}, {}
+        if method != "POST":
+            return 405, {"error": "POST batches to /batches"}, {"Allow": "POST, OPTIONS"}
+        try:
+            batch = parse_batch(body)
+            result = await self.writer.submit(batch, self.enqueue_timeout_s)
+        except BadBatch as e:
+            self.writer.stats["bad"] += 1
+            return 400, {"error": str(e)}, {}
+        except Busy:
+            return 503, {"error": "busy, retry later"}, {"Retry-After": "1"}
+        except Exception as e:
+            return 500, {"error": f"write failed: {e}"}, {}
+        return 200, {"status": result, "batch_id": batch["batch_id"], "rows": len(batch["rows"])}, {}
+
+    async def send(self, stream, status, payload, extra, keep_alive):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            "Access-Control-Allow-Origin": self.cors_origin,
+            "Access-Control-Allow-Methods": "POST, GET, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type",
+            **extra,
+        }
+        head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        stream.write(head.encode("latin-1") + body)
+        await stream.drain()
+
+    async def handle(self, reader, stream):
+        """Serve one keep-alive connection."""
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader, self.max_body_bytes),
+                                                     self.idle_timeout_s)
+                except HttpError as e:
+                    await self.send(stream, e.status, {"error": str(e)}, {}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload, extra = await self.dispatch(method, path, body)
+                await self.send(stream, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            stream.close()
+
+
+async def serve(host, port, out_dir, ready=None, **options):
+    """Run writer and HTTP server until cancelled; `ready` receives (server, port) once listening."""
+    writer = IngestWriter(out_dir, max_pending=options.pop("max_pending", 256))
+    app = IngestServer(writer, **options)
+    server = await asyncio.start_server(app.handle, host, port, backlog=1024)
+    writer_task = asyncio.create_task(writer.run())
+    bound_port = server.sockets[0].getsockname()[1]
+    if ready is not None:
+        ready.set_result((app, bound_port))
+    else:
+        print(f"Ingesting trial batches on http://{host}:{bound_port}/batches -> {out_dir}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        writer_task.cancel()
+        writer.close()
+
+
+# ------------------------
+# Local stand-in client
+# ------------------------
+
+STAND_IN_CONFIG_HASH = hashlib.sha256(b"stand-in").hexdigest()
+
+
+class StandInClient:
+    """Minimal keep-alive HTTP client posting batches like the JS clients do."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.stream = None
+
+    async def post(self, path, payload):
+        """POST JSON; returns (status, decoded body, Retry-After seconds or None)."""
+        if self.stream is None:
+            self.reader, self.stream = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode()
+        self.stream.write((f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                           ).encode() + body)
+        await self.stream.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(content_length(headers))
+        if headers.get("connection", "").lower() == "close":
+            self.stream.close()
+            self.reader = self.stream = None
+        retry = float(headers["retry-after"]) if "retry-after" in headers else None
+        return status, json.loads(data) if data else None, retry
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+
+
+def stand_in_rows(participant, session, block, first_trial, n):
+    """Web-client style rows (CSV_HEADERS without the onset_* columns)."""
+    rows = []
+    for i in range(n):
+        hit = (first_trial + i) % 3 != 0
+        rows.append([participant, session, datetime.now().isoformat(), block, first_trial + i,
+                     "WIN_HIGH", 1, 5, 300, 300, 250 if hit else "", int(hit), 900, 1000, 1700,
+                     250, 1000, 5 if hit else 0, 0, "space" if hit else "", "global", ""])
+    return rows
+
+
+async def stand_in_participant(host, port, idx, n_batches, rows_per_batch, latencies):
+    """One simulated online participant; re-sends its last batch to exercise idempotency."""
+    client = StandInClient(host, port)
+    participant, session = f"standin{idx:04d}", "001"
+    duplicates = 0
+    try:
+        for seq in range(n_batches + 1):
+            resend = seq == n_batches
+            n = seq - 1 if resend else seq
+            batch = {"batch_id": f"{participant}-{session}-{n}", "participant": participant,
+                     "session": session, "config_hash": STAND_IN_CONFIG_HASH,
+                     "rows": stand_in_rows(participant, session, 1, n * rows_per_batch, rows_per_batch)}
+            while True:
+                t0 = time.perf_counter()
+                status, reply, retry = await client.post("/batches", batch)
+                latencies.append(time.perf_counter() - t0)
+                if status != 503:
+                    break
+                await asyncio.sleep(retry or 1.0)
+            if status != 200:
+                raise RuntimeError(f"{participant}: HTTP {status} {reply}")
+            duplicates += reply["status"] == "duplicate"
+    finally:
+        client.close()
+    return duplicates
+
+
+async def load_test(n_clients, n_batches, rows_per_batch, out_dir, target=None, **options):
+    """Run stand-in participants against `target` (host, port) or an in-process server."""
+    server_task = None
+    if target is None:
+        ready = asyncio.get_running_loop().create_future()
+        server_task = asyncio.create_task(serve("127.0.0.1", 0, out_dir, ready=ready, **options))
+        _app, port = await ready
+        target = ("127.0.0.1", port)
+    latencies = []
+    t0 = time.perf_counter()
+    try:
+        duplicates = await asyncio.gather(*[
+            stand_in_participant(target[0], target[1], i, n_batches, rows_per_batch, latencies)
+            for i in range(n_clients)])
+    finally:
+        elapsed = time.perf_counter() - t0
+        if server_task is not None:
+            server_task.cancel()
+            try:
+                await server_task
+            except asyncio.CancelledError:
+                pass
+    latencies.sort()
+    return {
+        "clients": n_clients,
+        "rows_sent": n_clients * n_batches * rows_per_batch,
+        "duplicates_acknowledged": sum(duplicates),
+        "elapsed_s": elapsed,
+        "rows_per_s": n_clients * n_batches * rows_per_batch / elapsed,
+        "latency_p50_ms": latencies[len(latencies) // 2] * 1000,
+        "latency_p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def count_rows(out_dir):
+    """Data rows in all MID_WEB_*.csv files of a directory."""
+    total = 0
+    for name in os.listdir(out_dir):
+        if name.startswith("MID_WEB_") and name.endswith(".csv"):
+            with open(os.path.join(out_dir, name), "r", encoding="utf-8") as f:
+                total += sum(1 for _ in f) - 1
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest batched MID trial data from the web clients.")
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on.')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on.')
+    parser.add_argument('--out-dir', default='data', help='Directory for MID_WEB_*.csv files.')
+    parser.add_argument('--max-pending', type=int, default=256, help='Queued batches before requests wait (backpressure).')
+    parser.add_argument('--max-body-kb', type=int, default=1024, help='Largest accepted request body.')
+    parser.add_argument('--enqueue-timeout', type=float, default=2.0, help='Seconds a request waits for queue space before 503.')
+    parser.add_argument('--cors-origin', default='*', help='Access-Control-Allow-Origin sent to browsers.')
+    parser.add_argument('--stand-in-clients', type=int, default=0,
+                        help='Run N local stand-in participants instead of serving (load/idempotency test).')
+    parser.add_argument('--target', default=None, help='host:port of a running server for --stand-in-clients.')
+    parser.add_argument('--batches', type=int, default=10, help='Batches per stand-in participant.')
+    parser.add_argument('--rows-per-batch', type=int, default=8, help='Trial rows per stand-in batch.')
+    args = parser.parse_args()
+
+    options = {"max_pending": args.max_pending, "max_body_bytes": args.max_body_kb * 1024,
+               "enqueue_timeout_s": args.enqueue_timeout, "cors_origin": args.cors_origin}
+
+    if not args.stand_in_clients:
+        try:
+            asyncio.run(serve(args.host, args.port, args.out_dir, **options))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.target:
+        host, _, port = args.target.rpartition(":")
+        report = asyncio.run(load_test(args.stand_in_clients, args.batches, args.rows_per_batch,
+                                       None, target=(host, int(port))))
+        print(json.dumps(report, indent=1))
+        return
+
+    out_dir = tempfile.mkdtemp(prefix="mid_ingest_")
+    try:
+        report = asyncio.run(load_test(args.stand_in_clients, args.batches, args.rows_per_batch,
+                                       out_dir, **options))
+        report["rows_on_disk"] = count_rows(out_dir)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    print(json.dumps(report, indent=1))
+    if report["rows_on_disk"] != report["rows_sent"] or report["duplicates_acknowledged"] != args.stand_in_clients:
+        print("ERROR: rows on disk do not match the rows sent exactly once")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+/**
+ * Optional upload of trial batches to ingest_server.py (config.ingest.url),
+ * shared by mid_psychojs.js and electron-app/mid_web_electron.js. Load it as a
+ * plain script before either of them.
+ * Local CSV saving is unchanged; uploads are retried with the same batch_id,
+ * which the server stores only once.
+ *
+ *   const uploader = createIngestUploader(() => config.ingest,
+ *                                         () => ({participant, session, config_hash}));
+ *   uploader.queue(row);     // posts a batch every ingest.batch_size rows
+ *   await uploader.flush();  // last partial batch at the end of the session
+ */
+function createIngestUploader(getSettings, getSession) {
+    let pending = [];
+    let seq = 0;
+    const runId = Date.now();
+    const safeId = (value) => String(value).replace(/[^A-Za-z0-9_-]/g, '_').slice(0, 48);
+
+    function settings() {
+        const s = getSettings();
+        return s && s.url ? s : null;
+    }
+
+    function queue(row) {
+        const s = settings();
+        if (!s) return;
+        pending.push(row);
+        if (pending.length >= (s.batch_size || 8)) {
+            flush();
+        }
+    }
+
+    function flush() {
+        const s = settings();
+        if (!s || pending.length === 0) return Promise.resolve();
+        const session = getSession();
+        const batch = {
+            batch_id: `${safeId(session.participant)}-${safeId(session.session)}-${runId}-${seq++}`,
+            participant: String(session.participant),
+            session: String(session.session),
+            config_hash: session.config_hash,  // bundle's compiled-config hash, if any
+            rows: pending
+        };
+        pending = [];
+        return post(s.url, batch, 0);
+    }
+
+    async function post(url, batch, attempt) {
+        let waitMs = 1000 * 2 ** attempt;
+        try {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(batch),
+                keepalive: true
+            });
+            if (response.ok) return;
+            if (response.status === 400) {
+                console.error('Upload rejected:', batch.batch_id, await response.text());
+                return;
+            }
+            const retryAfter = parseFloat(response.headers.get('Retry-After'));
+            if (!isNaN(retryAfter)) waitMs = retryAfter * 1000;
+        } catch (err) {
+            console.warn('Upload failed, retrying:', batch.batch_id, err);
+        }
+        if (attempt >= 5) {
+            console.error('Giving up on upload of batch', batch.batch_id);
+            return;
+        }
+        await new Promise(resolve => setTimeout(resolve, waitMs));
+        return post(url, batch, attempt + 1);
+    }
+
+    return {queue, flush};
+}
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Warm multi-session (kiosk) runner for the MID task.
+
+One process imports PsychoPy, opens the window and pre-renders every screen
+once; sessions then run back to back on that window. Between sessions only
+the per-session state is rebuilt (staircases, R-Score history, points,
+schedule, CSV logger, timing telemetry), so the next title screen is up in
+well under a second. `<csv>.startup.json` of each session records the
+time from the experimenter's go to the first screen.
+
+Sessions come from a queue file, one `participant,session[,config]` line per
+session (blank lines and # comments are ignored), or, without --queue, from
+the participant dialog before every session. An entry with another config
+rebuilds the screens on the same window; the window itself is only reopened
+when that config's `win` settings differ.
+
+Before each queued session after the first, a screen names the next
+participant and waits for a response key; ESC there ends the kiosk. ESC
+inside a session aborts that session only (resume it later with
+mid_psychopy_pc_yaml.py --resume <csv>.checkpoint.json).
+
+Run:
+    python kiosk.py --queue queue.csv
+    python kiosk.py --config mid_config.yml
+"""
+
+import argparse
+import csv
+import os
+
+from compiled_config import compile_config
+from mid_psychopy_pc_yaml import (SessionAborted, open_display, participant_dialog, run_session,
+                                  session_csv_path)
+from preflight import startup_check
+from startup import StartupTimeline, import_psychopy, start_task
+from stimulus_cache import preload
+
+
+def read_queue(path, default_config):
+    """Queue entries as dicts (participant, session, config)."""
+    entries = []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for line_no, row in enumerate(csv.reader(f), start=1):
+            row = [cell.strip() for cell in row]
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+            if len(row) < 2:
+                print(f"ERROR: {path}:{line_no}: expected participant,session[,config]")
+                exit(1)
+            config = row[2] if len(row) > 2 and row[2] else default_config
+            if not os.path.exists(config):
+                print(f"ERROR: {path}:{line_no}: config not found: {config}")
+                exit(1)
+            entries.append({"participant": row[0], "session": row[1], "config": config})
+    return entries
+
+
+def dialog_entries(config_path):
+    """Entries from the participant dialog, one per session, until it is cancelled."""
+    exp_info = {"participant": "", "session": "001"}
+    while participant_dialog(exp_info):
+        yield {"participant": exp_info["participant"], "session": exp_info["session"], "config": config_path}
+
+
+def wait_for_next(display, entry):
+    """Show the next participant; False if the experimenter pressed ESC."""
+    from psychopy import event, visual
+
+    cfg = display.cfg
+    text = cfg['text']['kiosk_next'].format(**entry)
+    display.scheduler.show([visual.TextStim(display.win, text=text, color=cfg['win']['text_color'],
+                                            height=cfg['visuals']['text_font_height'], font=cfg['win']['font'])])
+    event.clearEvents()
+    keys = event.waitKeys(keyList=cfg['task']['resp_keys'] + ['escape'])
+    return 'escape' not in keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run MID sessions back to back in one warm process and window.")
+    parser.add_argument('--queue', default=None, help='File with one participant,session[,config] line per session.')
+    parser.add_argument('--config', default='mid_config.yml', help='Config for dialog sessions and queue lines without one.')
+    args = parser.parse_args()
+
+    timeline = StartupTimeline()
+    imports = start_task(timeline, "import_psychopy", import_psychopy)
+    entries = read_queue(args.queue, args.config) if args.queue else dialog_entries(args.config)
+    imports.result()
+    from psychopy import core
+
+    display, n_done, n_aborted = None, 0, 0
+    for entry in entries:
+        if display is not None and args.queue and not wait_for_next(display, entry):
+            break
+        # Per-session timeline: from the go for this session to its first screen
+        session_timeline = timeline if display is None else StartupTimeline()
+        with session_timeline.stage("config"):
+            ccfg = compile_config(entry["config"])
+        if display is None:
+            startup_check(ccfg.raw)  # timing profile of this host (preflight.py)
+        if display is None or display.config_hash != ccfg.source_hash:
+            cfg = ccfg.raw
+            win = None
+            if display is not None:
+                if display.cfg['win'] == cfg['win']:
+                    win = display.win
+                else:
+                    display.win.close()
+            arrays = preload(cfg) if cfg['visuals']['stimulus_cache'] else {}
+            display = open_display(cfg, ccfg, arrays, session_timeline, win)
+
+        exp_info = {"participant": entry["participant"], "session": entry["session"]}
+        csv_path = session_csv_path(exp_info)
+        print(f"Session {n_done + n_aborted + 1}: {exp_info['participant']}/{exp_info['session']} -> {csv_path}")
+        try:
+            points = run_session(display, ccfg, entry["config"], exp_info, csv_path, session_timeline)
+            n_done += 1
+            print(f"Finished {csv_path} ({points} points)")
+        except SessionAborted:
+            n_aborted += 1
+            print(f"Aborted {csv_path}; resume with: python mid_psychopy_pc_yaml.py "
+                  f"--resume {csv_path}.checkpoint.json")
+
+    print(f"Kiosk done: {n_done} sessions finished, {n_aborted} aborted")
+    if display is not None:
+        display.win.close()
+    core.quit()
+
+
+if __name__ == "__main__":
+    main()
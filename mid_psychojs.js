@@ -30,6 +30,10 @@ let rscoreHist;
 let pointsTotal = 0;
 let condMeta = {};
 
+// Precompiled bundle (web_bundle.py): config, text, schedule, hashed images
+let bundle = null;
+let sessionSchedule = null;
+
 /**
  * Initialize the PsychoJS experiment
  */
@@ -69,9 +73,13 @@ async function showInfoDialog() {
 }
 
 /**
- * Load YAML configuration
+ * Load configuration: the precompiled bundle named in index.html, else the YAML files
  */
 async function loadConfig() {
+    const bundleMeta = document.querySelector('meta[name="mid-bundle"]');
+    if (bundleMeta) {
+        return loadBundle(bundleMeta.content);
+    }
     try {
         const response = await fetch('mid_config.yml');
         const yamlText = await response.text();
@@ -90,6 +98,47 @@ async function loadConfig() {
     }
 }
 
+/**
+ * Load the bundle built by web_bundle.py: no YAML parsing, schedule chosen by
+ * participant/session, all images fetched before the first trial
+ */
+async function loadBundle(url) {
+    try {
+        const response = await fetch(url);
+        bundle = await response.json();
+        config = bundle.config;
+        config.text = bundle.text;
+
+        // Image paths -> content-hashed assets
+        config.visuals.target_image = bundle.images.target;
+        config.visuals.performance_feedback_images = {hit: bundle.images.hit, miss: bundle.images.miss};
+        for (const cond of Object.values(bundle.conditions)) {
+            config.visuals.cue_images[cond.magnitude.toString()] = cond.cue_image;
+            config.visuals.monetary_feedback_images[cond.magnitude.toString()] = cond.feedback_image;
+        }
+
+        // Same participant/session -> same schedule (e.g. after a reload)
+        const index = hashString(`${expInfo.participant}|${expInfo.session}`) % bundle.schedules.length;
+        sessionSchedule = bundle.schedules[index];
+
+        await Promise.all(bundle.preload.map(asset => preloadImage(asset.path)));
+        console.log('Bundle loaded:', url, 'schedule seed', sessionSchedule.seed);
+        return core.Scheduler.Event.NEXT;
+    } catch (error) {
+        console.error('Error loading bundle:', error);
+        return core.Scheduler.Event.QUIT;
+    }
+}
+
+function preloadImage(path) {
+    return new Promise((resolve, reject) => {
+        const img = new Image();
+        img.onload = resolve;
+        img.onerror = () => reject(new Error(`Could not load ${path}`));
+        img.src = path;
+    });
+}
+
 /**
  * Setup experiment stimuli and data structures
  */
@@ -226,7 +275,15 @@ async function runExperiment() {
             await showScreen(blockMsg);
         }
         
-        // Generate trial list
+        // Trial list: precompiled schedule (main blocks) or randomized here
+        if (sessionSchedule) {
+            const block = sessionSchedule.blocks.find(b => b.block === blockIdx + 1);
+            for (let trialIdx = 0; trialIdx < block.trials.length; trialIdx++) {
+                const [condIdx, pause1Ms, pause2Ms, pause3Ms] = block.trials[trialIdx];
+                await runTrial(trialIdx, blockIdx, bundle.labels[condIdx], [pause1Ms, pause2Ms, pause3Ms]);
+            }
+            continue;
+        }
         const trials = makeTrials(trialsPerBlock);
         
         // Run trials
@@ -246,15 +303,17 @@ async function runExperiment() {
 /**
  * Run a single trial
  */
-async function runTrial(trialIdx, blockIdx, condLabel) {
+async function runTrial(trialIdx, blockIdx, condLabel, pauses = null) {
     const meta = condMeta[condLabel];
     const stair = condStaircase[condLabel];
     
     // Get timing parameters
     const cueMs = config.timings.cue_ms;
-    const pause1Ms = uniformJitter(config.timings.pause1_ms_range);
-    const pause2Ms = uniformJitter(config.timings.pause2_ms_range);
-    const pause3Ms = uniformJitter(config.timings.pause3_ms_range);
+    const [pause1Ms, pause2Ms, pause3Ms] = pauses || [
+        uniformJitter(config.timings.pause1_ms_range),
+        uniformJitter(config.timings.pause2_ms_range),
+        uniformJitter(config.timings.pause3_ms_range)
+    ];
     const feedbackMs = config.timings.feedback_ms;
     
     // Get target duration from staircase
@@ -366,6 +425,7 @@ async function runTrial(trialIdx, blockIdx, condLabel) {
         deltaPoints, pointsTotal, keyname || '',
         config.rscore.scope, rscoreValue || ''
     ]);
+    uploader.queue(csvData[csvData.length - 1]);
 }
 
 /**
@@ -473,10 +533,19 @@ function makeTrials(nTrials) {
     return trials;
 }
 
+// Optional trial upload to ingest_server.py (ingest_upload.js, shared with the Electron version)
+const uploader = createIngestUploader(
+    () => config && config.ingest,
+    () => ({participant: expInfo.participant, session: expInfo.session,
+            config_hash: bundle ? bundle.config_hash : undefined}));  // ties the rows to the bundled config
+
 /**
  * End experiment and save data
  */
 async function endExperiment() {
+    // Send the last partial batch
+    await uploader.flush();
+
     // Convert CSV data to string
     const csvString = csvData.map(row => row.join(',')).join('\n');
     
@@ -510,6 +579,18 @@ function uniformJitter(range) {
     return Math.floor(Math.random() * (max - min + 1)) + min;
 }
 
+/**
+ * Utility: FNV-1a hash of a string (schedule choice)
+ */
+function hashString(text) {
+    let h = 0x811c9dc5;
+    for (let i = 0; i < text.length; i++) {
+        h ^= text.charCodeAt(i);
+        h = Math.imul(h, 0x01000193) >>> 0;
+    }
+    return h;
+}
+
 /**
  * Utility: Convert ms to frames (assuming 60Hz)
  */
@@ -17,15 +17,29 @@ Requires:
     pip install psychopy pyyaml
 """
 
-import os, csv, random, argparse
+import os, argparse
 from collections import deque
+from types import SimpleNamespace
 from datetime import datetime
 
 import yaml
-from psychopy import visual, core, event, gui
 
-from config_loader import load_config
-from utils import timestamp, uniform_jitter, StaircaseAdaptive
+# PsychoPy (and the modules built on it) is imported in main() on a worker
+# thread while the dialog is open; see startup.py
+from startup import StartupTimeline, import_psychopy, start_task
+from startup import print_summary as print_startup_summary
+from compiled_config import compile_config
+from utils import CSV_HEADERS, TRIAL_PHASES, timestamp, rscore_target
+from adaptive import make_adaptive
+from timing_telemetry import print_summary
+from realtime import RealtimeMode
+from realtime import print_summary as print_realtime_summary
+from monitor import LiveMonitor
+from preflight import profile_refresh_hz, startup_check, verify_refresh
+from stimulus_cache import load_cached, preload, target_pixels
+from trial_logger import TrialLogger
+from schedule import compile_schedule, load_schedule, write_schedule
+from checkpoint import load_checkpoint, prior_rows, restore_adaptive_state, restore_rng, snapshot
 
 import sys, os
 
@@ -38,88 +52,74 @@ ROOT = app_root()
 os.chdir(ROOT)
 
 # ------------------------
-# Main
+# Display (window + pre-rendered screens; reused across sessions by kiosk.py)
 # ------------------------
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--config', default='mid_config.yml', help='Path to YAML config.')
-    args = parser.parse_args()
+class SessionAborted(Exception):
+    """ESC inside a session; the session's files are already written."""
 
-    cfg = load_config(args.config)
 
-    # Participant dialog
-    exp_info = {"participant": "", "session": "001"}
-    try:
-        dlg = gui.DlgFromDict(exp_info, title="MID Task (PC)")
-        if not dlg.OK:
-            core.quit()
-    except Exception:
-        print("GUI unavailable – using defaults:", exp_info)
-
-    # Output
-    base_name = f"MID_PC_{exp_info['participant']}_{exp_info['session']}_{timestamp()}"
-    out_dir = "data"
-    os.makedirs(out_dir, exist_ok=True)
-    csv_path = os.path.join(out_dir, base_name + ".csv")
+def open_display(cfg, ccfg, image_arrays, timeline, win=None):
+    """Open the window (or reuse `win`) and build the scheduler, response collector and all screens of a config."""
+    from psychopy import visual
+    from frame_scheduler import FrameScheduler
+    from frame_cache import FrameCache
+    from responses import ResponseCollector
 
     # Window
-    win = visual.Window(
-        size=cfg['win']['size'],
-        fullscr=cfg['win']['fullscr'],
-        color=cfg['win']['screen_color'],
-        units="height",
-        allowGUI=False,
-        waitBlanking=cfg['win']['waitBlanking'],
-        checkTiming=cfg['win']['checkTiming'],
-        useFBO=cfg['win']['useFBO'],
-        autoLog=False
-    )
-    # Ensure window presents at least one frame before first draw
-    win.flip()
+    t_stage = timeline.elapsed_ms()
+    if win is None:
+        win = visual.Window(
+            size=cfg['win']['size'],
+            fullscr=cfg['win']['fullscr'],
+            color=cfg['win']['screen_color'],
+            units="height",
+            allowGUI=False,
+            waitBlanking=cfg['win']['waitBlanking'],
+            checkTiming=cfg['win']['checkTiming'],
+            useFBO=cfg['win']['useFBO'],
+            autoLog=False
+        )
+        # Ensure window presents at least one frame before first draw
+        win.flip()
+
+    # Frame-locked phase timing and timestamped key capture; the refresh rate comes from
+    # win.refresh_hz or this host's timing profile (preflight.py), confirmed when vsync is on
+    profiled_hz = None if cfg['win']['refresh_hz'] else profile_refresh_hz(cfg)
+    if profiled_hz and cfg['win']['waitBlanking']:
+        profiled_hz = verify_refresh(win, profiled_hz)
+    scheduler = FrameScheduler.from_config(win, cfg, profiled_hz)
+    responses = ResponseCollector(win, cfg['task']['resp_keys'])
+    timeline.add("window", t_stage, timeline.elapsed_ms())
+
+    # Image stimuli come from the preprocessed on-disk cache when enabled
+    # (arrays were read on a worker thread; textures are created here)
+    image_px = target_pixels(cfg, 0.6)
+    t_stage = timeline.elapsed_ms()
+
+    def image_stim(image_path):
+        if not cfg['visuals']['stimulus_cache']:
+            return visual.ImageStim(win, image=image_path, size=0.6)
+        if image_path not in image_arrays:
+            image_arrays[image_path] = load_cached(image_path, image_px, cfg['visuals']['cache_dir'])
+        return visual.ImageStim(win, image=image_arrays[image_path], size=0.6, colorSpace='rgb')
 
     # Stimuli
     fixation = visual.TextStim(win, text="+", color=cfg['win']['fixation_color'],
                                height=cfg['visuals']['text_font_height'], font=cfg['win']['font'])
 
-    instr = visual.TextStim(
-        win,
-        text=("Monetary Incentive Delay (MID)\n\n"
-              "Fixieren Sie die Mitte.\n"
-              "Kurz darauf erscheint ein Ziel (Kreis). Drücken Sie so schnell wie möglich die Leertaste, "
-              "solange das Ziel sichtbar ist.\n\n"
-              "Sie können Punkte gewinnen oder Verluste vermeiden – je nach Hinweis.\n"
-              "Drücken Sie eine Taste, um zu starten."),
-        color=cfg['win']['text_color'], height=cfg['visuals']['text_font_height'],
-        wrapWidth=1.2, font=cfg['win']['font'], alignText="center"
-    )
-
-    feedback_text = visual.TextStim(
-        win, text="", color=cfg['win']['text_color'],
-        height=cfg['visuals']['text_font_height'], font=cfg['win']['font']
-    )
+    # Conditions
+    cond_meta = ccfg.conditions
 
-    # Points & Conditions
-    points_total = cfg['points']['start']
-    cond_meta = {
-        c[0]: {"valence": int(c[1]), "magnitude": int(c[2]),
-               "points_hit": int(c[3]), "points_miss": int(c[4])}
-        for c in cfg['conditions']
-    }
-
-    # Map conditions to cue images based on magnitude
-    cue_image_map = {int(k): v for k, v in cfg['visuals']['cue_images'].items()}
-    cond_cue_image = {label: cue_image_map[meta["magnitude"]] for label, meta in cond_meta.items()}
-    
-    # Map conditions to monetary feedback images based on magnitude
-    monetary_feedback_map = {int(k): v for k, v in cfg['visuals']['monetary_feedback_images'].items()}
-    cond_monetary_feedback = {label: monetary_feedback_map[meta["magnitude"]] for label, meta in cond_meta.items()}
+    # Cue and monetary feedback images per condition (resolved by magnitude at compile time)
+    cond_cue_image = {label: meta.cue_image for label, meta in cond_meta.items()}
+    cond_monetary_feedback = {label: meta.feedback_image for label, meta in cond_meta.items()}
 
     # Load cue images
     cue_images = {}
     for label, image_path in cond_cue_image.items():
         if os.path.exists(image_path):
-            cue_images[label] = visual.ImageStim(win, image=image_path, size=0.6)
+            cue_images[label] = image_stim(image_path)
         else:
             print(f"Warning: Cue image not found: {image_path}")
             # Fallback to text
@@ -128,7 +128,7 @@ def main():
     # Load target image
     target_image_path = cfg['visuals']['target_image']
     if os.path.exists(target_image_path):
-        target_stim = visual.ImageStim(win, image=target_image_path, size=0.6)
+        target_stim = image_stim(target_image_path)
     else:
         print(f"Warning: Target image not found: {target_image_path}")
         # Fallback to text
@@ -139,7 +139,7 @@ def main():
     for label, image_path in cond_monetary_feedback.items():
         if os.path.exists(image_path):
             # All images use consistent size (0.6) for visual uniformity
-            monetary_feedback_images[label] = visual.ImageStim(win, image=image_path, size=0.6)
+            monetary_feedback_images[label] = image_stim(image_path)
         else:
             print(f"Warning: Monetary feedback image not found: {image_path}")
             # Fallback to text
@@ -148,14 +148,9 @@ def main():
     # Create monetary gain text stimuli (displayed in upper third)
     monetary_gain_text = {}
     for label, meta in cond_meta.items():
-        points = meta["points_hit"]
-        if points > 0:
-            gain_text = f"+{points} Cent"
-        else:
-            gain_text = "+0 Cent"
         monetary_gain_text[label] = visual.TextStim(
             win, 
-            text=gain_text, 
+            text=meta.gain_text, 
             color='white',      # White text for visibility
             height=0.1,         # Even larger text for better visibility
             font=cfg['win']['font'],
@@ -167,100 +162,339 @@ def main():
     performance_feedback_images = {}
     for key, image_path in cfg['visuals']['performance_feedback_images'].items():
         if os.path.exists(image_path):
-            performance_feedback_images[key] = visual.ImageStim(win, image=image_path, size=0.6)
+            performance_feedback_images[key] = image_stim(image_path)
         else:
             print(f"Warning: Performance feedback image not found: {image_path}")
             # Fallback to text
             performance_feedback_images[key] = visual.TextStim(win, text="?", color=cfg['win']['text_color'], height=0.12, font=cfg['win']['font'])
+    timeline.add("stimuli", t_stage, timeline.elapsed_ms())
+
+    # Static screens, each pre-rendered once into a single buffer (one blit per phase)
+    t_stage = timeline.elapsed_ms()
+    frames = FrameCache(win, cfg['visuals']['prerender'])
+    frames.add("fixation", [fixation])
+    frames.add("target", [target_stim])
+    for key, stim in performance_feedback_images.items():
+        frames.add(f"perf_{key}", [stim])
+    for label in cond_meta:
+        frames.add(f"cue_{label}", [cue_images[label]])
+        # Gain text ON TOP of the monetary feedback image (e.g., "+30 Cent")
+        frames.add(f"money_{label}", [monetary_feedback_images[label], monetary_gain_text[label]])
+    screen_text = dict(color=cfg['win']['text_color'], height=cfg['visuals']['text_font_height'], font=cfg['win']['font'])
+
+    # 1️⃣ Startscreen (Title)
+    frames.add("title", [
+        visual.TextStim(win, text=cfg['text']['title'], color=cfg['win']['text_color'], height=0.15,
+                        font=cfg['win']['font'], alignText="center"),
+        visual.TextStim(win, text=cfg['text']['subtitle'], pos=(0, -0.1), **screen_text),
+        visual.TextStim(win, text=cfg['text']['start_instruction'], pos=(0, -0.25), **screen_text),
+    ])
+    # 2️⃣ Kurzanleitung
+    frames.add("instructions", [visual.TextStim(win, text=cfg['text']['task_instructions'], wrapWidth=1.2,
+                                                alignText="center", **screen_text)])
+    for b in range(1, cfg['task']['n_blocks'] + 1):
+        frames.add(f"block_{b}", [visual.TextStim(win, text=cfg['text']['block_start'].format(
+            block_num=b, total_blocks=cfg['task']['n_blocks']), **screen_text)])
+    frames.add("practice_end", [visual.TextStim(win, text=cfg['text']['practice_end'], **screen_text)])
+    # The end screen shows the final points, so only its text is set at the end
+    end_text = visual.TextStim(win, text="", **screen_text)
+    timeline.add("prerender", t_stage, timeline.elapsed_ms())
+
+    return SimpleNamespace(
+        win=win, cfg=cfg, config_hash=ccfg.source_hash, scheduler=scheduler, responses=responses,
+        frames=frames, end_text=end_text,
+        # Per-condition frame lists resolved once (no lookups or string building inside the trial)
+        cue_frames={label: frames[f"cue_{label}"] for label in cond_meta},
+        money_frames={label: frames[f"money_{label}"] for label in cond_meta},
+        perf_frames={True: frames["perf_hit"], False: frames["perf_miss"]},
+    )
+
+
+def participant_dialog(exp_info):
+    """Ask for participant/session (in place); False if the dialog was cancelled."""
+    try:
+        from psychopy import gui
+        dlg = gui.DlgFromDict(exp_info, title="MID Task (PC)")
+        if not dlg.OK:
+            return False
+    except Exception:
+        print("GUI unavailable – using defaults:", exp_info)
+    return True
+
+
+def session_csv_path(exp_info, out_dir="data"):
+    """New data/MID_PC_<participant>_<session>_<timestamp>.csv path."""
+    base_name = f"MID_PC_{exp_info['participant']}_{exp_info['session']}_{timestamp()}"
+    os.makedirs(out_dir, exist_ok=True)
+    return os.path.join(out_dir, base_name + ".csv")
+
+
+# ------------------------
+# Trial
+# ------------------------
+
+def decide_target(ccfg, meta, stair, rscore_hist, cond_label):
+    """Target duration of the next trial: (target_ms_pre, target_ms, rscore_value)."""
+    rscore = ccfg.rscore
+    # Target duration from staircase
+    target_ms_pre = stair.get_ms()
+
+    # R-Score rule
+    if rscore.enabled:
+        hist = rscore_hist[cond_label] if rscore.per_condition else rscore_hist  # per_condition / global
+        target_ms, rscore_value = rscore_target(target_ms_pre, hist, rscore.threshold,
+                                                rscore.scale, ccfg.staircase.min_ms)
+    else:
+        target_ms, rscore_value = target_ms_pre, ''
+
+    # respect per-condition max and global max (resolved at compile time)
+    return target_ms_pre, min(target_ms, meta.max_ms), rscore_value
+
+
+def apply_outcome(ccfg, meta, stair, rscore_hist, cond_label, hit, target_ms):
+    """Update staircase (at the presented target_ms) and R-Score history; returns the points change."""
+    stair.update(hit, target_ms)
+    if ccfg.rscore.per_condition:
+        rscore_hist[cond_label].append(1 if hit else 0)
+    else:
+        rscore_hist.append(1 if hit else 0)
+    return meta.points_hit if hit else meta.points_miss
+
+
+def trial_row(exp_info, block_idx, trial_idx, trial, meta, timings, rscore, target_ms_pre, target_ms,
+              rscore_value, rt, keyname, hit, delta_points, points_total, onsets):
+    """One CSV row (CSV_HEADERS layout); onsets are the formatted per-phase onset columns."""
+    return [
+        exp_info["participant"], exp_info["session"], timestamp(), block_idx, trial_idx, trial['condition'],
+        meta.valence, meta.magnitude, target_ms_pre, target_ms,
+        rt if rt is not None else "", int(hit),
+        trial['pause1_ms'], trial['pause2_ms'], trial['pause3_ms'], timings.cue_ms, timings.feedback_ms,
+        delta_points, points_total, keyname or "",
+        rscore.scope, rscore_value,
+    ] + list(onsets)
+
+
+class TrialPresenter:
+    """Frame-timed presentation and response capture of one trial on an open display."""
+
+    def __init__(self, display, realtime, timings, abort):
+        from psychopy import event
+        self.display = display
+        self.scheduler = display.scheduler
+        self.responses = display.responses
+        self.realtime = realtime
+        self.timings = timings
+        self.abort = abort
+        self._get_keys = event.getKeys
+        self._clear_events = event.clearEvents
+        self._poll = self.poll_response  # bound once; called every frame of the target
+
+    def check_escape(self):
+        if 'escape' in self._get_keys():
+            self.abort()
+
+    def poll_response(self, onset):
+        responded = self.responses.poll()
+        if self.responses.escape:
+            self.abort()
+        return responded
+
+    def trial(self, block_idx, trial_idx, trial, target_ms, after_target=None, in_pause3=None):
+        """Present pause1 ... pause3 and return (hit, rt_ms, key name).
+
+        after_target(hit, rt_ms, key) runs at target offset, in_pause3(hit, rt_ms, key) right after
+        the first pause3 flip (logging, checkpoint, GC), so its cost is absorbed by pause3.
+        """
+        display, scheduler, responses = self.display, self.scheduler, self.responses
+        cond_label = trial['condition']
+        check_escape = self.check_escape
+
+        # Timing from config
+        cue_ms = self.timings.cue_ms
+        fb_ms = self.timings.feedback_ms
+
+        scheduler.begin_trial(block_idx, trial_idx)
+        self.realtime.begin_trial()  # real-time mode: no automatic GC until pause3
+
+        # ITI/pause1 (jitters precompiled in the session schedule)
+        scheduler.present("pause1", display.frames["fixation"], trial['pause1_ms']); check_escape()
+
+        # Cue
+        scheduler.present("cue", display.cue_frames[cond_label], cue_ms); check_escape()
+
+        # Anticipation == pause2
+        scheduler.present("pause2", display.frames["fixation"], trial['pause2_ms']); check_escape()
+
+        # Target + response (target ends at the flip of the feedback phase)
+        self._clear_events()
+        responses.arm()
+        scheduler.present("target", display.frames["target"], target_ms, on_frame=self._poll)
+
+        # Hit criterion (only responses inside the target window count)
+        responded = self._poll(None)
+        hit = (responded and responses.rt_ms <= target_ms)
+        if after_target is not None:
+            after_target(hit, responses.rt_ms, responses.key_name)
+
+        # Show performance feedback image first
+        scheduler.present("feedback_perf", display.perf_frames[bool(hit)], fb_ms); check_escape()
+
+        # Show monetary feedback image second
+        # If miss (negative performance), always show 0 points feedback regardless of condition
+        # (the neutral screen with "+0 Cent"; hits show the condition's screen)
+        scheduler.present("feedback_money", display.money_frames[cond_label if hit else "NEUTRAL"], fb_ms); check_escape()
+
+        # Pause3 (post-feedback); the trial's bookkeeping runs right after its first flip
+        outcome = []
+
+        def in_pause3_frame(onset):
+            if not outcome:
+                # Late responses (after target offset) are still logged, but never count as hits;
+                # an ESC seen here aborts only after the finished trial is logged
+                responses.poll()
+                outcome.append((hit, responses.rt_ms, responses.key_name))
+                if in_pause3 is not None:
+                    in_pause3(*outcome[0])
+                if responses.escape:
+                    self.abort()
+            return False
+
+        scheduler.present("pause3", display.frames["fixation"], trial['pause3_ms'], on_frame=in_pause3_frame)
+        check_escape()
+        return outcome[0]
+
+
+# ------------------------
+# Session
+# ------------------------
+
+def write_timing_reports(scheduler, realtime, csv_path):
+    """Stop real-time mode; write and print timing telemetry and the GC report of a session."""
+    try:
+        print_summary(scheduler.telemetry.write(csv_path))
+    except Exception as e:
+        print(f"Warning: could not write timing telemetry: {e}")
+    realtime.stop()
+    try:
+        print_realtime_summary(realtime.write(csv_path))
+    except Exception as e:
+        print(f"Warning: could not write real-time report: {e}")
+
+
+def session_state(ccfg, csv_path, resume=None, schedule=None, seed=None):
+    """Per-session state: staircases, R-Score history, points, CSV logger and schedule (restored on resume)."""
+    cfg = ccfg.raw
+    # Points & Conditions
+    points_total = cfg['points']['start']
+    cond_meta = ccfg.conditions
 
     # Staircases (per condition)
     cond_stair = {}
     for label in cond_meta.keys():
-        max_ms = cfg['staircase']['per_condition_max_ms'].get(label, cfg['staircase']['max_ms'])
-        cond_stair[label] = StaircaseAdaptive(
-            initial_ms=cfg['staircase']['initial_ms'],
-            min_ms=cfg['staircase']['min_ms'],
-            max_ms=max_ms,
-            step_ms=cfg['staircase']['step_ms'],
-        )
+        cond_stair[label] = make_adaptive(cfg['staircase'], cond_meta[label].max_ms)
 
     # R-Score tracking
-    if cfg['rscore']['scope'] == 'per_condition':
-        rscore_hist = {label: deque(maxlen=cfg['rscore']['window']) for label in cond_meta}
+    if ccfg.rscore.per_condition:
+        rscore_hist = {label: deque(maxlen=ccfg.rscore.window) for label in cond_meta}
+    else:
+        rscore_hist = deque(maxlen=ccfg.rscore.window)
+
+    # Session schedule: condition order and jitters for every block, fixed up front
+    if resume:
+        schedule_path = resume['schedule_path']
+        schedule = load_schedule(schedule_path, ccfg)
     else:
-        rscore_hist = deque(maxlen=cfg['rscore']['window'])
+        schedule = schedule if schedule is not None else compile_schedule(cfg, seed)
+        schedule['config_hash'] = ccfg.source_hash  # config this session ran with (see catalog.py)
+        schedule_path = csv_path + ".schedule.json"
+        write_schedule(schedule_path, schedule)
 
     # CSV logging
-    csv_headers = [
-        "participant","session","timestamp","block","trial_index","condition",
-        "valence","magnitude","target_ms_pre","target_ms_final","rt_ms","hit",
-        "pause1_ms","pause2_ms","pause3_ms","cue_ms","feedback_ms",
-        "points_change","points_total","key_pressed","rscore_scope","rscore_value"
-    ]
-    csv_file = open(csv_path, "w", newline="", encoding="utf-8")
-    writer = csv.writer(csv_file)
-    writer.writerow(csv_headers)
+    csv_headers = CSV_HEADERS
+    logger = TrialLogger(csv_path, csv_headers, rows=prior_rows(resume) if resume else None,
+                         columnar=cfg['output']['columnar'])
+
+    # Resume: restore adaptive state and RNG position of the last finished trial
+    if resume:
+        restore_adaptive_state(resume, cond_stair, rscore_hist)
+        points_total = resume['points_total']
+        restore_rng(resume['rng_state'])
+
+    return SimpleNamespace(
+        points_total=points_total, cond_stair=cond_stair, rscore_hist=rscore_hist, logger=logger,
+        schedule=schedule, schedule_path=schedule_path,
+        start_block=resume['block'] if resume else 0, start_trial=resume['trial'] if resume else 0,
+    )
+
+
+def session_steps(state, resume=None):
+    """Screens and trials still to run: ("block_start", b), ("trial", b, ti, trial, block order), ("practice_end",)."""
+    for block in state.schedule['blocks']:
+        b, trials = block['block'], block['trials']
+        if b < state.start_block:
+            continue
+        resumed_block = resume is not None and b == state.start_block
+        if resumed_block and state.start_trial >= len(trials):
+            continue
+        if b > 0:
+            yield ("block_start", b)
+        order = [t['condition'] for t in trials]
+        for ti, trial in enumerate(trials, start=1):
+            if resumed_block and ti <= state.start_trial:
+                continue
+            yield ("trial", b, ti, trial, order)
+        if b == 0:
+            yield ("practice_end",)
+
+
+def run_session(display, ccfg, config_path, exp_info, csv_path, timeline,
+                resume=None, schedule=None, seed=None):
+    """Run one session on an open display; returns the final points. Raises SessionAborted on ESC."""
+    from psychopy import core, event
+
+    cfg = ccfg.raw
+    win, scheduler, frames = display.win, display.scheduler, display.frames
+    scheduler.reset()  # session clock and telemetry start here
+    realtime = RealtimeMode(cfg['realtime'], scheduler)
+
+    state = session_state(ccfg, csv_path, resume, schedule, seed)
+    points_total, cond_meta = state.points_total, ccfg.conditions
+    cond_stair, rscore_hist, logger = state.cond_stair, state.rscore_hist, state.logger
+    schedule_path = state.schedule_path
+    progress = {"trials": []}  # trial order of the running block (for checkpoints)
+    monitor = LiveMonitor(cfg['monitor'], ccfg, exp_info)
+    monitor.start()
+
+    def finish_timing():
+        monitor.stop()
+        write_timing_reports(scheduler, realtime, csv_path)
+
+    def abort():
+        print(cfg['text']['escape_message'])
+        try:
+            logger.close()
+        except Exception:
+            pass
+        finish_timing()
+        raise SessionAborted(csv_path)
 
     def check_escape():
         if 'escape' in event.getKeys():
-            print(cfg['text']['escape_message'])
-            try:
-                csv_file.flush(); csv_file.close()
-            except Exception:
-                pass
-            try:
-                win.close()
-            except Exception:
-                pass
-            core.quit()
-
-    def make_trials(n_trials):
-        labels = list(cond_meta.keys())
-        n_cond = len(labels)
-        base = n_trials // n_cond
-        rem = n_trials % n_cond
-        trials = []
-        for i, lab in enumerate(labels):
-            count = base + (1 if i < rem else 0)
-            trials.extend([lab] * count)
-        random.shuffle(trials)
-        return trials
+            abort()
 
     #--------------------
     # Start + Instruction Screens
     # ------------------------
 
     # 1️⃣ Startscreen (Title)
-    start_text = visual.TextStim(
-        win,
-        text=cfg['text']['title'],
-        color=cfg['win']['text_color'],
-        height=0.15,
-        font=cfg['win']['font'],
-        alignText="center"
-    )
-    start_sub = visual.TextStim(
-        win,
-        text=cfg['text']['subtitle'],
-        color=cfg['win']['text_color'],
-        height=cfg['visuals']['text_font_height'],
-        font=cfg['win']['font'],
-        pos=(0, -0.1)
-    )
-    start_instruction = visual.TextStim(
-        win,
-        text=cfg['text']['start_instruction'],
-        color=cfg['win']['text_color'],
-        height=cfg['visuals']['text_font_height'],
-        font=cfg['win']['font'],
-        pos=(0, -0.25)
-    )
-
-    # draw all start screen elements
-    start_text.draw()
-    start_sub.draw()
-    start_instruction.draw()
+    for stim in frames["title"]:
+        stim.draw()
     win.flip()
+    timeline.mark("first_screen")
+    try:
+        print_startup_summary(timeline.write(csv_path + ".startup.json"))
+    except Exception as e:
+        print(f"Warning: could not write startup timeline: {e}")
     core.wait(0.8)  # ensures frame appears before waiting
     event.clearEvents()
     keys = event.waitKeys(keyList=cfg['task']['resp_keys'] + ['escape'])
@@ -268,16 +502,8 @@ def main():
         check_escape()
 
     # 2️⃣ Kurzanleitung
-    instruction_text = visual.TextStim(
-        win,
-        text=cfg['text']['task_instructions'],
-        color=cfg['win']['text_color'],
-        height=cfg['visuals']['text_font_height'],
-        wrapWidth=1.2,
-        font=cfg['win']['font'],
-        alignText="center"
-    )
-    instruction_text.draw()
+    for stim in frames["instructions"]:
+        stim.draw()
     win.flip()
     keys = event.waitKeys(keyList=cfg['task']['resp_keys'] + ['escape'])
     if 'escape' in keys:
@@ -285,188 +511,138 @@ def main():
 
 
     # Practice (optional)
-    def run_trial(trial_idx, block_idx, cond_label):
-        nonlocal points_total
+    timings, rscore = ccfg.timings, ccfg.rscore
+    presenter = TrialPresenter(display, realtime, timings, abort)
+
+    def run_trial(trial_idx, block_idx, trial):
+        cond_label = trial['condition']
         meta = cond_meta[cond_label]
         stair = cond_stair[cond_label]
 
-        # Timing from config
-        cue_ms = int(cfg['timings']['cue_ms'])
-        p1_lo, p1_hi = cfg['timings']['pause1_ms_range']
-        p2_lo, p2_hi = cfg['timings']['pause2_ms_range']
-        p3_lo, p3_hi = cfg['timings']['pause3_ms_range']
-        fb_ms = int(cfg['timings']['feedback_ms'])
-
-        # Jitters
-        pause1_ms = int(uniform_jitter(p1_lo, p1_hi))
-        pause2_ms = int(uniform_jitter(p2_lo, p2_hi))
-        pause3_ms = int(uniform_jitter(p3_lo, p3_hi))
-
-        # ITI/pause1
-        fixation.draw(); win.flip(); core.wait(pause1_ms / 1000.0); check_escape()
-
-        # Cue
-        cue_images[cond_label].draw(); win.flip(); core.wait(cue_ms / 1000.0); check_escape()
-
-        # Anticipation == pause2
-        fixation.draw(); win.flip(); core.wait(pause2_ms / 1000.0); check_escape()
-
-        # Target duration from staircase
-        target_ms_pre = stair.get_ms()
-
-        # R-Score rule
-        rscore_value = ''
-        if cfg['rscore']['enabled']:
-            if isinstance(rscore_hist, dict):  # per_condition
-                hist = rscore_hist[cond_label]
-                if len(hist) > 0:
-                    r = 100.0 * (sum(hist) / len(hist))
-                    rscore_value = f"{r:.1f}"
-                    if r > cfg['rscore']['threshold']:
-                        target_ms = max(cfg['staircase']['min_ms'], int(target_ms_pre * cfg['rscore']['scale']))
-                    else:
-                        target_ms = target_ms_pre
-                else:
-                    target_ms = target_ms_pre
-            else:  # global
-                if len(rscore_hist) > 0:
-                    r = 100.0 * (sum(rscore_hist) / len(rscore_hist))
-                    rscore_value = f"{r:.1f}"
-                    if r > cfg['rscore']['threshold']:
-                        target_ms = max(cfg['staircase']['min_ms'], int(target_ms_pre * cfg['rscore']['scale']))
-                    else:
-                        target_ms = target_ms_pre
-                else:
-                    target_ms = target_ms_pre
-        else:
-            target_ms = target_ms_pre
-
-        # respect per-condition max and global max
-        per_max = cfg['staircase']['per_condition_max_ms'].get(cond_label, None)
-        max_cap = per_max if per_max is not None else cfg['staircase']['max_ms']
-        target_ms = min(target_ms, max_cap)
-
-        # Target + response
-        event.clearEvents()
-        rt = None; keyname = None
-        clock = core.Clock()  # Start timing BEFORE flip
-        target_stim.draw(); win.flip()
-        tgt_sec = target_ms / 1000.0
-        
-        while clock.getTime() < tgt_sec:
-            # Check for ALL keys including escape
-            all_keys = event.getKeys()
-            if all_keys:
-                for key in all_keys:
-                    if key == 'escape':
-                        check_escape()  # Handle escape
-                    elif key == 'space' or key in cfg['task']['resp_keys']:
-                        keyname = key
-                        rt_sec = clock.getTime()
-                        rt = int(rt_sec * 1000.0)
-                        break
-                if rt is not None:
-                    break
-            core.wait(0.0001)  # Very short wait for better responsiveness
-
-        # Target off
-        fixation.draw(); win.flip()
-
-        # Hit criterion
-        hit = (rt is not None and rt <= target_ms)
-
-        # Feedback
-        delta_points = meta["points_hit"] if hit else meta["points_miss"]
-        points_total += delta_points
-        stair.update(hit)
+        # Target duration from staircase, R-Score rule and caps (decided before the trial starts)
+        target_ms_pre, target_ms, rscore_value = decide_target(ccfg, meta, stair, rscore_hist, cond_label)
+
+        def in_pause3(hit, rt, keyname):
+            nonlocal points_total
+            # Points, staircase and R-Score history
+            delta_points = apply_outcome(ccfg, meta, stair, rscore_hist, cond_label, hit, target_ms)
+            points_total += delta_points
+
+            # Log (handed to the writer thread; journal fsync happens during the ITI) and show live
+            row = trial_row(exp_info, block_idx, trial_idx, trial, meta, timings, rscore, target_ms_pre, target_ms,
+                            rscore_value, rt, keyname, hit, delta_points, points_total,
+                            [scheduler.session_time(scheduler.onsets.get(phase)) for phase in TRIAL_PHASES])
+            logger.log(row)
+            monitor.publish(row)
+            logger.checkpoint(snapshot(exp_info, config_path, csv_path, schedule_path, block_idx, trial_idx,
+                                       progress["trials"], cond_stair, rscore_hist, points_total, logger.n_logged))
+            logger.sync()
+            realtime.collect()
+
+        presenter.trial(block_idx, trial_idx, trial, target_ms, in_pause3=in_pause3)
+
+    # Real-time mode (priority, CPU pinning, GC freeze) covers the trial loop only
+    realtime.start()
+
+    # Practice (block 0) and main blocks, stepping through the precompiled schedule
+    for step in session_steps(state, resume):
+        if step[0] == "block_start":
+            scheduler.show(frames[f"block_{step[1]}"])
+            keys = event.waitKeys(keyList=cfg['task']['resp_keys'] + ['escape'])
+            if 'escape' in keys:
+                check_escape()
+        elif step[0] == "trial":
+            _, b, ti, trial, progress["trials"] = step
+            run_trial(ti, block_idx=b, trial=trial)
+        elif step[0] == "practice_end":
+            scheduler.show(frames["practice_end"])
+            keys = event.waitKeys(keyList=cfg['task']['resp_keys'] + ['escape'])
+            if 'escape' in keys:
+                check_escape()
 
-        # Show performance feedback image first
-        perf_key = "hit" if hit else "miss"
-        performance_feedback_images[perf_key].draw(); win.flip(); core.wait(fb_ms / 1000.0); check_escape()
-        
-        # Show monetary feedback image second
-        # If miss (negative performance), always show 0 points feedback regardless of condition
-        if not hit:
-            # Use the neutral (0 points) monetary feedback image for misses
-            monetary_feedback_images["NEUTRAL"].draw()
-            monetary_gain_text["NEUTRAL"].draw()  # Show "+0 Cent" text ON TOP
-            win.flip(); core.wait(fb_ms / 1000.0); check_escape()
-        else:
-            # Show condition-specific monetary feedback for hits
-            monetary_feedback_images[cond_label].draw()
-            monetary_gain_text[cond_label].draw()  # Show gain text ON TOP (e.g., "+30 Cent")
-            win.flip(); core.wait(fb_ms / 1000.0); check_escape()
+    # Goodbye
+    display.end_text.text = cfg['text']['experiment_end'].format(total_points=points_total)
+    scheduler.show([display.end_text]); core.wait(2.0)
 
-        # Pause3 (post-feedback)
-        fixation.draw(); win.flip(); core.wait(pause3_ms / 1000.0); check_escape()
+    try:
+        logger.close(finished=True)
+    except Exception:
+        pass
+    finish_timing()
+    return points_total
 
-        # Update R-Score history
-        if isinstance(rscore_hist, dict):
-            rscore_hist[cond_label].append(1 if hit else 0)
-        else:
-            rscore_hist.append(1 if hit else 0)
-
-        # Log
-        writer.writerow([
-            exp_info["participant"], exp_info["session"], timestamp(), block_idx, trial_idx, cond_label,
-            meta["valence"], meta["magnitude"], target_ms_pre, target_ms,
-            rt if rt is not None else "", int(hit),
-            pause1_ms, pause2_ms, pause3_ms, cue_ms, fb_ms,
-            delta_points, points_total, keyname or "",
-            cfg['rscore']['scope'], rscore_value
-        ])
-
-    # Practice
-    if cfg['task']['practice_trials'] > 0:
-        labels = [c[0] for c in cfg['conditions']]
-        # balance practice trials
-        n = cfg['task']['practice_trials']
-        per = max(1, n // len(labels))
-        prac_trials = []
-        for lab in labels:
-            prac_trials += [lab] * per
-        random.shuffle(prac_trials)
-        for ti, cond in enumerate(prac_trials, start=1):
-            run_trial(ti, block_idx=0, cond_label=cond)
-        txt = visual.TextStim(win, text=cfg['text']['practice_end'],
-                              color=cfg['win']['text_color'], height=cfg['visuals']['text_font_height'], font=cfg['win']['font'])
-        txt.draw(); win.flip()
-        keys = event.waitKeys(keyList=cfg['task']['resp_keys'] + ['escape'])
-        if 'escape' in keys:
-            check_escape()
-
-    # Main blocks
-    for b in range(1, cfg['task']['n_blocks'] + 1):
-        blk = visual.TextStim(win, text=cfg['text']['block_start'].format(block_num=b, total_blocks=cfg['task']['n_blocks']),
-                              color=cfg['win']['text_color'], height=cfg['visuals']['text_font_height'], font=cfg['win']['font'])
-        blk.draw(); win.flip()
-        keys = event.waitKeys(keyList=cfg['task']['resp_keys'] + ['escape'])
-        if 'escape' in keys:
-            check_escape()
-
-        trials = []
-        # balanced distribution per block
-        labels = [c[0] for c in cfg['conditions']]
-        base = cfg['task']['trials_per_block'] // len(labels)
-        rem = cfg['task']['trials_per_block'] % len(labels)
-        for i, lab in enumerate(labels):
-            count = base + (1 if i < rem else 0)
-            trials.extend([lab] * count)
-        random.shuffle(trials)
-
-        for ti, cond in enumerate(trials, start=1):
-            run_trial(ti, block_idx=b, cond_label=cond)
 
-    # Goodbye
-    end_text = visual.TextStim(win, text=cfg['text']['experiment_end'].format(total_points=points_total),
-                               color=cfg['win']['text_color'], height=cfg['visuals']['text_font_height'], font=cfg['win']['font'])
-    end_text.draw(); win.flip(); core.wait(2.0)
+# ------------------------
+# Main
+# ------------------------
 
+def main():
+    timeline = StartupTimeline()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config', default='mid_config.yml', help='Path to YAML config.')
+    parser.add_argument('--schedule', default=None, help='Precompiled schedule JSON (see schedule.py); compiled at startup if omitted.')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the schedule compiled at startup.')
+    parser.add_argument('--resume', default=None, help='Checkpoint (<csv>.checkpoint.json) of an aborted session to continue.')
+    parser.add_argument('--sequential-start', action='store_true',
+                        help='Import PsychoPy and load stimuli on the main thread (no overlap with the dialog).')
+    args = parser.parse_args()
+    background = not args.sequential_start
+
+    # Heavy imports start first; config and dialog run meanwhile
+    imports = start_task(timeline, "import_psychopy", import_psychopy, background=background)
+
+    resume = load_checkpoint(args.resume) if args.resume else None
+    config_path = resume['config'] if resume else args.config
+    with timeline.stage("config"):
+        ccfg = compile_config(config_path)  # typed, per-condition values resolved (cached by file hash)
+    cfg = ccfg.raw
+    with timeline.stage("preflight"):
+        startup_check(cfg)  # this host's timing profile; exits if enforced and missing/drifted
+    split = cfg['render']['separate_process']  # the render process loads its own stimuli
+    stim_arrays = start_task(timeline, "load_stimuli",
+                             preload if cfg['visuals']['stimulus_cache'] and not split else dict, cfg,
+                             background=background)
+
+    if resume:
+        # Same participant, same CSV; no dialog
+        exp_info = resume['exp_info']
+        csv_path = resume['csv_path']
+        print(f"Resuming {csv_path} after block {resume['block']}, trial {resume['trial']}")
+    else:
+        # Participant dialog
+        exp_info = {"participant": "", "session": "001"}
+        with timeline.stage("dialog"):
+            if not participant_dialog(exp_info):
+                sys.exit(0)
+
+        # Output
+        csv_path = session_csv_path(exp_info)
+
+    imports.result()
+    from psychopy import core
+
+    schedule = load_schedule(args.schedule, ccfg) if args.schedule else None
+    if split:
+        import split_render
+        try:
+            split_render.run_split_session(ccfg, config_path, exp_info, csv_path, timeline, resume, schedule,
+                                           args.seed)
+        except split_render.SessionAborted:  # this module's class there (not __main__'s) when run as a script
+            pass
+        core.quit()
+
+    display = open_display(cfg, ccfg, stim_arrays.result(), timeline)
+    try:
+        run_session(display, ccfg, config_path, exp_info, csv_path, timeline, resume, schedule, args.seed)
+    except SessionAborted:
+        pass
     try:
-        csv_file.flush(); csv_file.close()
+        display.win.close()
     except Exception:
         pass
-    win.close(); core.quit()
+    core.quit()
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # render process in frozen builds (split_render.py)
     main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Live experimenter monitor for a running MID session (config section `monitor`).
+
+The trial loop hands each logged row to LiveMonitor.publish(), which only
+appends it to a bounded deque (lock-free hand-off, as in trial_logger.py):
+when `queue_size` rows are pending the row is dropped and counted, so the
+loop never waits and never wakes another thread. A consumer thread polls
+the deque and folds the rows into the session state (per condition:
+rolling hit rate and median RT over the last `window` trials,
+target_ms_final, R-Score value; points_total) and a local HTTP server
+serves it:
+
+    /        live page with per-condition RT and target duration plots
+    /state   the state as JSON
+
+Flags are raised for a participant who has not responded in `miss_streak`
+trials in a row and for a condition whose target duration sat at the
+staircase min_ms (or the condition's own max_ms) for `stuck_trials` trials.
+The cost of publish() per trial is measured and printed at the end of the
+session (and is part of /state).
+
+Run (terminal view of a session served on the default port):
+    python monitor.py
+    python monitor.py --url http://127.0.0.1:8766 --interval 2
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import CSV_HEADERS
+
+COL = {name: i for i, name in enumerate(CSV_HEADERS)}
+PLOT_POINTS = 60  # trials per condition kept for the plots
+
+
+class LiveMonitor:
+    """Bounded non-blocking hand-off of trial rows to a local live view."""
+
+    def __init__(self, mon_cfg, ccfg, exp_info):
+        self.enabled = bool(mon_cfg['enabled'])
+        self.cfg = mon_cfg
+        self.min_ms = ccfg.staircase.min_ms
+        # max_ms per condition (staircase.per_condition_max_ms, else staircase.max_ms)
+        self.conditions = {label: {"n": 0, "recent": deque(maxlen=mon_cfg['window']),
+                                   "plot": deque(maxlen=PLOT_POINTS), "target_ms": None, "at_limit": 0,
+                                   "max_ms": ccfg.conditions[label].max_ms}
+                           for label in ccfg.labels}
+        self.session = {"participant": exp_info["participant"], "session": exp_info["session"],
+                        "block": None, "trial_index": None, "n_trials": 0, "points_total": None,
+                        "rscore_value": None, "no_response_streak": 0}
+        self.published = 0
+        self.dropped = 0
+        self._cost_total_us = 0.0
+        self._cost_max_us = 0.0
+        self._queue = deque()
+        self._stop = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._server = None
+
+    def start(self):
+        """Start the consumer thread and the HTTP server."""
+        if not self.enabled:
+            return
+        monitor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/state":
+                    body, ctype = json.dumps(monitor.state()).encode("utf-8"), "application/json"
+                elif self.path == "/":
+                    body, ctype = PAGE.encode("utf-8"), "text/html; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.cfg['host'], self.cfg['port']), Handler)
+            self._server.daemon_threads = True
+        except OSError as e:
+            print(f"Warning: live monitor not served on {self.cfg['host']}:{self.cfg['port']}: {e}")
+            self._server = None
+        else:
+            threading.Thread(target=self._server.serve_forever, name="MonitorHTTP", daemon=True).start()
+            print(f"Live monitor: http://{self.cfg['host']}:{self._server.server_address[1]}/")
+        self._thread = threading.Thread(target=self._run, name="Monitor", daemon=True)
+        self._thread.start()
+
+    def publish(self, row):
+        """Hand one logged row (CSV_HEADERS layout) to the monitor; never blocks."""
+        if not self.enabled:
+            return
+        t = time.perf_counter()
+        if len(self._queue) < self.cfg['queue_size']:
+            self._queue.append(row)
+            self.published += 1
+        else:
+            self.dropped += 1
+        us = (time.perf_counter() - t) * 1e6
+        self._cost_total_us += us
+        if us > self._cost_max_us:
+            self._cost_max_us = us
+
+    def _run(self, interval_s=0.1):
+        while True:
+            stop = self._stop
+            while self._queue:
+                row = self._queue.popleft()
+                with self._lock:
+                    self._update(row)
+            if stop:
+                return
+            time.sleep(interval_s)
+
+    def _update(self, row):
+        s, cond = self.session, self.conditions[row[COL["condition"]]]
+        rt = row[COL["rt_ms"]]
+        rt = None if rt == "" else rt
+        hit = bool(row[COL["hit"]])
+        target_ms = row[COL["target_ms_final"]]
+        s["n_trials"] += 1
+        s["block"], s["trial_index"] = row[COL["block"]], row[COL["trial_index"]]
+        s["points_total"] = row[COL["points_total"]]
+        s["rscore_value"] = row[COL["rscore_value"]]
+        s["no_response_streak"] = s["no_response_streak"] + 1 if rt is None else 0
+        cond["n"] += 1
+        cond["target_ms"] = target_ms
+        cond["recent"].append((hit, rt))
+        cond["plot"].append((s["n_trials"], rt, hit, target_ms))
+        cond["at_limit"] = cond["at_limit"] + 1 if target_ms <= self.min_ms or target_ms >= cond["max_ms"] else 0
+
+    def state(self):
+        """Current session state, per-condition summaries and flags (JSON-ready)."""
+        with self._lock:
+            flags = []
+            if self.session["no_response_streak"] >= self.cfg['miss_streak']:
+                flags.append(f"no response in the last {self.session['no_response_streak']} trials")
+            conditions = {}
+            for label, c in self.conditions.items():
+                rts = [rt for _, rt in c["recent"] if rt is not None]
+                if c["at_limit"] >= self.cfg['stuck_trials']:
+                    limit = "min_ms" if c["target_ms"] <= self.min_ms else "max_ms"
+                    flags.append(f"{label}: target at {limit} ({c['target_ms']} ms) for {c['at_limit']} trials")
+                conditions[label] = {
+                    "n": c["n"],
+                    "target_ms": c["target_ms"],
+                    "hit_rate": round(sum(h for h, _ in c["recent"]) / len(c["recent"]), 3) if c["recent"] else None,
+                    "median_rt_ms": statistics.median(rts) if rts else None,
+                    "max_ms": c["max_ms"],
+                    "plot": list(c["plot"]),
+                }
+            return {"session": dict(self.session), "conditions": conditions, "flags": flags,
+                    "window": self.cfg['window'], "min_ms": self.min_ms,
+                    "overhead": self.overhead()}
+
+    def overhead(self):
+        """Cost of publish() in the trial loop and rows dropped while `queue_size` were pending."""
+        n = self.published + self.dropped
+        return {"published": self.published, "dropped": self.dropped,
+                "mean_us": round(self._cost_total_us / n, 2) if n else 0.0,
+                "max_us": round(self._cost_max_us, 2)}
+
+    def stop(self):
+        """Drain the queue, stop serving and print the per-trial overhead."""
+        if not self.enabled or self._thread is None:
+            return
+        self._stop = True
+        self._thread.join(timeout=5)
+        self._thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        o = self.overhead()
+        print(f"Live monitor: {o['published']} rows, {o['dropped']} dropped, "
+              f"publish mean {o['mean_us']:.1f} us, max {o['max_us']:.1f} us")
+
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>MID live monitor</title>
+<style>
+body { font-family: sans-serif; margin: 16px; background: #111; color: #ddd; }
+.flag { background: #8a1f1f; color: #fff; padding: 6px 10px; margin: 4px 0; }
+.grid { display: flex; flex-wrap: wrap; gap: 12px; }
+.card { background: #1d1d1d; padding: 8px; width: 340px; }
+.card h3 { margin: 0 0 4px 0; font-size: 15px; }
+.stats { font-size: 13px; margin-bottom: 4px; }
+canvas { background: #000; }
+</style></head>
+<body>
+<div id="head">waiting for data...</div>
+<div id="flags"></div>
+<div class="grid" id="grid"></div>
+<script>
+function draw(canvas, c, minMs, maxMs) {
+  var ctx = canvas.getContext("2d"), w = canvas.width, h = canvas.height;
+  ctx.clearRect(0, 0, w, h);
+  if (!c.plot.length) return;
+  var n0 = c.plot[0][0], n1 = c.plot[c.plot.length - 1][0], span = Math.max(n1 - n0, 1);
+  var top = maxMs * 1.2;
+  function x(n) { return 4 + (w - 8) * (n - n0) / span; }
+  function y(ms) { return h - 4 - (h - 8) * Math.min(ms, top) / top; }
+  ctx.strokeStyle = "#444";
+  [minMs, maxMs].forEach(function (ms) { ctx.beginPath(); ctx.moveTo(0, y(ms)); ctx.lineTo(w, y(ms)); ctx.stroke(); });
+  ctx.strokeStyle = "#e0b000"; ctx.beginPath();
+  c.plot.forEach(function (p, i) { if (i) ctx.lineTo(x(p[0]), y(p[3])); else ctx.moveTo(x(p[0]), y(p[3])); });
+  ctx.stroke();
+  c.plot.forEach(function (p) {
+    if (p[1] === null) return;
+    ctx.fillStyle = p[2] ? "#3c3" : "#d44";
+    ctx.fillRect(x(p[0]) - 2, y(p[1]) - 2, 4, 4);
+  });
+}
+function render(s) {
+  var ss = s.session, o = s.overhead;
+  document.getElementById("head").textContent = ss.participant + "/" + ss.session + "  block " + ss.block +
+    "  trial " + ss.trial_index + "  (" + ss.n_trials + " trials)  points " + ss.points_total +
+    "  R-Score " + (ss.rscore_value === "" ? "-" : ss.rscore_value) +
+    "  |  publish mean " + o.mean_us + " us, max " + o.max_us + " us, dropped " + o.dropped;
+  document.getElementById("flags").innerHTML = s.flags.map(function (f) {
+    return '<div class="flag">' + f + "</div>"; }).join("");
+  var grid = document.getElementById("grid");
+  Object.keys(s.conditions).forEach(function (label) {
+    var c = s.conditions[label], card = document.getElementById("c_" + label);
+    if (!card) {
+      card = document.createElement("div"); card.className = "card"; card.id = "c_" + label;
+      card.innerHTML = "<h3>" + label + '</h3><div class="stats"></div><canvas width="320" height="120"></canvas>';
+      grid.appendChild(card);
+    }
+    card.querySelector(".stats").textContent = "n " + c.n + "  target " + c.target_ms + " ms  hit rate " +
+      (c.hit_rate === null ? "-" : Math.round(c.hit_rate * 100) + "%") + "  median RT " +
+      (c.median_rt_ms === null ? "-" : c.median_rt_ms + " ms") + "  (last " + s.window + ")";
+    draw(card.querySelector("canvas"), c, s.min_ms, c.max_ms);
+  });
+}
+function poll() {
+  fetch("/state").then(function (r) { return r.json(); }).then(render)
+    .catch(function () { document.getElementById("head").textContent = "session ended or not reachable"; });
+}
+poll(); setInterval(poll, 1000);
+</script>
+<p style="font-size:12px;color:#888">yellow: target_ms_final, dots: RT (green hit, red miss), grey: staircase min/max</p>
+</body></html>
+"""
+
+
+def print_state(state):
+    """Terminal view of one /state snapshot."""
+    s, o = state["session"], state["overhead"]
+    print(f"{s['participant']}/{s['session']}  block {s['block']} trial {s['trial_index']}  "
+          f"({s['n_trials']} trials)  points {s['points_total']}  R-Score {s['rscore_value']}")
+    print(f"  {'condition':<14}{'n':>4}{'target':>8}{'hit%':>6}{'medRT':>7}   (last {state['window']})")
+    for label, c in state["conditions"].items():
+        hit = "-" if c["hit_rate"] is None else f"{c['hit_rate'] * 100:.0f}"
+        rt = "-" if c["median_rt_ms"] is None else f"{c['median_rt_ms']:.0f}"
+        print(f"  {label:<14}{c['n']:>4}{str(c['target_ms']):>8}{hit:>6}{rt:>7}")
+    for flag in state["flags"]:
+        print(f"  ! {flag}")
+    print(f"  publish mean {o['mean_us']:.1f} us, max {o['max_us']:.1f} us, dropped {o['dropped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Terminal view of a running session's live monitor.")
+    parser.add_argument('--url', default='http://127.0.0.1:8766', help='Monitor address (monitor.host/port).')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between refreshes.')
+    args = parser.parse_args()
+
+    from urllib.error import URLError
+    from urllib.request import urlopen
+
+    try:
+        while True:
+            try:
+                with urlopen(args.url.rstrip("/") + "/state", timeout=2) as r:
+                    state = json.load(r)
+            except (URLError, OSError) as e:
+                print(f"ERROR: no session at {args.url}: {e}")
+                exit(1)
+            print("\033[2J\033[H", end="")
+            print_state(state)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
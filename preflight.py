@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pre-flight timing self-test with cached per-host profiles (config section `preflight`).
+
+The default window settings (waitBlanking/checkTiming off, WSL-friendly)
+never tell us how a machine actually times. The self-test opens a window in
+the configured display mode with waitBlanking on, flips a stub stimulus for
+a few seconds and measures:
+
+- refresh rate and flip-interval jitter (p50/p99, frames over 1.5 intervals);
+  no vsync (flips returning immediately) is recorded as such
+- timer resolution of the clock the scheduler and key timestamps use
+- sleep overshoot of a 1 ms wait (the scheduler's polling granularity)
+- cost of one keyboard poll (psychopy.hardware.keyboard getKeys); the
+  keyboard's own hardware/driver latency needs an external device
+
+The result is saved as a profile keyed by hostname and display mode (size,
+fullscreen, waitBlanking, FBO) under `preflight.profile_dir`. At startup the
+runner loads the profile without re-measuring: its refresh rate converts ms
+to frames when `win.refresh_hz` is null (instead of measuring the frame
+rate at every launch), and a quick check (~0.1 s) compares the machine
+fingerprint (OS, Python, PsychoPy, CPU count), timer resolution and sleep
+overshoot with the profile. A missing, drifted or outdated profile is a
+warning, or refuses to start with `preflight.enforce: true`. With
+waitBlanking on, 30 flips after the window opens confirm the refresh rate.
+
+Run:
+    python preflight.py --config mid_config.yml
+    python preflight.py --check
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import time
+from datetime import datetime
+from importlib import metadata
+
+from timing_telemetry import percentile
+
+PROFILE_VERSION = 1
+FINGERPRINT_FIELDS = ("platform", "python", "psychopy", "cpu_count")
+DRIFT_FACTOR = 2.0        # timer resolution / sleep overshoot this much worse than profiled
+SLEEP_SLACK_MS = 0.5      # ... and sleep overshoot at least this much worse (load noise)
+REFRESH_TOLERANCE = 0.05  # relative refresh-rate difference that counts as drift
+
+
+def display_mode(cfg):
+    """The window settings a profile is valid for."""
+    w = cfg['win']
+    return {"size": list(w['size']), "fullscr": bool(w['fullscr']),
+            "waitBlanking": bool(w['waitBlanking']), "useFBO": bool(w['useFBO'])}
+
+
+def profile_path(cfg, host=None):
+    """Profile file for this host and the config's display mode."""
+    mode = display_mode(cfg)
+    host = re.sub(r"[^A-Za-z0-9_.-]", "_", host or socket.gethostname())
+    name = (f"{host}__{mode['size'][0]}x{mode['size'][1]}_{'full' if mode['fullscr'] else 'window'}_"
+            f"{'vsync' if mode['waitBlanking'] else 'novsync'}{'_fbo' if mode['useFBO'] else ''}.json")
+    return os.path.join(cfg['preflight']['profile_dir'], name)
+
+
+def fingerprint():
+    """Machine/software properties a profile depends on."""
+    try:
+        psychopy_version = metadata.version("psychopy")  # without importing PsychoPy
+    except metadata.PackageNotFoundError:
+        psychopy_version = None
+    return {"platform": platform.platform(), "python": platform.python_version(),
+            "psychopy": psychopy_version, "cpu_count": os.cpu_count()}
+
+
+# ------------------------
+# Measurements
+# ------------------------
+
+def timer_resolution_us(n=2000):
+    """Smallest non-zero step of perf_counter in µs."""
+    steps = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        t1 = time.perf_counter()
+        while t1 == t0:
+            t1 = time.perf_counter()
+        steps.append(t1 - t0)
+    return round(min(steps) * 1e6, 3)
+
+
+def sleep_overshoot_ms(n=50, request_s=0.001):
+    """p50/p99 of how much longer than requested a 1 ms sleep takes."""
+    over = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        time.sleep(request_s)
+        over.append((time.perf_counter() - t0 - request_s) * 1000.0)
+    return {"p50": round(percentile(over, 50), 3), "p99": round(percentile(over, 99), 3)}
+
+
+def flip_intervals(win, stim, n_frames):
+    """Flip-to-flip intervals (ms) of a stub stimulus drawn every frame."""
+    stamps = []
+    for _ in range(n_frames + 1):
+        stim.draw()
+        stamps.append(win.flip())
+    return [(b - a) * 1000.0 for a, b in zip(stamps, stamps[1:])]
+
+
+def refresh_stats(intervals):
+    """Refresh rate and flip jitter from flip intervals; refresh_hz is None without vsync."""
+    median = percentile(intervals, 50)
+    if median is None or median < 2.0:  # flips return immediately: no vsync
+        return {"vsync": False, "refresh_hz": None, "frame_ms": None, "jitter_ms": None, "long_frames": None}
+    jitter = [abs(x - median) for x in intervals]
+    return {"vsync": True, "refresh_hz": round(1000.0 / median, 3), "frame_ms": round(median, 4),
+            "jitter_ms": {"p50": round(percentile(jitter, 50), 4), "p99": round(percentile(jitter, 99), 4)},
+            "long_frames": sum(1 for x in intervals if x > 1.5 * median)}
+
+
+def keyboard_poll_us(n=500):
+    """p50/p99 cost of one keyboard poll in µs."""
+    from psychopy.hardware import keyboard
+
+    kb = keyboard.Keyboard()
+    costs = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        kb.getKeys(keyList=['space', 'escape'], waitRelease=False)
+        costs.append((time.perf_counter() - t0) * 1e6)
+    return {"p50": round(percentile(costs, 50), 2), "p99": round(percentile(costs, 99), 2)}
+
+
+def self_test(cfg, n_frames=300, n_polls=500):
+    """Measure this host in the config's display mode; returns a profile."""
+    from psychopy import visual
+
+    w = cfg['win']
+    win = visual.Window(size=w['size'], fullscr=w['fullscr'], color=w['screen_color'], units="height",
+                        allowGUI=False, waitBlanking=True, checkTiming=False, useFBO=w['useFBO'], autoLog=False)
+    try:
+        stim = visual.TextStim(win, text="+", color=w['fixation_color'], height=0.08)
+        flip_intervals(win, stim, 30)  # warm-up
+        refresh = refresh_stats(flip_intervals(win, stim, n_frames))
+        poll = keyboard_poll_us(n_polls)
+    finally:
+        win.close()
+    return {
+        "version": PROFILE_VERSION,
+        "host": socket.gethostname(),
+        "display_mode": display_mode(cfg),
+        "measured_at": datetime.now().isoformat(timespec="seconds"),
+        "fingerprint": fingerprint(),
+        "refresh": refresh,
+        "timer_resolution_us": timer_resolution_us(),
+        "sleep_overshoot_ms": sleep_overshoot_ms(),
+        "keyboard_poll_us": poll,
+        "n_frames": n_frames,
+    }
+
+
+def save_profile(cfg, profile):
+    """Write the profile atomically; returns its path."""
+    path = profile_path(cfg)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=1)
+    os.replace(tmp, path)
+    return path
+
+
+def load_profile(cfg):
+    """This host's profile for the config's display mode, or None."""
+    try:
+        with open(profile_path(cfg), "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return profile if profile.get("version") == PROFILE_VERSION else None
+
+
+# ------------------------
+# Startup use
+# ------------------------
+
+def drift(profile, max_age_days=None):
+    """Reasons the host no longer matches its profile (quick re-measure, no window)."""
+    reasons = []
+    now = fingerprint()
+    for field in FINGERPRINT_FIELDS:
+        if profile["fingerprint"].get(field) != now[field]:
+            reasons.append(f"{field} changed: {profile['fingerprint'].get(field)} -> {now[field]}")
+    resolution = timer_resolution_us(200)
+    if resolution > DRIFT_FACTOR * max(profile["timer_resolution_us"], 0.1):
+        reasons.append(f"timer resolution {resolution} us (profiled {profile['timer_resolution_us']} us)")
+    overshoot = sleep_overshoot_ms(20)["p50"]
+    profiled = profile["sleep_overshoot_ms"]["p50"]
+    if overshoot > max(DRIFT_FACTOR * profiled, profiled + SLEEP_SLACK_MS):
+        reasons.append(f"sleep overshoot {overshoot} ms (profiled {profile['sleep_overshoot_ms']['p50']} ms)")
+    if max_age_days is not None:
+        age = (datetime.now() - datetime.fromisoformat(profile["measured_at"])).days
+        if age > max_age_days:
+            reasons.append(f"profile is {age} days old (max_age_days {max_age_days})")
+    return reasons
+
+
+def startup_check(cfg):
+    """Load and check this host's profile at startup; returns it (or None). Exits when enforced and not current."""
+    pf = cfg['preflight']
+    profile = load_profile(cfg)
+    if profile is None:
+        problems = [f"no timing profile for this host and display mode ({profile_path(cfg)})"]
+    else:
+        problems = drift(profile, pf['max_age_days'])
+    if not problems:
+        refresh = profile["refresh"]
+        hz = f"{refresh['refresh_hz']} Hz" if refresh["vsync"] else "no vsync"
+        print(f"Timing profile {profile['measured_at']}: {hz}, timer {profile['timer_resolution_us']} us")
+        return profile
+    if pf['enforce']:
+        print("ERROR: Host timing not calibrated:")
+        for problem in problems:
+            print(f"  - {problem}")
+        print("Run `python preflight.py` on this machine first.")
+        exit(1)
+    for problem in problems:
+        print(f"Warning: {problem}; run `python preflight.py`")
+    return profile
+
+
+def profile_refresh_hz(cfg):
+    """Refresh rate from this host's profile (None without a profile or without vsync)."""
+    profile = load_profile(cfg)
+    if profile is None:
+        return None
+    return profile["refresh"]["refresh_hz"]
+
+
+def verify_refresh(win, refresh_hz, n_frames=30):
+    """Compare a short flip sample with the profiled refresh rate; returns the rate to use."""
+    from psychopy import visual
+
+    stim = visual.TextStim(win, text="")
+    measured = refresh_stats(flip_intervals(win, stim, n_frames))["refresh_hz"]
+    if measured is not None and abs(measured - refresh_hz) > REFRESH_TOLERANCE * refresh_hz:
+        print(f"Warning: refresh rate {measured} Hz, profiled {refresh_hz} Hz; run `python preflight.py`")
+        return measured
+    return refresh_hz
+
+
+def print_profile(profile):
+    """Print a profile."""
+    refresh = profile["refresh"]
+    mode = profile["display_mode"]
+    print(f"Host {profile['host']}, {mode['size'][0]}x{mode['size'][1]} "
+          f"{'fullscreen' if mode['fullscr'] else 'window'}, measured {profile['measured_at']}")
+    if refresh["vsync"]:
+        print(f"  refresh {refresh['refresh_hz']} Hz ({refresh['frame_ms']} ms), flip jitter "
+              f"p50 {refresh['jitter_ms']['p50']} ms p99 {refresh['jitter_ms']['p99']} ms, "
+              f"{refresh['long_frames']} long frames of {profile['n_frames']}")
+    else:
+        print("  no vsync: flips return immediately (refresh rate unknown, deadline mode)")
+    print(f"  timer resolution {profile['timer_resolution_us']} us")
+    print(f"  1 ms sleep overshoot p50 {profile['sleep_overshoot_ms']['p50']} ms "
+          f"p99 {profile['sleep_overshoot_ms']['p99']} ms")
+    print(f"  keyboard poll p50 {profile['keyboard_poll_us']['p50']} us p99 {profile['keyboard_poll_us']['p99']} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure this machine's display/timer/keyboard timing and save its profile.")
+    parser.add_argument('--config', default='mid_config.yml', help='Config whose win settings define the display mode.')
+    parser.add_argument('--frames', type=int, default=300, help='Flips to measure the refresh rate over.')
+    parser.add_argument('--polls', type=int, default=500, help='Keyboard polls to time.')
+    parser.add_argument('--check', action='store_true', help='Only check the saved profile (exit status 1 if missing or drifted).')
+    args = parser.parse_args()
+
+    from config_loader import load_config
+    cfg = load_config(args.config)
+
+    if args.check:
+        profile = load_profile(cfg)
+        if profile is None:
+            print(f"ERROR: no profile at {profile_path(cfg)}")
+            exit(1)
+        print_profile(profile)
+        reasons = drift(profile, cfg['preflight']['max_age_days'])
+        for reason in reasons:
+            print(f"  ! {reason}")
+        if reasons:
+            exit(1)
+        print("Profile is current")
+        return
+
+    profile = self_test(cfg, args.frames, args.polls)
+    print_profile(profile)
+    print(f"Profile written to {save_profile(cfg, profile)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Real-time execution mode for the MID task (config section `realtime`).
+
+When enabled:
+
+- garbage collection: everything allocated during startup is moved to the
+  permanent generation (gc.freeze), automatic GC is switched off for the
+  whole trial and one explicit collection runs in pause3, where it only
+  scans the objects of the trials since the last one
+- process priority is raised (psutil when available, else os.nice /
+  sched_setscheduler); "realtime" needs admin/root rights
+- the process is pinned to one CPU core (default: the last core). This only
+  keeps the process from migrating; for a core that nothing else uses,
+  reserve it in the OS as well (isolcpus on Linux)
+
+Every GC pass is recorded through gc.callbacks with its duration and the
+trial phase it ran in (also with the mode off, for comparison); passes
+inside the timed windows (cue, pause2, target) are reported separately.
+The report goes to <csv>.realtime.json.
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+
+# Phases in which a GC pause would distort presentation or RT
+TIMED_PHASES = ("cue", "pause2", "target")
+
+
+def raise_priority(level):
+    """Raise the process priority; returns a description of what was applied."""
+    if level == "normal":
+        return "normal (unchanged)"
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    try:
+        if psutil is not None and sys.platform == "win32":
+            cls = psutil.REALTIME_PRIORITY_CLASS if level == "realtime" else psutil.HIGH_PRIORITY_CLASS
+            psutil.Process().nice(cls)
+            return level
+        if level == "realtime" and hasattr(os, "sched_setscheduler"):
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(os.sched_get_priority_min(os.SCHED_FIFO)))
+            return "realtime (SCHED_FIFO)"
+        if psutil is not None:
+            psutil.Process().nice(-10)
+        else:
+            os.nice(-10)
+        return "high (nice -10)"
+    except (OSError, AttributeError) as e:
+        return f"unchanged ({e})"
+
+
+def pin_cpu(cpu):
+    """Pin the process to one core (None = last core); returns the core or a failure description."""
+    n = os.cpu_count() or 1
+    cpu = n - 1 if cpu is None else int(cpu)
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {cpu})
+        else:
+            import psutil
+            psutil.Process().cpu_affinity([cpu])
+        return cpu
+    except (ImportError, OSError, ValueError, AttributeError) as e:
+        return f"not pinned ({e})"
+
+
+class RealtimeMode:
+    """GC control, priority and CPU affinity around the trial loop."""
+
+    def __init__(self, rt_cfg, scheduler=None):
+        self.enabled = bool(rt_cfg['enabled'])
+        self.cfg = rt_cfg
+        self.scheduler = scheduler
+        self.applied = {}
+        self.pauses = []
+        self._gc_start = None
+        self._gc_was_enabled = gc.isenabled()
+
+    def start(self):
+        """Start recording GC passes; in real-time mode apply priority/affinity and freeze startup objects."""
+        gc.callbacks.append(self._on_gc)
+        if not self.enabled:
+            return
+        self.applied["priority"] = raise_priority(self.cfg['priority'])
+        self.applied["cpu"] = pin_cpu(self.cfg['cpu'])
+        gc.collect()
+        gc.freeze()
+        self.applied["frozen_objects"] = gc.get_freeze_count()
+
+    def begin_trial(self):
+        """Switch automatic GC off until the next collect()."""
+        if self.enabled:
+            gc.disable()
+
+    def collect(self):
+        """Collect in an untimed phase (pause3) and leave automatic GC off."""
+        if self.enabled:
+            gc.collect()
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+            return
+        if self._gc_start is None:
+            return
+        ms = (time.perf_counter() - self._gc_start) * 1000.0
+        self._gc_start = None
+        block, trial, where = self.scheduler.where() if self.scheduler is not None else (None, None, None)
+        self.pauses.append({"block": block, "trial_index": trial, "phase": where,
+                            "generation": info["generation"], "collected": info["collected"],
+                            "ms": round(ms, 3), "timed": where in TIMED_PHASES})
+
+    def stop(self):
+        """Stop recording and restore automatic GC."""
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        if not self.enabled:
+            return
+        gc.unfreeze()
+        if self._gc_was_enabled:
+            gc.enable()
+
+    def summary(self):
+        """GC pause statistics, split by timed/untimed phases."""
+        timed = [p for p in self.pauses if p["timed"]]
+        return {
+            "enabled": self.enabled,
+            "applied": self.applied,
+            "gc_passes": len(self.pauses),
+            "gc_total_ms": round(sum(p["ms"] for p in self.pauses), 3),
+            "gc_max_ms": max((p["ms"] for p in self.pauses), default=0.0),
+            "timed_passes": timed,
+        }
+
+    def write(self, csv_path):
+        """Write <csv>.realtime.json (summary + every GC pass); returns the summary."""
+        summary = self.summary()
+        with open(csv_path + ".realtime.json", "w", encoding="utf-8") as f:
+            json.dump(dict(summary, passes=self.pauses), f, indent=1)
+        return summary
+
+
+def print_summary(summary):
+    """Print the real-time settings and GC pauses of a session."""
+    applied = summary["applied"]
+    if summary["enabled"]:
+        print(f"Real-time mode: priority {applied.get('priority')}, cpu {applied.get('cpu')}, "
+              f"{applied.get('frozen_objects')} startup objects frozen")
+    else:
+        print("Real-time mode: off")
+    print(f"  GC passes {summary['gc_passes']}, total {summary['gc_total_ms']:.2f} ms, "
+          f"max {summary['gc_max_ms']:.2f} ms, inside timed phases {len(summary['timed_passes'])}")
+    for p in summary["timed_passes"]:
+        print(f"  ! block {p['block']} trial {p['trial_index']} {p['phase']}: gen {p['generation']} {p['ms']:.2f} ms")
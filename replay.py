@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Deterministic replay of logged MID sessions.
+
+Re-runs the adaptive decisions of mid_psychopy_pc_yaml.py from each CSV's
+logged trial sequence (condition and hit per trial) and the session's
+config: the per-condition staircase (make_adaptive), the global or
+per-condition R-Score window with its cap, and the points accounting. Every
+logged value that does not follow from the replay is reported as a
+divergence (row, field, expected, logged). After a diverging target_ms_pre
+or points_total the replay continues from the logged value, so one bad
+staircase step or points entry does not flag every later trial.
+
+Also checked per trial: condition metadata (valence, magnitude), cue and
+feedback durations, the hit criterion (rt_ms within the target as presented,
+from the logged target and feedback onsets, and <= target_ms_final) and, when
+<csv>.schedule.json exists, condition order and jitters against the
+schedule. The config is picked by the schedule's config hash from the
+--config files given; a session whose hash matches none of them is flagged
+without replaying it (sessions without a schedule use the first config). Web client sessions (MID_WEB_*) use a different
+R-Score rule and are skipped.
+
+Sessions are replayed in a process pool; the exit status is 1 when any
+session diverges, so the tool can run as a nightly QA step.
+
+Run:
+    python replay.py
+    python replay.py data/MID_PC_P01_*.csv --config mid_config.yml --out replay_report.json
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from adaptive import make_adaptive
+from catalog import FILE_RE, session_csvs
+from compiled_config import compile_config
+from schedule import load_schedule
+from utils import rscore_target
+
+# Divergences printed per session (the JSON report has all of them)
+MAX_PRINTED = 10
+# Frame duration assumed for sessions without onsets when win.refresh_hz is unset
+DEFAULT_REFRESH_HZ = 60
+# Slack for comparing RTs with the presented target (onsets are logged to 0.1 ms, and
+# key and flip timestamps come from different clocks)
+ONSET_TOLERANCE_MS = 1.0
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def presented_target_ms(row):
+    """Target duration as shown (feedback onset - target onset, plus ONSET_TOLERANCE_MS), or None when not logged."""
+    target_onset = _float(row.get("onset_target_s"))
+    feedback_onset = _float(row.get("onset_feedback_perf_s"))
+    if target_onset is None or feedback_onset is None or math.isnan(target_onset) or math.isnan(feedback_onset):
+        return None
+    return (feedback_onset - target_onset) * 1000.0 + ONSET_TOLERANCE_MS
+
+
+def replay_rows(rows, ccfg, schedule=None):
+    """Replay logged rows (dicts) against a compiled config; returns the list of divergences."""
+    divergences = []
+    conds = ccfg.conditions
+    stairs = {label: make_adaptive(ccfg.raw['staircase'], meta.max_ms) for label, meta in conds.items()}
+    rscore = ccfg.rscore
+    if rscore.per_condition:
+        hists = {label: deque(maxlen=rscore.window) for label in conds}
+    else:
+        hists = deque(maxlen=rscore.window)
+    scheduled = {b["block"]: b["trials"] for b in schedule["blocks"]} if schedule else None
+    points_total = ccfg.raw['points']['start']
+    frame_ms = 1000.0 / (ccfg.raw['win']['refresh_hz'] or DEFAULT_REFRESH_HZ)
+
+    for line, row in enumerate(rows, start=2):
+        block, trial_index = _int(row.get("block")), _int(row.get("trial_index"))
+
+        def check(field, expected, logged=None):
+            logged = row.get(field) if logged is None else logged
+            if str(expected) != logged:
+                divergences.append({"row": line, "block": block, "trial": trial_index,
+                                    "field": field, "expected": expected, "logged": logged})
+                return False
+            return True
+
+        label = row.get("condition")
+        meta = conds.get(label)
+        if meta is None:
+            check("condition", "one of " + "/".join(conds))
+            continue
+        if scheduled is not None:
+            trials = scheduled.get(block)
+            if trials is None or trial_index is None or not 1 <= trial_index <= len(trials):
+                check("trial_index", "a trial of the schedule")
+            else:
+                trial = trials[trial_index - 1]
+                check("condition", trial["condition"])
+                for key in ("pause1_ms", "pause2_ms", "pause3_ms"):
+                    check(key, trial[key])
+        check("valence", meta.valence)
+        check("magnitude", meta.magnitude)
+        check("cue_ms", ccfg.timings.cue_ms)
+        check("feedback_ms", ccfg.timings.feedback_ms)
+        check("rscore_scope", rscore.scope)
+
+        # Staircase -> R-Score rule -> cap, exactly as in run_trial
+        stair = stairs[label]
+        if not check("target_ms_pre", stair.get_ms()) and _int(row.get("target_ms_pre")) is not None:
+            stair.value = _int(row["target_ms_pre"])
+        target_ms_pre = stair.get_ms()
+        hist = hists[label] if rscore.per_condition else hists
+        if rscore.enabled:
+            target_ms, rscore_value = rscore_target(target_ms_pre, hist, rscore.threshold,
+                                                    rscore.scale, ccfg.staircase.min_ms)
+        else:
+            target_ms, rscore_value = target_ms_pre, ''
+        target_ms = min(target_ms, meta.max_ms)
+        check("target_ms_final", target_ms)
+        check("rscore_value", rscore_value)
+
+        # The logged hit drives the replay; it must agree with the logged RT and target
+        hit = _int(row.get("hit"))
+        if hit not in (0, 1):
+            check("hit", "0 or 1")
+            continue
+        rt = _float(row.get("rt_ms"))
+        logged_target = _int(row.get("target_ms_final"))
+        if logged_target is not None:
+            # Frame rounding: only keys inside the target as actually shown count; without
+            # onsets, a key in the target's last frame may have come after its offset
+            presented = presented_target_ms(row)
+            window = logged_target if presented is None else min(presented, logged_target)
+            late = presented is None and rt is not None and rt > logged_target - frame_ms
+            if not (hit == 0 and late):
+                check("hit", int(rt is not None and rt <= window))
+
+        delta = meta.points_hit if hit else meta.points_miss
+        check("points_change", delta)
+        points_total += delta
+        if not check("points_total", points_total) and _int(row.get("points_total")) is not None:
+            points_total = _int(row["points_total"])
+
+        stair.update(hit, logged_target if logged_target is not None else target_ms)  # duration shown
+        hist.append(hit)
+    return divergences
+
+
+def replay_session(job):
+    """Replay one session CSV (runs in a worker process)."""
+    csv_path, configs, default_hash = job
+    m = FILE_RE.match(os.path.basename(csv_path))
+    result = {"csv": csv_path, "status": "ok", "n_trials": 0, "config_hash": None,
+              "divergences": []}
+    if m is None or m.group("source") != "PC":
+        result["status"] = "skipped"
+        return result
+    schedule_path = csv_path + ".schedule.json"
+    try:
+        schedule = load_schedule(schedule_path) if os.path.exists(schedule_path) else None
+    except SystemExit:
+        # load_schedule exits on an unreadable schedule (its ERROR line is already printed);
+        # the pool would break, so flag just this session
+        result["status"] = "diverged"
+        result["divergences"].append({"row": None, "block": None, "trial": None, "field": "schedule",
+                                      "expected": "a readable schedule", "logged": schedule_path})
+        return result
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    result["n_trials"] = len(rows)
+
+    config_hash = schedule.get("config_hash") if schedule else None
+    result["config_hash"] = config_hash
+    if config_hash is not None and config_hash not in configs:
+        # Replaying against another config would only report noise
+        result["divergences"].append({"row": None, "block": None, "trial": None, "field": "config_hash",
+                                      "expected": "one of the --config files", "logged": config_hash})
+    else:
+        result["divergences"] = replay_rows(rows, configs.get(config_hash, configs[default_hash]), schedule)
+    if result["divergences"]:
+        result["status"] = "diverged"
+    return result
+
+
+def replay_sessions(csv_paths, config_paths, workers=None):
+    """Replay all sessions in a process pool; returns the per-session results."""
+    configs = {}
+    for path in config_paths:
+        ccfg = compile_config(path)
+        configs.setdefault(ccfg.source_hash, ccfg)
+    default_hash = compile_config(config_paths[0]).source_hash
+    jobs = [(path, configs, default_hash) for path in csv_paths]
+    if not jobs:
+        return []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(replay_session, jobs, chunksize=8))
+
+
+def print_report(results):
+    """Print diverging sessions with their first divergences and a summary line."""
+    counts = {"ok": 0, "diverged": 0, "skipped": 0}
+    for r in results:
+        counts[r["status"]] += 1
+        if r["status"] != "diverged":
+            continue
+        print(f"{r['csv']}: {len(r['divergences'])} divergence(s) in {r['n_trials']} trials")
+        for d in r["divergences"][:MAX_PRINTED]:
+            where = "session" if d["row"] is None else f"row {d['row']} (block {d['block']}, trial {d['trial']})"
+            print(f"    {where}: {d['field']} logged {d['logged']!r}, replay gives {d['expected']!r}")
+        if len(r["divergences"]) > MAX_PRINTED:
+            print(f"    ... {len(r['divergences']) - MAX_PRINTED} more")
+    print(f"{len(results)} sessions: {counts['ok']} ok, {counts['diverged']} diverged, "
+          f"{counts['skipped']} skipped")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay logged MID sessions and flag impossible adaptive decisions.")
+    parser.add_argument('csv', nargs='*', help='Session CSVs (default: every session in data/).')
+    parser.add_argument('--config', action='append', default=None,
+                        help='Config file(s); each session uses the one matching its config hash '
+                             '(default: mid_config.yml).')
+    parser.add_argument('--out', default=None, help='Also write every divergence to this JSON file.')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores).')
+    args = parser.parse_args()
+
+    config_paths = args.config or ['mid_config.yml']
+    csv_paths = args.csv or session_csvs("data")
+    results = replay_sessions(csv_paths, config_paths, args.workers)
+    counts = print_report(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"configs": config_paths, "sessions": results}, f, indent=1)
+        print(f"Report written to {args.out}")
+    if counts["diverged"]:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
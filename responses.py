@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Timestamped response capture for the MID task.
+
+Uses psychopy.hardware.keyboard, which records key events with OS/driver
+timestamps on a background thread (psychtoolbox backend) instead of the time
+the trial loop happened to poll. The keyboard clock is reset on the target
+flip, so rt_ms is measured from the actual target onset. Listening continues
+after the target goes off, so late responses are still logged.
+"""
+
+from psychopy.hardware import keyboard
+
+
+class ResponseCollector:
+    """Collect the first response key of a trial relative to the target flip."""
+
+    def __init__(self, win, resp_keys):
+        self.win = win
+        self.keys = list(resp_keys) + ([] if 'space' in resp_keys else ['space'])
+        self._key_list = self.keys + ['escape']  # built once; poll() runs every frame of the target
+        self.kb = keyboard.Keyboard()
+        self.first = None
+        self.escape = False
+
+    def arm(self):
+        """Clear pending keys and reset the response clock on the next flip."""
+        self.kb.clearEvents()
+        self.first = None
+        self.escape = False
+        self.win.callOnFlip(self.kb.clock.reset)
+
+    def poll(self):
+        """Fetch buffered key events; returns True once a response key was seen."""
+        for key in self.kb.getKeys(keyList=self._key_list, waitRelease=False):
+            if key.name == 'escape':
+                self.escape = True
+            elif self.first is None:
+                self.first = key
+        return self.first is not None
+
+    @property
+    def rt_ms(self):
+        """Reaction time in ms from target onset, or None without a response."""
+        return None if self.first is None else int(self.first.rt * 1000.0)
+
+    @property
+    def key_name(self):
+        """Name of the first response key, or None."""
+        return None if self.first is None else self.first.name
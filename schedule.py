@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Session schedule compiler for the MID task.
+
+Generates the whole session up front from a seed: the (balanced) practice
+block and every main block with its condition order and all pause jitters.
+Condition orders can be constrained:
+
+- task.max_repeats: maximum number of identical conditions in a row
+- task.counterbalance: prefer orders whose first-order transitions
+  (condition A followed by B) are as close to balanced as possible
+
+The runner writes the schedule next to the session CSV and simply steps
+through it, so every session is exactly reproducible and auditable.
+
+Run:
+    python schedule.py --config mid_config.yml --seed 42 --out schedule.json
+"""
+
+import argparse
+import json
+import random
+
+SCHEDULE_VERSION = 1
+
+
+def block_counts(cfg, block_idx):
+    """Number of trials per condition label in a block (0 = practice)."""
+    labels = [c[0] for c in cfg['conditions']]
+    if block_idx == 0:
+        per = max(1, cfg['task']['practice_trials'] // len(labels))
+        return {lab: per for lab in labels}
+    base = cfg['task']['trials_per_block'] // len(labels)
+    rem = cfg['task']['trials_per_block'] % len(labels)
+    return {lab: base + (1 if i < rem else 0) for i, lab in enumerate(labels)}
+
+
+def longest_run(seq):
+    """Length of the longest run of identical consecutive items."""
+    best = run = 0
+    for i, item in enumerate(seq):
+        run = run + 1 if i > 0 and item == seq[i - 1] else 1
+        best = max(best, run)
+    return best
+
+
+def transition_imbalance(seq, counts):
+    """Squared deviation of observed A->B transition counts from their expectation."""
+    n = len(seq)
+    if n < 2:
+        return 0.0
+    observed = {}
+    for a, b in zip(seq, seq[1:]):
+        observed[(a, b)] = observed.get((a, b), 0) + 1
+    score = 0.0
+    for a, ca in counts.items():
+        for b, cb in counts.items():
+            expected = (n - 1) * ca * (cb - (1 if a == b else 0)) / (n * (n - 1))
+            score += (observed.get((a, b), 0) - expected) ** 2
+    return score
+
+
+def _draw_sequence(counts, rng, max_repeats):
+    """Draw one order respecting max_repeats (weighted by remaining counts); None on dead end."""
+    remaining = dict(counts)
+    seq = []
+    for _ in range(sum(counts.values())):
+        options = [lab for lab, c in remaining.items() if c > 0
+                   and not (max_repeats and len(seq) >= max_repeats
+                            and all(x == lab for x in seq[-max_repeats:]))]
+        if not options:
+            return None
+        lab = rng.choices(options, weights=[remaining[o] for o in options])[0]
+        remaining[lab] -= 1
+        seq.append(lab)
+    return seq
+
+
+def order_block(counts, rng, max_repeats=None, counterbalance=False, n_candidates=500):
+    """Return a condition order for one block under the configured constraints."""
+    if not max_repeats and not counterbalance:
+        seq = [lab for lab, c in counts.items() for _ in range(c)]
+        rng.shuffle(seq)
+        return seq
+    best, best_score = None, None
+    for _ in range(n_candidates if counterbalance else 50):
+        seq = _draw_sequence(counts, rng, max_repeats)
+        if seq is None:
+            continue
+        if not counterbalance:
+            return seq
+        score = transition_imbalance(seq, counts)
+        if best is None or score < best_score:
+            best, best_score = seq, score
+    if best is None:
+        print(f"ERROR: Cannot build a block order with max_repeats={max_repeats} for counts {counts}")
+        exit(1)
+    return best
+
+
+def compile_schedule(cfg, seed=None):
+    """Compile the full session schedule (condition order + jitters) from a seed."""
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 31)
+    rng = random.Random(seed)
+    task, t = cfg['task'], cfg['timings']
+    block_ids = ([0] if task['practice_trials'] > 0 else []) + list(range(1, task['n_blocks'] + 1))
+    blocks = []
+    for b in block_ids:
+        order = order_block(block_counts(cfg, b), rng, task['max_repeats'], task['counterbalance'])
+        trials = []
+        for cond in order:
+            trial = {"condition": cond}
+            for key in ('pause1', 'pause2', 'pause3'):
+                lo, hi = t[f'{key}_ms_range']
+                trial[f'{key}_ms'] = int(rng.uniform(lo, hi))
+            trials.append(trial)
+        blocks.append({"block": b, "trials": trials})
+    return {
+        "version": SCHEDULE_VERSION,
+        "seed": seed,
+        "constraints": {"max_repeats": task['max_repeats'], "counterbalance": task['counterbalance']},
+        "blocks": blocks,
+    }
+
+
+def write_schedule(path, schedule):
+    """Write a schedule as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(schedule, f, indent=1)
+
+
+def schedule_errors(schedule, ccfg):
+    """Differences between a schedule and a compiled config (blocks, trial counts, labels, pauses)."""
+    cfg = ccfg.raw
+    task = cfg['task']
+    expected = ([0] if task['practice_trials'] > 0 else []) + list(range(1, task['n_blocks'] + 1))
+    blocks = schedule.get("blocks")
+    if not isinstance(blocks, list) or not all(isinstance(b, dict) for b in blocks):
+        return ["'blocks' must be a list of {block, trials} entries"]
+    found = [b.get("block") for b in blocks]
+    if found != expected:
+        return [f"blocks {found} do not match the config's blocks {expected}"]
+    errors = []
+    for block in blocks:
+        b, trials = block["block"], block.get("trials")
+        if not isinstance(trials, list):
+            errors.append(f"block {b}: 'trials' must be a list")
+            continue
+        n = sum(block_counts(cfg, b).values())
+        if len(trials) != n:
+            errors.append(f"block {b}: {len(trials)} trials, the config gives {n}")
+        for ti, trial in enumerate(trials, start=1):
+            if not isinstance(trial, dict):
+                errors.append(f"block {b} trial {ti}: not a {{condition, pause1_ms, ...}} entry")
+                continue
+            if trial.get("condition") not in ccfg.labels:
+                errors.append(f"block {b} trial {ti}: unknown condition {trial.get('condition')!r}")
+            for key in ('pause1_ms', 'pause2_ms', 'pause3_ms'):
+                value = trial.get(key)
+                if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                    errors.append(f"block {b} trial {ti}: {key} must be a non-negative integer")
+    return errors
+
+
+def load_schedule(path, ccfg=None):
+    """Read a schedule file; exits with a message on version mismatch or if it does not fit ccfg."""
+    with open(path, "r", encoding="utf-8") as f:
+        schedule = json.load(f)
+    if schedule.get("version") != SCHEDULE_VERSION:
+        print(f"ERROR: Unsupported schedule version in {path}")
+        exit(1)
+    errors = schedule_errors(schedule, ccfg) if ccfg is not None else []
+    if errors:
+        print(f"ERROR: Schedule {path} does not match the configuration:")
+        for error in errors[:20]:
+            print(f"  - {error}")
+        if len(errors) > 20:
+            print(f"  ... and {len(errors) - 20} more")
+        exit(1)
+    return schedule
+
+
+def main():
+    from config_loader import load_config
+
+    parser = argparse.ArgumentParser(description="Compile an MID session schedule.")
+    parser.add_argument('--config', default='mid_config.yml', help='Path to YAML config.')
+    parser.add_argument('--seed', type=int, default=None, help='Seed (random if omitted; stored in the file).')
+    parser.add_argument('--out', default='schedule.json', help='Output JSON file.')
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    schedule = compile_schedule(cfg, args.seed)
+    write_schedule(args.out, schedule)
+    for block in schedule["blocks"]:
+        order = [t["condition"] for t in block["trials"]]
+        print(f"Block {block['block']}: {len(order)} trials, longest run {longest_run(order)}")
+    print(f"Seed {schedule['seed']} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Preallocated shared-memory ring buffer for fixed-size records.
+
+One producer process and one consumer process exchange NumPy structured
+records through multiprocessing.shared_memory: the block holds three int64
+header fields (records written, records read, capacity) followed by
+`capacity` record slots. push() copies a tuple into the next slot and then
+advances the write counter; pop() copies a slot out and advances the read
+counter. Nothing is pickled or allocated in shared memory after
+construction, and neither side takes a lock: each counter has exactly one
+writer.
+
+The creating side owns the block (close(unlink=True) removes it); child
+processes attach by name with create=False and take the capacity from the
+header (shm.size may be rounded up to whole pages). Children started by
+multiprocessing share the parent's resource tracker, so attaching does not
+hand the block to a second tracker.
+"""
+
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+HEADER_BYTES = 24  # write counter, read counter, capacity (int64 each)
+
+
+class ShmRing:
+    """Single-producer/single-consumer ring of `dtype` records in shared memory."""
+
+    def __init__(self, dtype, capacity=256, name=None, create=True):
+        """Create a ring of `capacity` slots, or attach to `name` (create=False; capacity is read from the block)."""
+        self.dtype = np.dtype(dtype)
+        size = HEADER_BYTES + int(capacity) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self._counters = np.ndarray(3, dtype=np.int64, buffer=self.shm.buf)
+        if create:
+            self._counters[:] = (0, 0, int(capacity))
+        self.capacity = int(self._counters[2])
+        if HEADER_BYTES + self.capacity * self.dtype.itemsize > self.shm.size:
+            print(f"ERROR: shared-memory ring {self.shm.name} is smaller than its {self.capacity} "
+                  f"{self.dtype.itemsize}-byte slots (dtype mismatch?)")
+            del self._counters
+            self.shm.close()
+            exit(1)
+        self._slots = np.ndarray(self.capacity, dtype=self.dtype, buffer=self.shm.buf, offset=HEADER_BYTES)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __len__(self):
+        return int(self._counters[0] - self._counters[1])
+
+    def push(self, record):
+        """Append a record (tuple in dtype field order); False if the ring is full."""
+        written = int(self._counters[0])
+        if written - int(self._counters[1]) >= self.capacity:
+            return False
+        self._slots[written % self.capacity] = record
+        self._counters[0] = written + 1  # publish after the slot is filled
+        return True
+
+    def push_wait(self, record, poll_s=0.0005):
+        """Append a record, waiting while the ring is full."""
+        while not self.push(record):
+            time.sleep(poll_s)
+
+    def pop(self):
+        """Next record (a copy), or None if the ring is empty."""
+        read = int(self._counters[1])
+        if read >= int(self._counters[0]):
+            return None
+        record = self._slots[read % self.capacity].copy()
+        self._counters[1] = read + 1
+        return record
+
+    def pop_wait(self, timeout=None, poll_s=0.0005, alive=None):
+        """Next record, waiting for it; None on timeout or once alive() returns False with the ring empty."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            record = self.pop()
+            if record is not None:
+                return record
+            if alive is not None and not alive():
+                return self.pop()
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(poll_s)
+
+    def close(self, unlink=False):
+        """Detach (and remove the block when unlink is set, on the creating side)."""
+        del self._counters, self._slots
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
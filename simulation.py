@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Headless MID session engine (no PsychoPy).
+
+Simulates whole cohorts of synthetic participants with the same trial logic
+as mid_psychopy_pc_yaml.py: balanced trial order built like schedule.py's
+(task.max_repeats and task.counterbalance included), jittered pauses,
+per-condition 1-up/2-down staircase, R-Score rule (global or per_condition),
+per-condition/global caps and point accounting. All adaptive state is held in
+NumPy arrays with one row per participant, so a 10k cohort runs in seconds
+(minutes with task.counterbalance, whose orders are searched per participant).
+
+Run:
+    python simulation.py --config mid_config.yml --n 10000 --seed 1
+
+Requires:
+    pip install numpy pyyaml
+"""
+
+import argparse
+import random
+
+import numpy as np
+
+from config_loader import load_config
+from schedule import block_counts, order_block
+
+
+def condition_table(cfg):
+    """Return condition labels and per-condition arrays (valence, magnitude, points, caps)."""
+    labels = [c[0] for c in cfg['conditions']]
+    valence = np.array([int(c[1]) for c in cfg['conditions']], dtype=np.int64)
+    magnitude = np.array([int(c[2]) for c in cfg['conditions']], dtype=np.int64)
+    points_hit = np.array([int(c[3]) for c in cfg['conditions']], dtype=np.int64)
+    points_miss = np.array([int(c[4]) for c in cfg['conditions']], dtype=np.int64)
+    per_max = cfg['staircase'].get('per_condition_max_ms') or {}
+    max_ms = np.array([per_max.get(lab, cfg['staircase']['max_ms']) for lab in labels], dtype=np.int64)
+    return {
+        "labels": labels,
+        "valence": valence,
+        "magnitude": magnitude,
+        "points_hit": points_hit,
+        "points_miss": points_miss,
+        "max_ms": max_ms,
+    }
+
+
+def session_blocks(cfg):
+    """Return the (block_idx, condition count dict) layout of one session, as in schedule.py."""
+    task = cfg['task']
+    block_ids = ([0] if task['practice_trials'] > 0 else []) + list(range(1, task['n_blocks'] + 1))
+    return [(b, block_counts(cfg, b)) for b in block_ids]
+
+
+def draw_schedule(cfg, n, rng):
+    """Draw condition order and pause jitters for n participants.
+
+    Without task.max_repeats/counterbalance every block is a plain shuffle, drawn for the
+    whole cohort at once; with them each participant's orders come from schedule.order_block,
+    like the runner's (counterbalance costs ~0.1 s per participant and block).
+    """
+    task = cfg['task']
+    index = {lab: i for i, lab in enumerate(c[0] for c in cfg['conditions'])}
+    constrained = task['max_repeats'] or task['counterbalance']
+    seeds = rng.integers(2 ** 31, size=n) if constrained else None
+    py_rngs = [random.Random(int(seed)) for seed in seeds] if constrained else None
+    block_ids, conds = [], []
+    for b, counts in session_blocks(cfg):
+        layout = [index[lab] for lab, c in counts.items() for _ in range(c)]
+        if constrained:
+            orders = [order_block(counts, py_rng, task['max_repeats'], task['counterbalance'])
+                      for py_rng in py_rngs]
+            order = np.array([[index[lab] for lab in seq] for seq in orders],
+                             dtype=np.int64).reshape(n, len(layout))
+        else:
+            order = rng.permuted(np.tile(np.array(layout, dtype=np.int64), (n, 1)), axis=1)
+        conds.append(order)
+        block_ids.extend([b] * len(layout))
+    cond = np.concatenate(conds, axis=1) if conds else np.zeros((n, 0), dtype=np.int64)
+    shape = cond.shape
+    t = cfg['timings']
+    pauses = {}
+    for key in ('pause1', 'pause2', 'pause3'):
+        lo, hi = t[f'{key}_ms_range']
+        pauses[key] = rng.uniform(lo, hi, size=shape).astype(np.int64)
+    return np.array(block_ids, dtype=np.int64), cond, pauses
+
+
+def draw_participants(n, rng, rt_mu=320.0, rt_mu_sd=40.0, rt_sigma=35.0, rt_tau=60.0,
+                      magnitude_speedup_ms=6.0, p_lapse=0.03):
+    """Draw per-participant ex-Gaussian RT parameters."""
+    return {
+        "mu": rng.normal(rt_mu, rt_mu_sd, size=n),
+        "sigma": np.full(n, float(rt_sigma)),
+        "tau": np.full(n, float(rt_tau)),
+        "speedup": np.full(n, float(magnitude_speedup_ms)),
+        "p_lapse": np.full(n, float(p_lapse)),
+    }
+
+
+def simulate_cohort(cfg, n, seed=None, participants=None):
+    """Simulate n full sessions; returns a dict of (n, n_trials) result arrays."""
+    rng = np.random.default_rng(seed)
+    ct = condition_table(cfg)
+    if participants is None:
+        participants = draw_participants(n, rng)
+    block_ids, cond, pauses = draw_schedule(cfg, n, rng)
+    n_trials = cond.shape[1]
+    n_cond = len(ct["labels"])
+
+    sc = cfg['staircase']
+    if sc['method'] != 'staircase':
+        print(f"ERROR: simulation.py only models staircase.method 'staircase', not '{sc['method']}'")
+        exit(1)
+    rs = cfg['rscore']
+    per_condition = rs['scope'] == 'per_condition'
+    window = int(rs['window'])
+    min_ms = int(sc['min_ms'])
+    step = int(sc['step_ms'])
+
+    rows = np.arange(n)
+    stair = np.full((n, n_cond), int(sc['initial_ms']), dtype=np.int64)
+    consec = np.zeros((n, n_cond), dtype=np.int64)
+    slots = n_cond if per_condition else 1
+    hist = np.zeros((n, slots, window), dtype=np.int8)
+    hist_len = np.zeros((n, slots), dtype=np.int64)
+    hist_sum = np.zeros((n, slots), dtype=np.int64)
+    hist_pos = np.zeros((n, slots), dtype=np.int64)
+    points = np.full(n, int(cfg['points']['start']), dtype=np.int64)
+
+    out = {
+        "target_ms_pre": np.empty((n, n_trials), dtype=np.int64),
+        "target_ms_final": np.empty((n, n_trials), dtype=np.int64),
+        "rt_ms": np.full((n, n_trials), np.nan),
+        "hit": np.empty((n, n_trials), dtype=bool),
+        "points_change": np.empty((n, n_trials), dtype=np.int64),
+        "points_total": np.empty((n, n_trials), dtype=np.int64),
+        "rscore_value": np.full((n, n_trials), np.nan),
+    }
+
+    for t in range(n_trials):
+        c = cond[:, t]
+        slot = c if per_condition else np.zeros(n, dtype=np.int64)
+        target_pre = stair[rows, c]
+
+        # R-Score rule (uses history before this trial)
+        target = target_pre.copy()
+        if rs['enabled']:
+            filled = hist_len[rows, slot]
+            has = filled > 0
+            r = np.where(has, 100.0 * hist_sum[rows, slot] / np.maximum(filled, 1), np.nan)
+            out["rscore_value"][:, t] = r
+            scaled = np.maximum(min_ms, (target_pre * rs['scale']).astype(np.int64))
+            target = np.where(has & (r > rs['threshold']), scaled, target_pre)
+        target = np.minimum(target, ct["max_ms"][c])
+
+        # Synthetic response: only keys inside the target window are recorded
+        mu = participants["mu"] - participants["speedup"] * ct["magnitude"][c]
+        rt = np.floor(rng.normal(mu, participants["sigma"]) + rng.exponential(participants["tau"]))
+        responded = (rng.random(n) >= participants["p_lapse"]) & (rt >= 0) & (rt < target)
+        hit = responded
+
+        delta = np.where(hit, ct["points_hit"][c], ct["points_miss"][c])
+        points += delta
+
+        # Staircase update (1-up/2-down)
+        k = np.where(hit, consec[rows, c] + 1, 0)
+        down = hit & (k >= 2)
+        value = stair[rows, c]
+        value = np.where(down, np.maximum(min_ms, value - step), value)
+        value = np.where(hit, value, np.minimum(ct["max_ms"][c], value + step))
+        stair[rows, c] = value
+        consec[rows, c] = np.where(down, 0, k)
+
+        # R-Score history ring buffer
+        pos = hist_pos[rows, slot]
+        full = hist_len[rows, slot] >= window
+        hist_sum[rows, slot] += hit.astype(np.int64) - np.where(full, hist[rows, slot, pos], 0)
+        hist[rows, slot, pos] = hit
+        hist_pos[rows, slot] = (pos + 1) % window
+        hist_len[rows, slot] = np.minimum(window, hist_len[rows, slot] + 1)
+
+        out["target_ms_pre"][:, t] = target_pre
+        out["target_ms_final"][:, t] = target
+        out["rt_ms"][:, t] = np.where(responded, rt, np.nan)
+        out["hit"][:, t] = hit
+        out["points_change"][:, t] = delta
+        out["points_total"][:, t] = points
+
+    t_cfg = cfg['timings']
+    out["session_ms"] = (pauses['pause1'] + pauses['pause2'] + pauses['pause3'] + out["target_ms_final"]
+                         + int(t_cfg['cue_ms']) + 2 * int(t_cfg['feedback_ms'])).sum(axis=1)
+    out["block"] = block_ids
+    out["condition"] = cond
+    out.update({f"{k}_ms": v for k, v in pauses.items()})
+    out["final_stair_ms"] = stair
+    out["labels"] = ct["labels"]
+    out["min_ms"] = min_ms
+    return out
+
+
+def summarize(result):
+    """Return a per-condition summary dict of a simulated cohort."""
+    main = result["block"] > 0
+    cond = result["condition"][:, main]
+    hit = result["hit"][:, main]
+    summary = {}
+    for i, lab in enumerate(result["labels"]):
+        mask = cond == i
+        per_part = hit.sum(axis=1, where=mask) / np.maximum(mask.sum(axis=1), 1)
+        summary[lab] = {
+            "hit_rate_mean": float(per_part.mean()),
+            "hit_rate_sd": float(per_part.std()),
+            "final_target_ms_mean": float(result["final_stair_ms"][:, i].mean()),
+            "at_min_ms_fraction": float((result["final_stair_ms"][:, i] <= result["min_ms"]).mean()),
+        }
+    summary["points_total_mean"] = float(result["points_total"][:, -1].mean()) if result["points_total"].size else 0.0
+    summary["session_min_mean"] = float(result["session_ms"].mean() / 60000.0)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a synthetic MID cohort (no PsychoPy).")
+    parser.add_argument('--config', default='mid_config.yml', help='Path to YAML config.')
+    parser.add_argument('--n', type=int, default=1000, help='Number of synthetic participants.')
+    parser.add_argument('--seed', type=int, default=None, help='RNG seed.')
+    parser.add_argument('--rt-mu', type=float, default=320.0, help='Mean RT (ms) of the cohort.')
+    parser.add_argument('--rt-mu-sd', type=float, default=40.0, help='Between-participant SD of mean RT (ms).')
+    parser.add_argument('--rt-sigma', type=float, default=35.0, help='Within-participant Gaussian SD (ms).')
+    parser.add_argument('--rt-tau', type=float, default=60.0, help='Exponential tail (ms).')
+    parser.add_argument('--p-lapse', type=float, default=0.03, help='Probability of no response.')
+    parser.add_argument('--out', default=None, help='Optional .npz file for the raw trial arrays.')
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    rng = np.random.default_rng(args.seed)
+    participants = draw_participants(args.n, rng, rt_mu=args.rt_mu, rt_mu_sd=args.rt_mu_sd,
+                                     rt_sigma=args.rt_sigma, rt_tau=args.rt_tau, p_lapse=args.p_lapse)
+    result = simulate_cohort(cfg, args.n, seed=rng, participants=participants)
+
+    summary = summarize(result)
+    print(f"Simulated {args.n} participants x {result['condition'].shape[1]} trials")
+    for lab in result["labels"]:
+        s = summary[lab]
+        print(f"  {lab:<10} hit rate {100 * s['hit_rate_mean']:5.1f}% (SD {100 * s['hit_rate_sd']:.1f}), "
+              f"final target {s['final_target_ms_mean']:.0f} ms")
+    print(f"  points_total mean: {summary['points_total_mean']:.1f}")
+    print(f"  session duration mean: {summary['session_min_mean']:.1f} min")
+
+    if args.out:
+        np.savez_compressed(args.out, **{k: np.asarray(v) for k, v in result.items()})
+        print(f"Saved trial arrays to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Split-process session: a render/input process and a controller process.
+
+With `render.separate_process: true` the runner's process becomes the
+controller. It holds the trial logic (staircases, R-Score rule, points),
+the CSV logger and the checkpoints, and never touches the window. A child
+process opens the window, pre-renders the screens and does only frame-timed
+presentation (TrialPresenter) and key capture, plus real-time mode when
+enabled. The two exchange fixed-size records through two preallocated
+shared-memory rings (shm_ring.py), so nothing is pickled after startup:
+
+    controller -> render   COMMAND_DTYPE: trial (condition, jitters,
+                           target_ms), screen (title, instructions, block
+                           start, practice end), end (final points)
+    render -> controller   EVENT_DTYPE: ready, screen shown, key, response
+                           (hit/RT at target offset), trial done (late
+                           RT/key and phase onsets, sent at pause3
+                           onset), escape, done
+
+The controller queues screens ahead and sends the next trial command as
+soon as the response event of the running trial arrives, i.e. during its
+feedback, so the render process finds the next command waiting when pause3
+ends. Logging, fsync and checkpoints happen in the controller while the
+render process keeps flipping. Telemetry and the GC report are written by
+the render process, as they describe its timing.
+"""
+
+import math
+import multiprocessing
+
+import numpy as np
+
+from compiled_config import compile_config
+from monitor import LiveMonitor
+from mid_psychopy_pc_yaml import (SessionAborted, TrialPresenter, apply_outcome, decide_target, open_display,
+                                  session_state, session_steps, trial_row, write_timing_reports)
+from realtime import RealtimeMode
+from shm_ring import ShmRing
+from startup import StartupTimeline, import_psychopy
+from startup import print_summary as print_startup_summary
+from stimulus_cache import preload
+from utils import TRIAL_PHASES
+from checkpoint import snapshot
+
+RING_CAPACITY = 256
+
+# Commands (controller -> render)
+CMD_TRIAL, CMD_SCREEN, CMD_END = 1, 2, 3
+SCREENS = ("title", "instructions", "block_start", "practice_end")
+
+COMMAND_DTYPE = np.dtype([
+    ("kind", "i1"), ("screen", "i1"), ("block", "i2"), ("trial", "i4"), ("condition", "i2"),
+    ("pause1_ms", "i4"), ("pause2_ms", "i4"), ("pause3_ms", "i4"), ("target_ms", "i4"), ("points", "i4"),
+])
+
+# Events (render -> controller)
+EV_READY, EV_SHOWN, EV_KEY, EV_RESPONSE, EV_TRIAL, EV_ESCAPE, EV_DONE = range(1, 8)
+
+EVENT_DTYPE = np.dtype([
+    ("kind", "i1"), ("block", "i2"), ("trial", "i4"), ("hit", "i1"), ("rt_ms", "i4"),
+    ("key", "S16"), ("onsets", "f8", (len(TRIAL_PHASES),)),
+])
+
+NO_ONSETS = (math.nan,) * len(TRIAL_PHASES)
+
+
+def _event(kind, block=0, trial=0, hit=False, rt_ms=None, key=None, onsets=NO_ONSETS):
+    return (kind, block, trial, int(bool(hit)), -1 if rt_ms is None else rt_ms,
+            (key or "").encode("utf-8"), onsets)
+
+
+# ------------------------
+# Render/input process
+# ------------------------
+
+def render_main(config_path, csv_path, command_name, event_name):
+    """Render process: present what the controller commands and report responses and onsets."""
+    commands = ShmRing(COMMAND_DTYPE, name=command_name, create=False)
+    events = ShmRing(EVENT_DTYPE, name=event_name, create=False)
+    import_psychopy()
+    from psychopy import core, event
+
+    ccfg = compile_config(config_path)
+    cfg = ccfg.raw
+    display = open_display(cfg, ccfg, preload(cfg) if cfg['visuals']['stimulus_cache'] else {}, StartupTimeline())
+    win, scheduler, frames = display.win, display.scheduler, display.frames
+    realtime = RealtimeMode(cfg['realtime'], scheduler)
+    labels = ccfg.labels
+    resp_keys = cfg['task']['resp_keys'] + ['escape']
+
+    def abort():
+        events.push_wait(_event(EV_ESCAPE))
+        raise SessionAborted(csv_path)
+
+    presenter = TrialPresenter(display, realtime, ccfg.timings, abort)
+    trial = {"condition": None, "pause1_ms": 0, "pause2_ms": 0, "pause3_ms": 0}  # reused for every trial
+    current = [0, 0]
+
+    def after_target(hit, rt_ms, key):
+        # Sent at target offset: the controller updates its state during feedback
+        events.push_wait(_event(EV_RESPONSE, current[0], current[1], hit, rt_ms, key))
+
+    def in_pause3(hit, rt_ms, key):
+        # Sent right after the first pause3 flip: the controller logs while pause3 is on screen
+        onsets = tuple(math.nan if scheduler.onsets.get(phase) is None
+                       else scheduler.onsets[phase] - scheduler.t0 for phase in TRIAL_PHASES)
+        events.push_wait(_event(EV_TRIAL, current[0], current[1], hit, rt_ms, key, onsets))
+        realtime.collect()
+
+    events.push_wait(_event(EV_READY))
+    scheduler.reset()
+    realtime_started = False
+    try:
+        while True:
+            cmd = commands.pop_wait()
+            kind = int(cmd["kind"])
+            if kind == CMD_TRIAL:
+                if not realtime_started:
+                    realtime.start()
+                    realtime_started = True
+                current[0], current[1] = int(cmd["block"]), int(cmd["trial"])
+                trial["condition"] = labels[cmd["condition"]]
+                for key in ("pause1_ms", "pause2_ms", "pause3_ms"):
+                    trial[key] = int(cmd[key])
+                presenter.trial(current[0], current[1], trial, int(cmd["target_ms"]), after_target, in_pause3)
+            elif kind == CMD_SCREEN:
+                screen = SCREENS[cmd["screen"]]
+                stims = frames[f"block_{cmd['block']}"] if screen == "block_start" else frames[screen]
+                if screen in ("title", "instructions"):
+                    for stim in stims:
+                        stim.draw()
+                    win.flip()
+                else:
+                    scheduler.show(stims)
+                events.push_wait(_event(EV_SHOWN, int(cmd["block"])))
+                if screen == "title":
+                    core.wait(0.8)  # ensures frame appears before waiting
+                    event.clearEvents()
+                if 'escape' in event.waitKeys(keyList=resp_keys):
+                    abort()
+                events.push_wait(_event(EV_KEY, int(cmd["block"])))
+            elif kind == CMD_END:
+                display.end_text.text = cfg['text']['experiment_end'].format(total_points=int(cmd["points"]))
+                scheduler.show([display.end_text]); core.wait(2.0)
+                break
+    except SessionAborted:
+        pass
+    finally:
+        write_timing_reports(scheduler, realtime, csv_path)
+        events.push_wait(_event(EV_DONE))
+        try:
+            win.close()
+        except Exception:
+            pass
+        commands.close()
+        events.close()
+
+
+# ------------------------
+# Controller process
+# ------------------------
+
+def run_split_session(ccfg, config_path, exp_info, csv_path, timeline, resume=None, schedule=None, seed=None):
+    """Run one session with rendering in a child process; returns the final points. Raises SessionAborted on ESC."""
+    cfg = ccfg.raw
+    state = session_state(ccfg, csv_path, resume, schedule, seed)
+    points_total, cond_meta = state.points_total, ccfg.conditions
+    cond_stair, rscore_hist, logger = state.cond_stair, state.rscore_hist, state.logger
+    timings, rscore = ccfg.timings, ccfg.rscore
+    label_index = {label: i for i, label in enumerate(ccfg.labels)}
+    monitor = LiveMonitor(cfg['monitor'], ccfg, exp_info)
+    monitor.start()
+
+    commands = ShmRing(COMMAND_DTYPE, RING_CAPACITY)
+    events = ShmRing(EVENT_DTYPE, RING_CAPACITY)
+    t_stage = timeline.elapsed_ms()
+    proc = multiprocessing.get_context("spawn").Process(
+        target=render_main, args=(config_path, csv_path, commands.name, events.name), name="MID-render")
+    proc.start()
+
+    steps = [("screen", "title"), ("screen", "instructions")]
+    for step in session_steps(state, resume):
+        if step[0] == "trial":
+            steps.append(step)
+        else:
+            steps.append(("screen",) + step)
+    steps.append(("end",))
+
+    def send(step):
+        if step[0] == "screen":
+            block = step[2] if len(step) > 2 else 0
+            commands.push_wait((CMD_SCREEN, SCREENS.index(step[1]), block, 0, 0, 0, 0, 0, 0, 0))
+            return None
+        if step[0] == "end":
+            commands.push_wait((CMD_END, 0, 0, 0, 0, 0, 0, 0, 0, points_total))
+            return None
+        _, b, ti, trial, order = step
+        meta = cond_meta[trial['condition']]
+        target_ms_pre, target_ms, rscore_value = decide_target(ccfg, meta, cond_stair[trial['condition']],
+                                                               rscore_hist, trial['condition'])
+        commands.push_wait((CMD_TRIAL, 0, b, ti, label_index[trial['condition']], trial['pause1_ms'],
+                            trial['pause2_ms'], trial['pause3_ms'], target_ms, 0))
+        return {"block": b, "trial_index": ti, "trial": trial, "order": order, "meta": meta,
+                "target_ms_pre": target_ms_pre, "target_ms": target_ms, "rscore_value": rscore_value}
+
+    def abort(message):
+        print(message)
+        try:
+            logger.close()
+        except Exception:
+            pass
+        proc.join(timeout=10)
+        raise SessionAborted(csv_path)
+
+    running = []        # trials sent, waiting for their trial-done event (oldest first)
+    awaiting = None     # trial whose response decides the next target
+    shown = False
+    i = 0
+    try:
+        while True:
+            # Queue screens ahead; the next trial (and the end) only once the last response is in
+            while i < len(steps) and not (awaiting is not None and steps[i][0] in ("trial", "end")):
+                sent = send(steps[i])
+                if sent is not None:
+                    running.append(sent)
+                    awaiting = sent
+                i += 1
+
+            ev = events.pop_wait(alive=proc.is_alive)
+            if ev is None:
+                abort("ERROR: render process ended unexpectedly")
+            kind = int(ev["kind"])
+            if kind == EV_READY:
+                timeline.add("render_process", t_stage, timeline.elapsed_ms())
+            elif kind == EV_SHOWN and not shown:
+                shown = True
+                timeline.mark("first_screen")
+                try:
+                    print_startup_summary(timeline.write(csv_path + ".startup.json"))
+                except Exception as e:
+                    print(f"Warning: could not write startup timeline: {e}")
+            elif kind == EV_RESPONSE:
+                # Points, staircase and R-Score history (while the render process shows feedback)
+                t = awaiting
+                t["hit"] = bool(ev["hit"])
+                t["delta_points"] = apply_outcome(ccfg, t["meta"], cond_stair[t["trial"]['condition']],
+                                                  rscore_hist, t["trial"]['condition'], t["hit"], t["target_ms"])
+                points_total += t["delta_points"]
+                t["points_total"] = points_total
+                awaiting = None
+            elif kind == EV_TRIAL:
+                t = running.pop(0)
+                rt = None if ev["rt_ms"] < 0 else int(ev["rt_ms"])
+                onsets = ["" if math.isnan(x) else f"{x:.4f}" for x in ev["onsets"]]
+                row = trial_row(exp_info, t["block"], t["trial_index"], t["trial"], t["meta"], timings, rscore,
+                                t["target_ms_pre"], t["target_ms"], t["rscore_value"], rt,
+                                ev["key"].decode("utf-8"), t["hit"], t["delta_points"], t["points_total"], onsets)
+                logger.log(row)
+                monitor.publish(row)
+                logger.checkpoint(snapshot(exp_info, config_path, csv_path, state.schedule_path, t["block"],
+                                           t["trial_index"], t["order"], cond_stair, rscore_hist,
+                                           t["points_total"], logger.n_logged))
+                logger.sync()
+            elif kind == EV_ESCAPE:
+                abort(cfg['text']['escape_message'])
+            elif kind == EV_DONE:
+                break
+    finally:
+        monitor.stop()
+        proc.join(timeout=10)
+        commands.close(unlink=True)
+        events.close(unlink=True)
+
+    try:
+        logger.close(finished=True)
+    except Exception:
+        pass
+    return points_total
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Fast start and startup profiling for the MID runner.
+
+The runner starts importing PsychoPy (visual/core/event/keyboard, which pull
+in pyglet and OpenGL) and reading the pre-decoded stimulus arrays on worker
+threads right away, while the main thread compiles the config and shows the
+participant dialog. Window creation and ImageStim/TextStim construction stay
+on the main thread, since the OpenGL context is bound to it.
+
+Every stage is recorded in a StartupTimeline and written next to the session
+CSV as <csv>.startup.json, e.g.
+
+    {"stages": [{"stage": "import_psychopy", "thread": "import_psychopy",
+                 "start_ms": 0.4, "end_ms": 2310.2, "duration_ms": 2309.8}, ...],
+     "first_screen_ms": 3120.5, "dialog_ms": 1840.0}
+
+Run:
+    python mid_psychopy_pc_yaml.py --config mid_config.yml
+    python mid_psychopy_pc_yaml.py --config mid_config.yml --sequential-start
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimeline:
+    """Wall-clock start/end of named startup stages, relative to the start of main()."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self):
+        """Milliseconds since the timeline was created."""
+        return (time.perf_counter() - self.t0) * 1000.0
+
+    def add(self, name, start_ms, end_ms):
+        """Record a stage with explicit start/end (ms since t0)."""
+        with self._lock:
+            self.stages.append({
+                "stage": name,
+                "thread": threading.current_thread().name,
+                "start_ms": round(start_ms, 1),
+                "end_ms": round(end_ms, 1),
+                "duration_ms": round(end_ms - start_ms, 1),
+            })
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one stage."""
+        start = self.elapsed_ms()
+        try:
+            yield
+        finally:
+            self.add(name, start, self.elapsed_ms())
+
+    def mark(self, name):
+        """Record an instant (zero-length stage), e.g. the first visible screen."""
+        now = self.elapsed_ms()
+        self.add(name, now, now)
+
+    def duration_ms(self, name):
+        """Total duration of all stages with this name."""
+        return sum(s["duration_ms"] for s in self.stages if s["stage"] == name)
+
+    def summary(self):
+        """Stages in start order plus time to first screen and time spent in the dialog."""
+        with self._lock:
+            stages = sorted(self.stages, key=lambda s: s["start_ms"])
+        first = [s["end_ms"] for s in stages if s["stage"] == "first_screen"]
+        return {
+            "stages": stages,
+            "first_screen_ms": first[0] if first else None,
+            "dialog_ms": self.duration_ms("dialog"),
+        }
+
+    def write(self, path):
+        """Write the summary as JSON; returns it."""
+        summary = self.summary()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=1)
+        return summary
+
+
+def print_summary(summary):
+    """Print the startup timeline in a compact table."""
+    print("Startup timeline (ms):")
+    for s in summary["stages"]:
+        print(f"  {s['stage']:<18} {s['start_ms']:>8.1f} -> {s['end_ms']:>8.1f}  "
+              f"({s['duration_ms']:.1f}, {s['thread']})")
+    if summary["first_screen_ms"] is not None:
+        print(f"  first screen after {summary['first_screen_ms']:.0f} ms "
+              f"({summary['dialog_ms']:.0f} ms of it in the participant dialog)")
+
+
+class BackgroundTask(threading.Thread):
+    """Run fn(*args) as a timeline stage, on a worker thread or inline."""
+
+    def __init__(self, timeline, name, fn, *args):
+        super().__init__(name=name, daemon=True)
+        self.timeline = timeline
+        self.fn = fn
+        self.args = args
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def run(self):
+        try:
+            with self.timeline.stage(self.name):
+                self._result = self.fn(*self.args)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def result(self):
+        """Block until the task has finished (recorded as wait_<name>); re-raise its error."""
+        if not self._done.is_set():
+            with self.timeline.stage("wait_" + self.name):
+                self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def start_task(timeline, name, fn, *args, background=True):
+    """Start fn on a worker thread, or run it right away when background is False."""
+    task = BackgroundTask(timeline, name, fn, *args)
+    if background:
+        task.start()
+    else:
+        task.run()
+    return task
+
+
+def import_psychopy():
+    """Import every PsychoPy module the trial loop uses (the slow part of a cold start)."""
+    from psychopy import core, event, visual  # noqa: F401
+    from psychopy.hardware import keyboard  # noqa: F401
+    import frame_scheduler  # noqa: F401
+    import responses  # noqa: F401
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Preprocessed stimulus cache for the MID task.
+
+Each PNG from cfg['visuals'] is decoded once, resized to the pixel size it is
+drawn at in the window (cfg['win']['size']) and stored as a .npy file in
+cache_dir, keyed by a content hash of the source file and the target size.
+Warm starts memory-map the pre-decoded RGBA array (float32, -1..1, the
+format ImageStim accepts) instead of decoding full-resolution PNGs.
+
+Run (pre-build the cache for a config):
+    python stimulus_cache.py --config mid_config.yml
+"""
+
+import argparse
+import hashlib
+import os
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+
+def image_paths(cfg):
+    """Return all distinct image paths referenced in cfg['visuals']."""
+    v = cfg['visuals']
+    paths = [v['target_image']]
+    for key in ('cue_images', 'monetary_feedback_images', 'performance_feedback_images'):
+        paths.extend(v[key].values())
+    return list(dict.fromkeys(paths))
+
+
+def target_pixels(cfg, size=0.6):
+    """Pixel edge length of a square stimulus of `size` height units."""
+    return max(1, int(round(size * cfg['win']['size'][1])))
+
+
+def file_hash(path):
+    """SHA-256 of the file content."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_path(path, px, cache_dir):
+    """Cache file name for an image at a given pixel size."""
+    key = f"{file_hash(path)[:20]}_{px}x{px}_v{CACHE_VERSION}"
+    return os.path.join(cache_dir, key + ".npy")
+
+
+def preprocess(path, px):
+    """Decode and resize an image to an RGBA float32 array in -1..1 (bottom row first)."""
+    from PIL import Image
+    with Image.open(path) as im:
+        im = im.convert('RGBA').resize((px, px), Image.LANCZOS)
+        arr = np.asarray(im, dtype=np.float32)
+    # OpenGL textures start at the bottom row; PsychoPy does not flip numpy input
+    return np.ascontiguousarray(arr[::-1] / 127.5 - 1.0)
+
+
+def load_cached(path, px, cache_dir):
+    """Return a memory-mapped preprocessed array for path, building the cache entry if needed."""
+    target = cache_path(path, px, cache_dir)
+    if not os.path.exists(target):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = target + f".{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, preprocess(path, px))
+        os.replace(tmp, target)
+    return np.load(target, mmap_mode='r')
+
+
+def build_cache(cfg, size=0.6):
+    """Pre-build cache entries for every image in the config; returns {path: cache file}."""
+    px = target_pixels(cfg, size)
+    cache_dir = cfg['visuals']['cache_dir']
+    built = {}
+    for path in image_paths(cfg):
+        if os.path.exists(path):
+            load_cached(path, px, cache_dir)
+            built[path] = cache_path(path, px, cache_dir)
+        else:
+            print(f"Warning: image not found: {path}")
+    return built
+
+
+def preload(cfg, size=0.6):
+    """Read every existing image's cache entry fully into memory; returns {path: array}."""
+    px = target_pixels(cfg, size)
+    return {path: np.array(load_cached(path, px, cfg['visuals']['cache_dir']))
+            for path in image_paths(cfg) if os.path.exists(path)}
+
+
+def main():
+    from config_loader import load_config
+
+    parser = argparse.ArgumentParser(description="Pre-build the MID stimulus cache.")
+    parser.add_argument('--config', default='mid_config.yml', help='Path to YAML config.')
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    for src, dst in build_cache(cfg).items():
+        print(f"{src} -> {dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Timing telemetry for the MID task: scheduled vs. realized phase durations.
+
+The FrameScheduler reports every flip and every phase onset. A phase ends
+at the next recorded onset (or screen flip), so its realized duration,
+overrun against the scheduled frame count and any dropped frames
+(frame-locked mode only) are known without extra timing calls in the
+trial loop. At the end of a session the records go to a sidecar CSV
+(<csv>.timing.csv) and a summary (<csv>.timing.json) with p50/p99 jitter
+per phase and the trials whose realized target duration differs from
+target_ms_final.
+"""
+
+import csv
+import json
+
+SIDECAR_HEADERS = [
+    "block", "trial_index", "phase", "requested_ms", "scheduled_ms", "realized_ms",
+    "overrun_ms", "onset_s", "dropped_frames", "ended_by_response",
+]
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile of a list (q in 0..100)."""
+    if not values:
+        return None
+    xs = sorted(values)
+    pos = (len(xs) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+class TimingTelemetry:
+    """Collect per-phase realized durations from scheduler flips."""
+
+    def __init__(self, frame_ms, frame_locked, t0=0.0):
+        self.frame_ms = frame_ms
+        self.frame_locked = frame_locked
+        self.t0 = t0
+        self.records = []
+        self._open = None
+        self._last_flip = None
+
+    def flip(self, t):
+        """Register a flip timestamp; late frames are charged to the phase on screen."""
+        if self.frame_locked and self._last_flip is not None and self._open is not None:
+            n_frames = int(round((t - self._last_flip) * 1000.0 / self.frame_ms))
+            if n_frames > 1:
+                self._open["dropped_frames"] += n_frames - 1
+        self._last_flip = t
+
+    def start_phase(self, t, block, trial, phase, requested_ms, scheduled_ms):
+        """Close the running phase at t and open a new one."""
+        self.boundary(t)
+        self._open = {
+            "block": block, "trial_index": trial, "phase": phase,
+            "requested_ms": requested_ms, "scheduled_ms": scheduled_ms,
+            "onset": t, "dropped_frames": 0, "ended_by_response": False,
+        }
+
+    def end_by_response(self):
+        """Mark the running phase as ended early by a response (target phase)."""
+        if self._open is not None:
+            self._open["ended_by_response"] = True
+
+    def boundary(self, t):
+        """Close the running phase at t (next phase onset or a non-trial screen flip)."""
+        rec, self._open = self._open, None
+        if rec is None:
+            return
+        rec["realized_ms"] = (t - rec["onset"]) * 1000.0
+        rec["overrun_ms"] = rec["realized_ms"] - rec["scheduled_ms"]
+        self.records.append(rec)
+
+    def flagged_trials(self):
+        """(block, trial) of targets whose realized duration misses target_ms_final by > 1/2 frame."""
+        return [
+            (r["block"], r["trial_index"]) for r in self.records
+            if r["phase"] == "target" and not r["ended_by_response"]
+            and abs(r["realized_ms"] - r["requested_ms"]) > self.frame_ms / 2.0
+        ]
+
+    def summary(self):
+        """Per-phase p50/p99 overrun and dropped frames plus flagged trials."""
+        phases = {}
+        for r in self.records:
+            phases.setdefault(r["phase"], []).append(r)
+        out = {"frame_ms": self.frame_ms, "frame_locked": self.frame_locked, "phases": {}}
+        for phase, recs in phases.items():
+            overrun = [r["overrun_ms"] for r in recs if not r["ended_by_response"]]
+            jitter = [abs(x) for x in overrun]
+            out["phases"][phase] = {
+                "n": len(recs),
+                "overrun_p50_ms": percentile(overrun, 50),
+                "overrun_p99_ms": percentile(overrun, 99),
+                "jitter_p50_ms": percentile(jitter, 50),
+                "jitter_p99_ms": percentile(jitter, 99),
+                "dropped_frames": sum(r["dropped_frames"] for r in recs),
+            }
+        flagged = self.flagged_trials()
+        out["flagged_target_trials"] = [list(f) for f in flagged]
+        out["dropped_frames"] = sum(r["dropped_frames"] for r in self.records)
+        out["session_ok"] = not flagged and out["dropped_frames"] == 0
+        return out
+
+    def write(self, csv_path):
+        """Write <csv>.timing.csv and <csv>.timing.json; returns the summary."""
+        with open(csv_path + ".timing.csv", "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(SIDECAR_HEADERS)
+            for r in self.records:
+                writer.writerow([
+                    r["block"], r["trial_index"], r["phase"], r["requested_ms"],
+                    f"{r['scheduled_ms']:.2f}", f"{r['realized_ms']:.2f}", f"{r['overrun_ms']:.2f}",
+                    f"{r['onset'] - self.t0:.4f}", r["dropped_frames"], int(r["ended_by_response"]),
+                ])
+        summary = self.summary()
+        with open(csv_path + ".timing.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def print_summary(summary):
+    """Print the end-of-session timing summary."""
+    print(f"Timing summary (frame {summary['frame_ms']:.2f} ms, "
+          f"{'frame-locked' if summary['frame_locked'] else 'deadline'} mode):")
+    for phase, s in summary["phases"].items():
+        if s["jitter_p50_ms"] is None:
+            continue
+        print(f"  {phase:<15} n={s['n']:<4} jitter p50 {s['jitter_p50_ms']:6.2f} ms  "
+              f"p99 {s['jitter_p99_ms']:6.2f} ms  dropped frames {s['dropped_frames']}")
+    if summary["flagged_target_trials"]:
+        print(f"  WARNING: {len(summary['flagged_target_trials'])} trial(s) with target duration "
+              f"!= target_ms_final: {summary['flagged_target_trials']}")
+    print(f"  session_ok: {summary['session_ok']}")
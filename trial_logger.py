@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Crash-safe background trial logger for the MID task.
+
+The trial loop only appends finished rows to a deque (lock-free hand-off).
+A writer thread drains the deque into an append-only journal next to the
+CSV (<csv>.journal, one JSON row per line) and fsyncs it when the loop
+requests a sync at a safe point (the ITI). close() writes the regular CSV
+(csv_headers layout) atomically via a temp file + os.replace and removes
+the journal (plus the typed <csv>.trials.npy copy when `columnar` is set,
+see columnar.py). The latest session checkpoint (see checkpoint.py) is written
+to <csv>.checkpoint.json by the same thread at each sync. After a crash the
+journal can be turned back into a CSV:
+
+    python trial_logger.py --recover data/MID_PC_<...>.csv.journal
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class TrialLogger:
+    """Hand rows from the trial loop to a background journal writer."""
+
+    def __init__(self, csv_path, headers, rows=None, interval_s=0.05, columnar=False):
+        self.csv_path = csv_path
+        self.columnar = columnar
+        self.journal_path = csv_path + ".journal"
+        self.checkpoint_path = csv_path + ".checkpoint.json"
+        self.headers = list(headers)
+        self.interval_s = interval_s
+        self.rows = [list(r) for r in rows or []]
+        self.n_logged = len(self.rows)
+        self._queue = deque()
+        self._checkpoint = None
+        self._sync_requested = False
+        self._stop = False
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        self._write_line(self.headers)
+        for row in self.rows:
+            self._write_line(row)
+        self._fsync()
+        self._thread = threading.Thread(target=self._run, name="TrialLogger", daemon=True)
+        self._thread.start()
+
+    def log(self, row):
+        """Queue one CSV row; never blocks the caller."""
+        self._queue.append(list(row))
+        self.n_logged += 1
+
+    def checkpoint(self, state):
+        """Hand over the latest session checkpoint; written at the next sync."""
+        self._checkpoint = state
+
+    def sync(self):
+        """Ask the writer thread to fsync the journal (call at a safe point, e.g. the ITI)."""
+        self._sync_requested = True
+
+    def _write_line(self, row):
+        self._journal.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def _fsync(self):
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _write_checkpoint(self):
+        state, self._checkpoint = self._checkpoint, None
+        if state is not None:
+            write_json_atomic(self.checkpoint_path, state)
+
+    def _drain(self):
+        wrote = False
+        while self._queue:
+            row = self._queue.popleft()
+            self._write_line(row)
+            self.rows.append(row)
+            wrote = True
+        return wrote
+
+    def _run(self):
+        while not self._stop:
+            wrote = self._drain()
+            if self._sync_requested:
+                self._sync_requested = False
+                # Take the checkpoint first, then drain: every row logged before it is in the
+                # journal before the fsync, so rows_logged never counts an unwritten row
+                state, self._checkpoint = self._checkpoint, None
+                self._drain()
+                self._fsync()
+                if state is not None:
+                    write_json_atomic(self.checkpoint_path, state)
+            elif wrote:
+                self._journal.flush()
+            time.sleep(self.interval_s)
+
+    def close(self, finished=False):
+        """Stop the writer, fsync the journal and atomically write the final CSV.
+
+        The checkpoint is kept for --resume unless the session finished.
+        """
+        if self._stop:
+            return
+        self._stop = True
+        self._thread.join()
+        self._drain()
+        self._fsync()
+        self._write_checkpoint()
+        self._journal.close()
+        write_csv_atomic(self.csv_path, self.headers, self.rows)
+        if self.columnar:
+            from columnar import columnar_path, rows_to_array, write_trials
+            try:
+                write_trials(columnar_path(self.csv_path), rows_to_array(self.headers, self.rows))
+            except ValueError as e:
+                print(f"Warning: no columnar copy of {self.csv_path} (the CSV is complete): {e}")
+        os.remove(self.journal_path)
+        if finished and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+
+def write_csv_atomic(csv_path, headers, rows):
+    """Write headers + rows to csv_path via a temp file and os.replace."""
+    tmp = csv_path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, csv_path)
+
+
+def write_json_atomic(path, obj):
+    """Write obj as JSON via a temp file, fsync and os.replace."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_journal(journal_path):
+    """Return (headers, rows) from a journal; a torn last line is ignored."""
+    headers, rows = None, []
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if headers is None:
+                headers = row
+            else:
+                rows.append(row)
+    return headers, rows
+
+
+def recover(journal_path):
+    """Rebuild the CSV belonging to a journal left behind by a crash."""
+    headers, rows = read_journal(journal_path)
+    csv_path = journal_path[:-len(".journal")]
+    write_csv_atomic(csv_path, headers, rows)
+    return csv_path, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recover MID CSV files from trial journals.")
+    parser.add_argument('--recover', nargs='+', required=True, help='Journal file(s) to convert.')
+    args = parser.parse_args()
+
+    for journal_path in args.recover:
+        csv_path, n = recover(journal_path)
+        print(f"Recovered {n} trials -> {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,18 @@ import random
 from datetime import datetime
 
 
+# Trial phases in presentation order (realized onsets are logged per phase)
+TRIAL_PHASES = ["pause1", "cue", "pause2", "target", "feedback_perf", "feedback_money", "pause3"]
+
+# Column layout of every trial CSV (PC runner and ingested web data)
+CSV_HEADERS = [
+    "participant","session","timestamp","block","trial_index","condition",
+    "valence","magnitude","target_ms_pre","target_ms_final","rt_ms","hit",
+    "pause1_ms","pause2_ms","pause3_ms","cue_ms","feedback_ms",
+    "points_change","points_total","key_pressed","rscore_scope","rscore_value",
+] + [f"onset_{phase}_s" for phase in TRIAL_PHASES]
+
+
 def timestamp():
     """Generate timestamp string."""
     return datetime.now().strftime("%Y%m%d-%H%M%S")
@@ -18,6 +30,16 @@ def uniform_jitter(lo, hi):
     return random.uniform(lo, hi)
 
 
+def rscore_target(target_ms_pre, hist, threshold, scale, min_ms):
+    """Apply the R-Score rule to a hit history; returns (target_ms, rscore_value string)."""
+    if len(hist) == 0:
+        return target_ms_pre, ''
+    r = 100.0 * (sum(hist) / len(hist))
+    if r > threshold:
+        return max(min_ms, int(target_ms_pre * scale)), f"{r:.1f}"
+    return target_ms_pre, f"{r:.1f}"
+
+
 class StaircaseAdaptive:
     """Simple 1-up/2-down staircase to converge at ~70%."""
     
@@ -28,8 +50,8 @@ class StaircaseAdaptive:
         self.step = step_ms
         self._consecutive_hits = 0
 
-    def update(self, hit):
-        """Update staircase based on hit/miss."""
+    def update(self, hit, presented_ms=None):
+        """Update staircase based on hit/miss (steps from its own value; presented_ms is not used)."""
         if hit:
             self._consecutive_hits += 1
             if self._consecutive_hits >= 2:
@@ -42,3 +64,11 @@ class StaircaseAdaptive:
     def get_ms(self):
         """Get current target duration in milliseconds."""
         return self.value
+
+    def get_state(self):
+        """Compact state for checkpoints: [value, consecutive hits]."""
+        return [self.value, self._consecutive_hits]
+
+    def set_state(self, state):
+        """Restore a get_state() snapshot."""
+        self.value, self._consecutive_hits = state
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Build step for the web client: config, text, schedules and assets in one bundle.
+
+mid_psychojs.js otherwise fetches mid_config.yml and text_content.yml,
+parses them with js-yaml in the browser and randomizes trials on the
+client. This build validates both files with the config_loader rules
+(plus the compile-time checks of compiled_config.py), resolves every
+condition to its cue/feedback image and gain text, precompiles
+`--schedules` session schedules with schedule.py (same constraints and
+jitters as the PC runner) and writes to --out:
+
+    bundle.<hash>.json    one minified JSON: config, text, resolved
+                          conditions, schedules, preload manifest
+    assets/<name>.<hash>.<ext>
+                          images renamed by content hash (cache forever)
+    index.html            mid_psychojs.html pointing at the bundle (no js-yaml)
+    mid_psychojs.<hash>.js, mid_psychojs.<hash>.css, ingest_upload.<hash>.js
+
+The preload manifest lists every image with its hashed path, size in bytes,
+pixel size and SHA-256; the client fetches all of them before the first
+trial. A participant's schedule is chosen by a hash of participant and
+session, so a reload gets the same session. `config_hash` (see
+compiled_config.py) is sent with every uploaded trial batch and logged by
+ingest_server.py, so catalog.py ties the session to the config it ran with.
+Only index.html must not be cached long; everything it names changes its
+file name when its content changes.
+
+Run:
+    python web_bundle.py --config mid_config.yml --out web_dist
+    python web_bundle.py --schedules 50 --seed 1
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+
+from compiled_config import compile_config
+from schedule import compile_schedule
+from stimulus_cache import file_hash
+
+BUNDLE_VERSION = 1
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+WEB_FILES = ("mid_psychojs.js", "mid_psychojs.css", "ingest_upload.js")
+# Config sections the web client reads
+WEB_SECTIONS = ("win", "timings", "staircase", "rscore", "points", "task", "visuals", "ingest", "conditions")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_size(path):
+    """(width, height) from the PNG header, or (None, None) for other formats."""
+    with open(path, "rb") as f:
+        head = f.read(24)
+    if head[:8] != PNG_SIGNATURE or head[12:16] != b"IHDR":
+        return None, None
+    return struct.unpack(">II", head[16:24])
+
+
+def hashed_asset(src_rel, out_dir):
+    """Copy an image to assets/ under a content-hashed name; returns its manifest entry."""
+    src = os.path.join(APP_DIR, src_rel)
+    if not os.path.exists(src):
+        print(f"ERROR: image not found: {src_rel}")
+        exit(1)
+    digest = file_hash(src)
+    stem, ext = os.path.splitext(os.path.basename(src_rel))
+    rel = f"assets/{stem}.{digest[:12]}{ext}"
+    shutil.copyfile(src, os.path.join(out_dir, rel))
+    width, height = png_size(src)
+    return {"name": src_rel, "path": rel, "bytes": os.path.getsize(src), "width": width, "height": height,
+            "sha256": digest}
+
+
+def compact_schedule(schedule, labels):
+    """Schedule with each trial as [condition index, pause1_ms, pause2_ms, pause3_ms]."""
+    index = {label: i for i, label in enumerate(labels)}
+    return {"seed": schedule["seed"],
+            "blocks": [{"block": b["block"],
+                        "trials": [[index[t["condition"]], t["pause1_ms"], t["pause2_ms"], t["pause3_ms"]]
+                                   for t in b["trials"]]}
+                       for b in schedule["blocks"]]}
+
+
+def build_bundle(config_path, out_dir, n_schedules=20, seed=None):
+    """Write the bundle, hashed assets and web entry files to out_dir; returns (bundle path, bundle)."""
+    ccfg = compile_config(config_path)  # config_loader validation + compile-time checks; exits on errors
+    cfg = ccfg.raw
+    os.makedirs(os.path.join(out_dir, "assets"), exist_ok=True)
+
+    # Preload manifest (each distinct image once) and condition -> hashed image mapping
+    assets = {}
+
+    def asset(src_rel):
+        if src_rel not in assets:
+            assets[src_rel] = hashed_asset(src_rel, out_dir)
+        return assets[src_rel]["path"]
+
+    v = cfg['visuals']
+    images = {"target": asset(v['target_image']),
+              "hit": asset(v['performance_feedback_images']['hit']),
+              "miss": asset(v['performance_feedback_images']['miss'])}
+    conditions = {label: {"valence": c.valence, "magnitude": c.magnitude, "points_hit": c.points_hit,
+                          "points_miss": c.points_miss, "max_ms": c.max_ms, "cue_image": asset(c.cue_image),
+                          "feedback_image": asset(c.feedback_image), "gain_text": c.gain_text}
+                  for label, c in ccfg.conditions.items()}
+
+    # Precompiled schedules: seeds seed, seed+1, ... (random base seed if omitted)
+    first = compile_schedule(cfg, seed)
+    schedules = [first] + [compile_schedule(cfg, first["seed"] + i) for i in range(1, n_schedules)]
+
+    bundle = {
+        "version": BUNDLE_VERSION,
+        "config_hash": ccfg.source_hash,
+        "config": {section: cfg[section] for section in WEB_SECTIONS},
+        "text": cfg['text'],
+        "labels": list(ccfg.labels),
+        "conditions": conditions,
+        "images": images,
+        "schedules": [compact_schedule(s, ccfg.labels) for s in schedules],
+        "preload": list(assets.values()),
+    }
+    payload = json.dumps(bundle, separators=(",", ":"), ensure_ascii=False, sort_keys=True).encode("utf-8")
+    name = f"bundle.{hashlib.sha256(payload).hexdigest()[:12]}.json"
+    with open(os.path.join(out_dir, name), "wb") as f:
+        f.write(payload)
+
+    # Entry file: index.html names the bundle and the hashed script/stylesheet and is
+    # the only file that must not be cached long
+    with open(os.path.join(APP_DIR, "mid_psychojs.html"), "r", encoding="utf-8") as f:
+        html = f.read()
+    html = "\n".join(line for line in html.splitlines() if "js-yaml" not in line) + "\n"
+    for fname in WEB_FILES:
+        stem, ext = os.path.splitext(fname)
+        hashed = f"{stem}.{file_hash(os.path.join(APP_DIR, fname))[:12]}{ext}"
+        shutil.copyfile(os.path.join(APP_DIR, fname), os.path.join(out_dir, hashed))
+        html = html.replace(f'"{fname}"', f'"{hashed}"')
+    html = html.replace("</head>", f'    <meta name="mid-bundle" content="{name}">\n'
+                                   f'    <link rel="preload" href="{name}" as="fetch" crossorigin>\n</head>')
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+    return os.path.join(out_dir, name), bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the minified config/schedule bundle for the web client.")
+    parser.add_argument('--config', default='mid_config.yml', help='Path to YAML config.')
+    parser.add_argument('--out', default='web_dist', help='Output directory (serve it as the web root).')
+    parser.add_argument('--schedules', type=int, default=20, help='Number of precompiled session schedules.')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the first schedule (random if omitted).')
+    args = parser.parse_args()
+
+    if args.schedules < 1:
+        print("ERROR: --schedules must be at least 1")
+        exit(1)
+    path, bundle = build_bundle(args.config, args.out, args.schedules, args.seed)
+    total = sum(a["bytes"] for a in bundle["preload"])
+    print(f"{len(bundle['schedules'])} schedules, {len(bundle['preload'])} images ({total / 1024:.0f} KiB) "
+          f"-> {path} ({os.path.getsize(path) / 1024:.1f} KiB)")
+    print(f"Config hash {bundle['config_hash'][:12]}; serve {args.out}/ with index.html uncached")
+
+
+if __name__ == "__main__":
+    main()